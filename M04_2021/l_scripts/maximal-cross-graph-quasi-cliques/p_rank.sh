@@ -1,20 +1,20 @@
 #!/bin/sh
 
-# p_rank.sh valores socios
+if [ -z "$2" ]
+then
+    printf "Uso: $0 valores vínculos [quantos]
 
-awk -F '[; ]' '
-FILENAME == ARGV[1] {
-    valor[$1] = $2
-}
+Soma, para cada par de CNPJs vinculados, o valor das licitações em que
+concorrem.  Cada linha do arquivo \"vínculos\" contém três campos
+separados por ',' e/ou ' ': dois CNPJs vinculados e uma licitação da
+qual participaram (como sócio-em-comum ou a saída de modela_arestas.py).
 
-FILENAME == ARGV[2] {
-    0. Armazenar valores de todas as licitações que um par concorre
-    total[$1, $2] = 0
-    1. Para cada linha, consultar o valor da licitacao em $3
-    v = valor[$3]
-    2. Somar ao par este valor: total[$1, $2] += valor[$3]
-}
+Cada linha do arquivo \"valores\" contém dois campos separados por ';':
+uma licitação e seu valor.
 
--> Imprimir o resultado em um arquivo iterando em total[$1, $2]
+Sem \"quantos\", todos os pares são ordenados.
+"
+    exit
+fi
 
-    
+exec python3 "$(dirname "$0")/../../python/ranking.py" pares "$2" "$1" ${3:+--top "$3"}
@@ -12,7 +12,7 @@ then
 Cada linha do arquivo \"padrões\" contém dois campos separados por
 ' ': CNPJs e licitações, ambos separados por ','.  Cada CNPJ e
 licitação pode ser seguido de '#' e do ruído coberto, como
-multidupehack informa com a opção --pn.  Sem a informação, se
+quasi_cliques.py informa.  Sem a informação, se
 considere que o ruído é 0.
 
 Os números padrões de CNPJs e licitações por linha são $NB_OF_CNPJS_PER_ROW e $NB_OF_PROCUREMENTS_PER_ROW.
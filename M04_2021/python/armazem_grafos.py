@@ -0,0 +1,178 @@
+# Armazenamento colunar dos grafos das licitações.
+
+# Substitui o Pickle de um DataFrame com um objeto nx.Graph por linha. Cada
+# vetor é salvo em um arquivo .npy dentro do diretório do armazém e pode ser
+# mapeado em memória, de forma que uma licitação (ou uma fatia delas) é lida
+# sem desserializar o restante:
+
+# cnpjs.npy                  vocabulário de CNPJs (ID = posição no vetor)
+# licitacoes.npy             seq_dim_licitacao de cada linha
+# metadados.npy              ano, município, modalidade, valor e máscara do vínculo em uso
+# municipios.npy             nomes dos municípios (códigos em metadados)
+# modalidades.npy            nomes das modalidades (códigos em metadados)
+# licitantes.npy             IDs dos CNPJs licitantes de todas as licitações
+# offsets_licitantes.npy     licitantes da linha i em [offsets[i], offsets[i + 1])
+# arestas.npy                pares (cnpj_a, cnpj_b) de IDs de todas as licitações
+# offsets_arestas.npy        arestas da linha i em [offsets[i], offsets[i + 1])
+
+# Uma mesma licitação pode aparecer em várias linhas, uma por combinação de
+# vínculos (coluna vinculo_em_uso), cada uma somente com as arestas daqueles
+# vínculos.
+
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+import carregamento_dados as cd
+import ferramentas_grafos as fg
+
+grafos_path = '../data/output/grafos/'
+
+TIPO_METADADOS = np.dtype([
+    ('ano', '<i2'),
+    ('municipio', '<i4'),
+    ('modalidade', '<i4'),
+    ('valor', '<f8'),
+    ('vinculo_em_uso', 'u1')
+])
+
+
+def junta_fatias(dados: np.ndarray, inicio: np.ndarray, contagem: np.ndarray) -> np.ndarray:
+    """Concatena as fatias dados[inicio[i]:inicio[i] + contagem[i]] sem laço em Python."""
+    deslocamento = np.arange(contagem.sum(), dtype=np.int64) - np.repeat(np.cumsum(contagem) - contagem, contagem)
+    return dados[np.repeat(inicio, contagem) + deslocamento]
+
+
+def offsets_de(contagem: np.ndarray) -> np.ndarray:
+    offsets = np.zeros(len(contagem) + 1, dtype=np.int64)
+    np.cumsum(contagem, out=offsets[1:])
+    return offsets
+
+
+def salva(caminho: str, tabela: pd.DataFrame, d_licitacoes, arestas: np.ndarray, tipos: np.ndarray = None):
+    """Salva o armazém de grafos.
+
+    :param caminho: Diretório do armazém (substituído por completo).
+    :param tabela: Tabela de licitações de modela_grafos.monta_tabela_licitacoes.
+    :param d_licitacoes: Índice CSR de carregamento_dados.indices_compactos.
+    :param arestas: Arestas de ferramentas_grafos.extrai_arestas_tipadas.
+    :param tipos: Máscaras de vínculo das arestas. Se informadas, cada linha
+        recebe somente as arestas dos vínculos da sua coluna vinculo_em_uso.
+    """
+    ids = d_licitacoes.chaves.get_indexer(tabela['licitacao'].astype(str))
+    existe = ids >= 0
+    ids_validos = np.where(existe, ids, 0)
+
+    # Licitantes de cada linha, na ordem do arquivo de CNPJs licitantes.
+    contagem = np.where(existe, d_licitacoes.grau()[ids_validos], 0)
+    licitantes = junta_fatias(d_licitacoes.vizinhos, d_licitacoes.offsets[ids_validos], contagem)
+    offsets_licitantes = offsets_de(contagem)
+
+    # Arestas de cada linha.
+    mascaras = tabela['vinculo_em_uso'].map(cd.mascara_vinculo).to_numpy(dtype=np.uint8)
+    inicio_arestas = np.searchsorted(arestas[:, 0], np.arange(len(d_licitacoes.chaves) + 1))
+    contagem = np.where(existe, inicio_arestas[ids_validos + 1] - inicio_arestas[ids_validos], 0)
+    arestas_linhas = junta_fatias(arestas[:, 1:], inicio_arestas[ids_validos], contagem)
+    if tipos is not None:
+        linha = np.repeat(np.arange(len(tabela)), contagem)
+        mantida = (junta_fatias(tipos, inicio_arestas[ids_validos], contagem) & mascaras[linha]) != 0
+        arestas_linhas = arestas_linhas[mantida]
+        contagem = np.bincount(linha[mantida], minlength=len(tabela))
+    offsets_arestas = offsets_de(contagem)
+
+    municipios, codigos_municipios = np.unique(tabela['municipio'].to_numpy(dtype=str), return_inverse=True)
+    modalidades, codigos_modalidades = np.unique(tabela['modalidade'].to_numpy(dtype=str), return_inverse=True)
+    metadados = np.zeros(len(tabela), dtype=TIPO_METADADOS)
+    metadados['ano'] = pd.to_numeric(tabela['ano'], errors='coerce').fillna(-1).to_numpy()
+    metadados['municipio'] = codigos_municipios
+    metadados['modalidade'] = codigos_modalidades
+    metadados['valor'] = pd.to_numeric(tabela['valor'], errors='coerce').to_numpy()
+    metadados['vinculo_em_uso'] = mascaras
+
+    vetores = {
+        'cnpjs': np.asarray(d_licitacoes.valores, dtype=str),
+        'licitacoes': tabela['licitacao'].to_numpy(dtype=str),
+        'metadados': metadados,
+        'municipios': municipios,
+        'modalidades': modalidades,
+        'licitantes': licitantes.astype(np.int32),
+        'offsets_licitantes': offsets_licitantes,
+        'arestas': np.ascontiguousarray(arestas_linhas, dtype=np.int32).reshape(-1, 2),
+        'offsets_arestas': offsets_arestas
+    }
+
+    # Escreve em um diretório temporário e o troca pelo anterior ao final, para
+    # que leitores nunca encontrem um armazém pela metade.
+    caminho = caminho.rstrip('/')
+    temporario = caminho + '.tmp'
+    shutil.rmtree(temporario, ignore_errors=True)
+    os.makedirs(temporario)
+    for nome, vetor in vetores.items():
+        np.save(os.path.join(temporario, nome + '.npy'), vetor)
+    shutil.rmtree(caminho, ignore_errors=True)
+    os.replace(temporario, caminho)
+
+
+class ArmazemGrafos:
+    """Leitura do armazém de grafos. Por padrão os vetores são mapeados em memória."""
+
+    def __init__(self, caminho: str = grafos_path, mmap: bool = True):
+        modo = 'r' if mmap else None
+        for nome in ['cnpjs', 'licitacoes', 'metadados', 'municipios', 'modalidades',
+                     'licitantes', 'offsets_licitantes', 'arestas', 'offsets_arestas']:
+            setattr(self, nome, np.load(os.path.join(caminho, nome + '.npy'), mmap_mode=modo))
+        self._posicoes = None
+
+    def __len__(self) -> int:
+        return len(self.licitacoes)
+
+    def posicao(self, licitacao: str) -> int:
+        """Retorna a linha da licitação no armazém."""
+        if self._posicoes is None:
+            self._posicoes = pd.Index(self.licitacoes)
+        return self._posicoes.get_loc(str(licitacao))
+
+    def ids_licitantes(self, i: int) -> np.ndarray:
+        return self.licitantes[self.offsets_licitantes[i]:self.offsets_licitantes[i + 1]]
+
+    def ids_arestas(self, i: int) -> np.ndarray:
+        return self.arestas[self.offsets_arestas[i]:self.offsets_arestas[i + 1]]
+
+    def grafo(self, i: int):
+        """Retorna o grafo networkX da licitação da linha i."""
+        G = fg.inicializa_grafo()
+        G.add_nodes_from(self.cnpjs[self.ids_licitantes(i)].tolist())
+        G.add_edges_from(self.cnpjs[self.ids_arestas(i)].tolist())
+        return G
+
+    def grafos(self, inicio: int = 0, fim: int = None) -> list:
+        """Retorna os grafos das linhas [inicio, fim)."""
+        return [self.grafo(i) for i in range(*slice(inicio, fim).indices(len(self)))]
+
+    def metadados_tabela(self, inicio: int = 0, fim: int = None) -> pd.DataFrame:
+        """Retorna os metadados tipados das linhas [inicio, fim)."""
+        metadados = np.asarray(self.metadados[inicio:fim])
+        ano = pd.array(metadados['ano'], dtype='Int16')
+        ano[metadados['ano'] < 0] = pd.NA
+        mascaras, codigos = np.unique(metadados['vinculo_em_uso'], return_inverse=True)
+        vinculos = np.array([cd.formata_vinculo(m) for m in mascaras], dtype=object)
+        return pd.DataFrame({
+            'ano': ano,
+            'municipio': self.municipios[metadados['municipio']],
+            'modalidade': self.modalidades[metadados['modalidade']],
+            'licitacao': np.asarray(self.licitacoes[inicio:fim]),
+            'valor': metadados['valor'],
+            'vinculo_em_uso': vinculos[codigos.reshape(-1)]
+        })
+
+    def tabela(self, inicio: int = 0, fim: int = None) -> pd.DataFrame:
+        """Retorna as linhas [inicio, fim) no formato do antigo Pickle grafos_licitacoes,
+        com as colunas 'grafo' e 'cnpjs'.
+        """
+        df = self.metadados_tabela(inicio, fim)
+        linhas = range(*slice(inicio, fim).indices(len(self)))
+        df['grafo'] = [self.grafo(i) for i in linhas]
+        df['cnpjs'] = [self.cnpjs[self.ids_licitantes(i)].tolist() for i in linhas]
+        return df
@@ -0,0 +1,175 @@
+# ==============================================================================
+# MEDIÇÃO DE DESEMPENHO DAS ETAPAS DO PIPELINE
+# ==============================================================================
+
+# Para cada escala, gera dados sintéticos (gera_dados_sinteticos.py) em um
+# diretório temporário com a mesma estrutura de M04_2021 e executa cada etapa
+# do pipeline.py em um processo separado, na ordem das dependências. As etapas
+# anteriores já estão no cache, então o processo executa somente a etapa
+# medida (o tempo inclui a leitura do cache das dependências).
+
+# De cada execução são registrados o tempo, o pico de memória residente do
+# processo (getrusage) e, com --tracemalloc, o pico de memória alocada pelo
+# Python. Cada execução é uma linha JSON em resultados_path, identificada pelo
+# commit atual, para comparação entre versões:
+
+# python benchmark.py [--escalas pequena media] [--etapas E ...] [--repeticoes N]
+# python benchmark.py --compara COMMIT_A COMMIT_B
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+# Pacotes implementados
+import gera_dados_sinteticos as gds
+import pipeline
+
+resultados_path = '../data/output/benchmark/resultados.jsonl'
+
+# Escalas: (licitações, CNPJs). Os demais parâmetros são os de gds.PADRAO.
+ESCALAS = {
+    'pequena': (2000, 5000),
+    'media': (20000, 40000),
+    'grande': (200000, 300000)
+}
+
+# Executado no processo de cada etapa, com o diretório de trabalho em raiz/python.
+CODIGO_ETAPA = """
+import json, sys, time, tracemalloc
+sys.path.insert(0, sys.argv[1])
+import pipeline
+etapa, saida, com_tracemalloc = sys.argv[2], sys.argv[3], sys.argv[4] == '1'
+if com_tracemalloc:
+    tracemalloc.start()
+inicio = time.perf_counter()
+pipeline.executa([etapa])
+segundos = time.perf_counter() - inicio
+pico = tracemalloc.get_traced_memory()[1] if com_tracemalloc else None
+with open(saida, 'w') as f:
+    json.dump({'segundos': segundos, 'pico_tracemalloc': pico}, f)
+"""
+
+
+def commit_atual() -> str:
+    """Retorna o commit do repositório ('desconhecido' fora do git), com o
+    sufixo '+' se houver alterações não salvas.
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+        alterado = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                  capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'desconhecido'
+    return commit + ('+' if alterado else '')
+
+
+def prepara_raiz(raiz: str, parametros: gds.Parametros):
+    """Cria a árvore de diretórios esperada pelos módulos e gera os dados."""
+    for diretorio in ['python', 'data/output/csv', 'data/output/pickles']:
+        os.makedirs(os.path.join(raiz, diretorio), exist_ok=True)
+    gds.gera(os.path.join(raiz, 'data', 'input'), parametros)
+
+
+def executa_etapa(raiz: str, etapa: str, com_tracemalloc: bool) -> dict:
+    """Executa a etapa em um novo processo e retorna as suas medidas."""
+    cache = os.path.join(raiz, 'data', 'output', 'cache')
+    if os.path.isdir(cache):
+        # Força a execução da etapa medida (as dependências continuam em cache).
+        for arquivo in os.listdir(cache):
+            if arquivo.startswith(etapa + '-'):
+                os.remove(os.path.join(cache, arquivo))
+
+    saida = os.path.join(raiz, 'medida.json')
+    codigo = os.path.dirname(os.path.abspath(__file__))
+    processo = subprocess.Popen(
+        [sys.executable, '-c', CODIGO_ETAPA, codigo, etapa, saida, '1' if com_tracemalloc else '0'],
+        cwd=os.path.join(raiz, 'python'),
+        stdout=subprocess.DEVNULL
+    )
+    # wait4 retorna o uso de recursos somente deste processo (ru_maxrss em KiB no Linux).
+    _, status, uso = os.wait4(processo.pid, 0)
+    processo.returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+    medida = {'segundos': None, 'pico_tracemalloc': None}
+    if processo.returncode == 0:
+        with open(saida) as f:
+            medida = json.load(f)
+    medida['max_rss'] = uso.ru_maxrss * 1024
+    medida['codigo_saida'] = processo.returncode
+    return medida
+
+
+def mede(escalas: list, etapas: list, repeticoes: int = 1, com_tracemalloc: bool = False,
+         parametros: gds.Parametros = gds.PADRAO, caminho: str = resultados_path) -> list:
+    """Mede as etapas em cada escala e acrescenta os registros em caminho."""
+    commit = commit_atual()
+    data = time.strftime('%Y-%m-%dT%H:%M:%S')
+    registros = []
+    for escala in escalas:
+        licitacoes, cnpjs = ESCALAS[escala]
+        p = parametros._replace(licitacoes=licitacoes, cnpjs=cnpjs)
+        with tempfile.TemporaryDirectory(prefix='benchmark-') as raiz:
+            prepara_raiz(raiz, p)
+            for etapa in pipeline.seleciona_etapas(etapas):
+                for repeticao in range(repeticoes):
+                    medida = executa_etapa(raiz, etapa, com_tracemalloc)
+                    registro = {'commit': commit, 'data': data, 'escala': escala, 'etapa': etapa,
+                                'repeticao': repeticao, **medida, 'parametros': p._asdict()}
+                    registros.append(registro)
+                    print(f"{escala:8} {etapa:16} {medida['segundos'] or float('nan'):9.3f} s "
+                          f"{medida['max_rss'] / 2 ** 20:9.1f} MiB")
+                    if medida['codigo_saida'] != 0:
+                        raise RuntimeError(f"etapa {etapa} falhou na escala {escala}")
+
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    with open(caminho, 'a') as f:
+        for registro in registros:
+            f.write(json.dumps(registro, ensure_ascii=False) + '\n')
+    return registros
+
+
+def compara(commit_a: str, commit_b: str, caminho: str = resultados_path) -> pd.DataFrame:
+    """Compara as medianas de tempo e de memória de cada (escala, etapa) entre
+    dois commits. razao > 1 indica que commit_b é mais lento (ou usa mais memória).
+    """
+    df = pd.read_json(caminho, lines=True)
+    df = df[df['codigo_saida'] == 0]
+    medianas = df.groupby(['commit', 'escala', 'etapa'])[['segundos', 'max_rss']].median()
+    a, b = medianas.loc[commit_a], medianas.loc[commit_b]
+    tabela = a.join(b, lsuffix='_' + commit_a, rsuffix='_' + commit_b, how='inner')
+    tabela['razao_segundos'] = b['segundos'] / a['segundos']
+    tabela['razao_max_rss'] = b['max_rss'] / a['max_rss']
+    return tabela
+
+
+def main():
+    nomes = [etapa.nome for etapa in pipeline.ETAPAS]
+    parser = argparse.ArgumentParser(description='Mede o tempo e a memória das etapas do pipeline.')
+    parser.add_argument('--escalas', nargs='+', choices=list(ESCALAS), default=['pequena'])
+    parser.add_argument('--etapas', nargs='+', choices=nomes, default=nomes,
+                        help='etapas medidas (as dependências também são medidas)')
+    parser.add_argument('--repeticoes', type=int, default=1, help='execuções de cada etapa')
+    parser.add_argument('--tracemalloc', action='store_true',
+                        help='mede também o pico de memória alocada pelo Python (mais lento)')
+    parser.add_argument('--semente', type=int, default=gds.PADRAO.semente)
+    parser.add_argument('--saida', default=resultados_path, help='arquivo JSONL de resultados')
+    parser.add_argument('--compara', nargs=2, metavar=('COMMIT_A', 'COMMIT_B'),
+                        help='compara os resultados de dois commits em vez de medir')
+    args = parser.parse_args()
+
+    if args.compara:
+        with pd.option_context('display.width', 200, 'display.max_columns', None):
+            print(compara(*args.compara, caminho=args.saida))
+        return
+    mede(args.escalas, args.etapas, args.repeticoes, args.tracemalloc,
+         gds.PADRAO._replace(semente=args.semente), args.saida)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,54 +1,58 @@
+import numpy as np
 import pandas as pd
 
 # Pacotes implementados
 import carregamento_dados as cd
 import ferramentas_grafos as fg
+import instrumentacao as ins
+import modela_grafos as mg
+
+
+def calcula(licitacoes: pd.DataFrame, arestas: np.ndarray, d_licitacoes, tipos: np.ndarray = None) -> pd.DataFrame:
+    """Retorna a tabela das licitações acrescida do grau de competição, calculado
+    diretamente das arestas de ferramentas_grafos.extrai_arestas_tipadas.
+    Se as máscaras de vínculo das arestas forem informadas, cada linha usa
+    somente as arestas da sua coluna vinculo_em_uso.
+    Licitações sem CNPJs licitantes recebem NaN.
+    """
+    licitacoes = licitacoes.copy()
+    ids = d_licitacoes.chaves.get_indexer(licitacoes['licitacao'].astype(str))
+    grau_competicao = np.full(len(licitacoes), np.nan)
+    for vinculo in pd.unique(licitacoes['vinculo_em_uso']):
+        arestas_vinculo = arestas
+        if tipos is not None:
+            arestas_vinculo = fg.filtra_vinculos(arestas, tipos, cd.mascara_vinculo(vinculo))
+        inicio_arestas = np.searchsorted(arestas_vinculo[:, 0], np.arange(len(d_licitacoes.chaves) + 1))
+        grau = fg.calcula_grau_competicao_lote(
+            d_licitacoes.offsets, d_licitacoes.vizinhos, inicio_arestas, arestas_vinculo[:, 1:]
+        )
+        linhas = (licitacoes['vinculo_em_uso'] == vinculo).to_numpy() & (ids >= 0)
+        grau_competicao[linhas] = grau[ids[linhas]]
+    licitacoes['grau competição'] = grau_competicao
+    return licitacoes
 
 
 def main():
-    # Carrega os 3 arquivos principais
-    dump_path = '../data/output/pickles/'
-    relacoes_entre_cnpjs = cd.salvar_relacoes_entre_cnpjs()
-    informacoes_licitacoes = cd.salvar_informacoes_licitacoes()
-    cnpjs_por_licitacao = cd.salvar_cnpjs_por_licitacao()
-    print("Files loaded.")
-
-    licitacoes_data = {
-        'ano': informacoes_licitacoes['num_exercicio_licitacao'],
-        'municipio': informacoes_licitacoes['nom_entidade'],
-        'modalidade': informacoes_licitacoes['nom_modalidade'],
-        'licitacao': informacoes_licitacoes['seq_dim_licitacao'],
-        'valor': informacoes_licitacoes['vlr_licitacao'],
-        'vinculo_em_uso': 1
-    }
-    licitacoes = pd.DataFrame(licitacoes_data)
-
-    # Dicionários necessários carregados por meio de funções implementadas
-    # externamente.
-    d_relacoes = cd.cnpjs_relacionados_por_cnpj(relacoes_entre_cnpjs)
-    d_licitacoes = cd.cnpjs_por_licitacao(cnpjs_por_licitacao)
-    print("Created dictionaries.")
-
-    # Gera a coluna dos grafos das licitações
-    licitacoes["grafo"] = licitacoes['licitacao'].apply(
-        lambda x: fg.gera_grafo_licitacao(x, d_relacoes, d_licitacoes)
-    )
-    print("Created graphs.")
-
-    # Gera a coluna dos cnpjs licitantes
-    licitacoes['cnpjs'] = licitacoes['licitacao'].apply(
-        lambda x: d_licitacoes[str(x)]
-    )
-
-    # Gera o grau de competição
-    licitacoes['grau competição'] = licitacoes['grafo'].apply(
-        lambda x: fg.calcula_grau_competicao(x)
-    )
-
-    # Salva o resultado em formato Pickle para processamento posterior por
-    # outros scripts na geração de relatórios.
-    licitacoes.to_pickle(dump_path + 'grau_competicao')
-    print("File saved to ", dump_path + 'grau_competicao')
+    with ins.etapa('calcula_competicao') as contagens:
+        # Carrega os 3 arquivos principais
+        dump_path = '../data/output/csv/'
+        relacoes_entre_cnpjs = cd.salvar_relacoes_vinculos(mg.vinculos)
+        informacoes_licitacoes = cd.salvar_informacoes_licitacoes()
+        cnpjs_por_licitacao = cd.salvar_cnpjs_por_licitacao()
+        print("Files loaded.")
+
+        # Extrai as arestas das licitações, sem gerar os grafos.
+        arestas, tipos, d_licitacoes = mg.extrai_arestas(relacoes_entre_cnpjs, cnpjs_por_licitacao)
+        print("Extracted edges.")
+
+        # Gera o grau de competição de cada combinação de vínculos.
+        licitacoes = mg.monta_tabela_licitacoes(informacoes_licitacoes, mg.vinculos)
+        licitacoes = calcula(licitacoes, arestas, d_licitacoes, tipos)
+
+        # Salva o resultado em arquivo csv para processamento posterior.
+        licitacoes.to_csv(dump_path + 'grau_competicao', index=False)
+        print("File saved to ", dump_path + 'grau_competicao')
+        contagens['linhas'] = len(licitacoes)
 
 
 if __name__ == '__main__':
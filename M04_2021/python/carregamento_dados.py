@@ -1,10 +1,52 @@
+import numpy as np
 import pandas as pd
 from collections import defaultdict
+from collections.abc import Mapping
 import os
 
+# Pacotes implementados
+import instrumentacao as ins
+
 data_path = "../data/input/"
+telefone_path = "../l_scripts/maximal-cross-graph-quasi-cliques/telefone-em-comum"
+
+# Tipos de vínculo, com os códigos definidos no cabeçalho do rel1.py. Em uma
+# combinação de vínculos, o vínculo de código c corresponde ao bit 1 << (c - 1)
+# da máscara e a combinação é escrita com os códigos separados por '+', como
+# em vinculo_em_uso = '1+3' (societário e telefone).
+VINCULO_SOCIETARIO = 1
+VINCULO_ENDERECO = 2
+VINCULO_TELEFONE = 3
+
+arquivos_vinculos = {
+    VINCULO_SOCIETARIO: data_path + 'relacao_societario_tratada.csv',
+    VINCULO_ENDERECO: data_path + 'relacao_cnpjs_endereco.csv',
+    VINCULO_TELEFONE: telefone_path
+}
+
+
+def mascara_vinculo(vinculo) -> int:
+    """Converte uma combinação de vínculos ('1', '1+3', 3, ...) em máscara de bits."""
+    mascara = 0
+    for codigo in str(vinculo).split('+'):
+        codigo = int(codigo)
+        if codigo not in arquivos_vinculos:
+            raise ValueError(f"vínculo desconhecido: {codigo}")
+        mascara |= 1 << (codigo - 1)
+    return mascara
+
+
+def formata_vinculo(mascara: int) -> str:
+    """Converte uma máscara de bits na combinação de vínculos ('1', '1+3', ...)."""
+    return '+'.join(str(codigo) for codigo in sorted(arquivos_vinculos) if mascara >> (codigo - 1) & 1)
 
 
+def normaliza_vinculo(vinculo) -> str:
+    """Escreve a combinação de vínculos na forma canônica ('3+1' -> '1+3')."""
+    return formata_vinculo(mascara_vinculo(vinculo))
+
+
+@ins.medido('carga.societario', ins.linhas)
 def salvar_relacoes_entre_cnpjs():
     return pd.read_csv(
         data_path + 'relacao_societario_tratada.csv',
@@ -14,6 +56,61 @@ def salvar_relacoes_entre_cnpjs():
     )
 
 
+@ins.medido('carga.endereco', ins.linhas)
+def salvar_relacoes_endereco():
+    """Carrega os pares de CNPJs com endereço em comum (o endereço é descartado)."""
+    return pd.read_csv(
+        arquivos_vinculos[VINCULO_ENDERECO],
+        sep=' ',
+        header=None,
+        names=['cnpj_1', 'cnpj_2', 'endereco'],
+        dtype=str
+    )[['cnpj_1', 'cnpj_2']]
+
+
+@ins.medido('carga.telefone', ins.linhas)
+def salvar_relacoes_telefone():
+    """Carrega os pares de CNPJs com telefone em comum. O arquivo tem uma linha
+    por licitação em que o par aparece; o vínculo não depende da licitação.
+    """
+    return pd.read_csv(
+        arquivos_vinculos[VINCULO_TELEFONE],
+        sep='[, ]+',
+        engine='python',
+        header=None,
+        names=['cnpj_1', 'cnpj_2', 'licitacao'],
+        dtype=str
+    )[['cnpj_1', 'cnpj_2']].drop_duplicates()
+
+
+@ins.medido('carga.relacoes', ins.linhas)
+def salvar_relacoes_vinculos(vinculos=('1',)) -> pd.DataFrame:
+    """Carrega em uma única tabela as relações de todos os tipos de vínculo
+    usados nas combinações recebidas. A coluna 'tipo' guarda a máscara dos
+    vínculos de cada par (cnpj_1, cnpj_2).
+    """
+    carregadores = {
+        VINCULO_SOCIETARIO: salvar_relacoes_entre_cnpjs,
+        VINCULO_ENDERECO: salvar_relacoes_endereco,
+        VINCULO_TELEFONE: salvar_relacoes_telefone
+    }
+    mascara = 0
+    for vinculo in vinculos:
+        mascara |= mascara_vinculo(vinculo)
+
+    camadas = []
+    for codigo, carregador in carregadores.items():
+        if mascara >> (codigo - 1) & 1:
+            relacoes = carregador()
+            relacoes['tipo'] = np.uint8(1 << (codigo - 1))
+            camadas.append(relacoes)
+    relacoes = pd.concat(camadas, ignore_index=True).drop_duplicates()
+
+    # Cada tipo aparece uma única vez por par, então a soma é o "ou" dos bits.
+    return relacoes.groupby(['cnpj_1', 'cnpj_2'], sort=False, as_index=False)['tipo'].sum()
+
+
+@ins.medido('carga.infos', ins.linhas)
 def salvar_informacoes_licitacoes():
     return pd.read_csv(
         data_path + 'infos_licitacoes.csv',
@@ -22,6 +119,7 @@ def salvar_informacoes_licitacoes():
     )
 
 
+@ins.medido('carga.licitantes', ins.linhas)
 def salvar_cnpjs_por_licitacao():
     return pd.read_csv(
         data_path + 'licitacoes_cnpjs_licitantes.csv',
@@ -58,6 +156,110 @@ def cnpjs_por_licitacao(cnpjs_por_licitacao: pd.DataFrame) -> dict:
     return d
 
 
+def interna_chaves(*colunas) -> pd.Index:
+    """Cria o vocabulário de chaves (CNPJs ou licitações) presentes nas colunas.
+    O ID inteiro de cada chave é a sua posição no índice ordenado retornado.
+    """
+    valores = pd.unique(np.concatenate([np.asarray(c, dtype=object) for c in colunas]))
+    return pd.Index(np.sort(valores.astype(str)), dtype=object)
+
+
+def ids_internados(vocabulario: pd.Index, valores) -> np.ndarray:
+    """Converte chaves em IDs int32 do vocabulário (-1 se a chave não existir)."""
+    return vocabulario.get_indexer(np.asarray(valores, dtype=object)).astype(np.int32)
+
+
+def monta_csr(origem: np.ndarray, destino: np.ndarray, n_chaves: int) -> tuple:
+    """Monta os vetores CSR (offsets, vizinhos) a partir de pares origem -> destino.
+    Os vizinhos de i ficam em vizinhos[offsets[i]:offsets[i + 1]], na ordem
+    original em que aparecem nos dados.
+    """
+    ordem = np.argsort(origem, kind='stable')
+    vizinhos = np.ascontiguousarray(destino[ordem], dtype=np.int32)
+    offsets = np.zeros(n_chaves + 1, dtype=np.int64)
+    np.cumsum(np.bincount(origem, minlength=n_chaves), out=offsets[1:])
+    return offsets, vizinhos
+
+
+class IndiceCSR(Mapping):
+    """Visão somente leitura, compatível com os dicionários deste módulo, de
+    listas armazenadas em formato CSR com IDs internados.
+
+    indice[chave] = [valor_1, ..., valor_n]
+
+    Assim como nos defaultdict originais, uma chave ausente retorna lista vazia.
+    Em índices de relações, tipos guarda a máscara de vínculos de cada vizinho
+    (None se as relações não tiverem tipo).
+    """
+
+    def __init__(self, offsets: np.ndarray, vizinhos: np.ndarray,
+                 chaves: pd.Index, valores: pd.Index, tipos: np.ndarray = None):
+        self.offsets = offsets
+        self.vizinhos = vizinhos
+        self.chaves = chaves
+        self.valores = valores
+        self.tipos = tipos
+
+    def ids(self, i: int) -> np.ndarray:
+        """Retorna os IDs dos valores associados à chave de ID i."""
+        return self.vizinhos[self.offsets[i]:self.offsets[i + 1]]
+
+    def grau(self) -> np.ndarray:
+        """Retorna a quantidade de valores associados a cada chave."""
+        return np.diff(self.offsets)
+
+    def __getitem__(self, chave) -> list:
+        try:
+            i = self.chaves.get_loc(str(chave))
+        except KeyError:
+            return []
+        return self.valores[self.ids(i)].tolist()
+
+    def __contains__(self, chave) -> bool:
+        try:
+            i = self.chaves.get_loc(str(chave))
+        except KeyError:
+            return False
+        return self.offsets[i + 1] > self.offsets[i]
+
+    def __iter__(self):
+        for i in np.flatnonzero(self.grau()):
+            yield self.chaves[i]
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.grau()))
+
+
+@ins.medido('carga.indices', lambda r: {'cnpjs': len(r[1].valores), 'licitacoes': len(r[1].chaves)})
+def indices_compactos(relacoes_entre_cnpjs: pd.DataFrame, cnpjs_por_licitacao: pd.DataFrame) -> tuple:
+    """Modo compacto de carregamento dos dicionários de relações e de licitações.
+    Cada CNPJ e cada seq_dim_licitacao é internado uma única vez em um ID int32 e
+    as listas são armazenadas como vetores CSR. Retorna (d_relacoes, d_licitacoes),
+    equivalentes a cnpjs_relacionados_por_cnpj e cnpjs_por_licitacao.
+    Se as relações tiverem a coluna 'tipo' (salvar_relacoes_vinculos), as
+    máscaras de vínculo ficam em d_relacoes.tipos.
+    """
+    relacoes = relacoes_entre_cnpjs[['cnpj_1', 'cnpj_2']].values
+    licitantes = cnpjs_por_licitacao.values
+    cnpjs = interna_chaves(relacoes[:, 0], relacoes[:, 1], licitantes[:, 1])
+    licitacoes = interna_chaves(licitantes[:, 0])
+
+    origem = ids_internados(cnpjs, relacoes[:, 0])
+    offsets, vizinhos = monta_csr(origem, ids_internados(cnpjs, relacoes[:, 1]), len(cnpjs))
+    tipos = None
+    if 'tipo' in relacoes_entre_cnpjs:
+        # A ordenação estável de monta_csr é a mesma para os tipos.
+        _, tipos = monta_csr(origem, relacoes_entre_cnpjs['tipo'].to_numpy(), len(cnpjs))
+        tipos = tipos.astype(np.uint8)
+    d_relacoes = IndiceCSR(offsets, vizinhos, cnpjs, cnpjs, tipos)
+
+    offsets, vizinhos = monta_csr(
+        ids_internados(licitacoes, licitantes[:, 0]), ids_internados(cnpjs, licitantes[:, 1]), len(licitacoes)
+    )
+    d_licitacoes = IndiceCSR(offsets, vizinhos, licitacoes, cnpjs)
+    return d_relacoes, d_licitacoes
+
+
 def licitacoes_por_municipio(informacoes_licitacoes: pd.DataFrame) -> dict:
     """Cada município presente em algum processo licitatório é uma chave do dicionário.
     Essa chave acessa uma lista de licitações naquele município.
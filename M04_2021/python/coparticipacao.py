@@ -0,0 +1,176 @@
+# ==============================================================================
+# COPARTICIPAÇÃO DE CNPJs EM LICITAÇÕES POR MUNICÍPIO, ANO E MODALIDADE
+# ==============================================================================
+
+# Monta uma única vez a matriz esparsa de incidência B (licitação x CNPJ, 1 se
+# o CNPJ foi licitante) e obtém, por produtos de matrizes esparsas:
+
+# coparticipacoes    (Bᵀ·B)[a, b], licitações em que a e b concorreram juntos
+# jaccard            coparticipacoes / (licitações de a + licitações de b - coparticipacoes)
+# vinculado          se o par tem algum vínculo nas relações carregadas
+
+# Com fatias (municipio, ano, modalidade ou combinações delas), as contagens
+# são calculadas somente com as linhas de B das licitações de cada fatia. A
+# saída tem os top pares de cada fatia, ordenados pela coparticipação:
+
+# fatia...;cnpj_1;cnpj_2;coparticipacoes;jaccard;vinculado
+
+# Uso: python coparticipacao.py [--fatias municipio ano] [--top K] [--minimo N]
+#                               [--vinculados] [--saida ARQUIVO]
+
+import argparse
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix, triu
+
+# Pacotes implementados
+import carregamento_dados as cd
+import instrumentacao as ins
+import modela_grafos as mg
+
+csv_path = '../data/output/csv/'
+
+FATIAS = ['municipio', 'ano', 'modalidade']
+
+# Matriz de incidência com os vocabulários das linhas (licitações) e das
+# colunas (CNPJs), ambos em ordem crescente.
+Incidencia = namedtuple('Incidencia', ['matriz', 'licitacoes', 'cnpjs'])
+
+
+def monta_incidencia(cnpjs_por_licitacao: pd.DataFrame, cnpjs: pd.Index = None) -> Incidencia:
+    """Monta a matriz de incidência licitação x CNPJ a partir do arquivo de
+    CNPJs licitantes. Licitantes repetidos contam uma única vez.
+    """
+    licitantes = cnpjs_por_licitacao.values
+    licitacoes = cd.interna_chaves(licitantes[:, 0])
+    if cnpjs is None:
+        cnpjs = cd.interna_chaves(licitantes[:, 1])
+    linhas = cd.ids_internados(licitacoes, licitantes[:, 0])
+    colunas = cd.ids_internados(cnpjs, licitantes[:, 1])
+    matriz = csr_matrix((np.ones(len(linhas), dtype=np.int32), (linhas, colunas)),
+                        shape=(len(licitacoes), len(cnpjs)))
+    matriz.data[:] = 1
+    return Incidencia(matriz, licitacoes, cnpjs)
+
+
+def chaves_vinculos(relacoes_entre_cnpjs: pd.DataFrame, cnpjs: pd.Index) -> np.ndarray:
+    """Pares vinculados (a < b, IDs do vocabulário de CNPJs) codificados como
+    a * len(cnpjs) + b, em ordem crescente e sem repetições.
+    """
+    a = cd.ids_internados(cnpjs, relacoes_entre_cnpjs['cnpj_1']).astype(np.int64)
+    b = cd.ids_internados(cnpjs, relacoes_entre_cnpjs['cnpj_2']).astype(np.int64)
+    existe = (a >= 0) & (b >= 0) & (a != b)
+    a, b = a[existe], b[existe]
+    return np.unique(np.minimum(a, b) * len(cnpjs) + np.maximum(a, b))
+
+
+def pares_coparticipacao(matriz: csr_matrix, minimo: int = 1) -> tuple:
+    """Pares (a < b) de colunas da matriz de incidência com pelo menos minimo
+    licitações em comum. Retorna (a, b, coparticipacoes, jaccard).
+    """
+    # Somente as colunas (CNPJs) presentes nas linhas participam do produto.
+    presentes = np.unique(matriz.indices)
+    sub = matriz[:, presentes]
+    graus = np.asarray(sub.sum(axis=0)).ravel()
+    produto = triu(sub.T.tocsr() @ sub, k=1).tocoo()
+    mantidos = produto.data >= minimo
+    i, j, contagem = produto.row[mantidos], produto.col[mantidos], produto.data[mantidos]
+    jaccard = contagem / (graus[i] + graus[j] - contagem)
+    return presentes[i], presentes[j], contagem, jaccard
+
+
+def top_pares(incidencia: Incidencia, linhas: np.ndarray = None, top: int = 10, minimo: int = 2,
+              vinculos: np.ndarray = None, somente_vinculados: bool = False) -> pd.DataFrame:
+    """Top pares de CNPJs por coparticipação nas licitações das linhas
+    informadas (todas por padrão). vinculos são as chaves de chaves_vinculos.
+    """
+    matriz = incidencia.matriz if linhas is None else incidencia.matriz[linhas]
+    a, b, contagem, jaccard = pares_coparticipacao(matriz, minimo)
+    n = len(incidencia.cnpjs)
+    if vinculos is not None:
+        chaves = a.astype(np.int64) * n + b
+        posicao = np.minimum(np.searchsorted(vinculos, chaves), max(len(vinculos) - 1, 0))
+        vinculado = (vinculos[posicao] == chaves) if len(vinculos) else np.zeros(len(chaves), dtype=bool)
+    else:
+        vinculado = np.zeros(len(a), dtype=bool)
+    if somente_vinculados:
+        a, b, contagem, jaccard, vinculado = (v[vinculado] for v in (a, b, contagem, jaccard, vinculado))
+
+    # Seleção parcial dos top pares antes de ordenar.
+    if top is not None and len(contagem) > top:
+        selecionados = np.argpartition(-contagem, top - 1)[:top]
+        limiar = contagem[selecionados].min()
+        selecionados = np.flatnonzero(contagem >= limiar)
+    else:
+        selecionados = np.arange(len(contagem))
+    ordem = selecionados[np.lexsort((-jaccard[selecionados], -contagem[selecionados]))][:top]
+    return pd.DataFrame({
+        'cnpj_1': np.asarray(incidencia.cnpjs)[a[ordem]],
+        'cnpj_2': np.asarray(incidencia.cnpjs)[b[ordem]],
+        'coparticipacoes': contagem[ordem],
+        'jaccard': jaccard[ordem],
+        'vinculado': vinculado[ordem]
+    })
+
+
+def top_pares_por_fatia(incidencia: Incidencia, informacoes_licitacoes: pd.DataFrame, fatias: list,
+                        top: int = 10, minimo: int = 2, vinculos: np.ndarray = None,
+                        somente_vinculados: bool = False) -> pd.DataFrame:
+    """Top pares de cada fatia (combinação dos valores das colunas fatias da
+    tabela de licitações de modela_grafos.monta_tabela_licitacoes).
+    """
+    tabela = mg.monta_tabela_licitacoes(informacoes_licitacoes).drop_duplicates('licitacao')
+    tabela = tabela.set_index('licitacao').reindex(incidencia.licitacoes)
+    if not fatias:
+        return top_pares(incidencia, None, top, minimo, vinculos, somente_vinculados)
+
+    # Licitações sem informações ficam fora de todas as fatias.
+    com_informacoes = np.flatnonzero(tabela[fatias].notna().all(axis=1).to_numpy())
+    codigos, valores = pd.factorize(pd.MultiIndex.from_frame(tabela[fatias].iloc[com_informacoes].astype(str)))
+    ordem = np.argsort(codigos, kind='stable')
+    inicio = np.searchsorted(codigos[ordem], np.arange(len(valores) + 1))
+    ordem = com_informacoes[ordem]
+
+    resultados = []
+    for k in range(len(valores)):
+        linhas = ordem[inicio[k]:inicio[k + 1]]
+        if len(linhas) == 0:
+            continue
+        pares = top_pares(incidencia, linhas, top, minimo, vinculos, somente_vinculados)
+        for nivel, fatia in enumerate(fatias):
+            pares.insert(nivel, fatia, valores[k][nivel])
+        resultados.append(pares)
+    colunas = fatias + ['cnpj_1', 'cnpj_2', 'coparticipacoes', 'jaccard', 'vinculado']
+    if not resultados:
+        return pd.DataFrame(columns=colunas)
+    return pd.concat(resultados, ignore_index=True)[colunas]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pares de CNPJs que mais concorrem juntos, por fatia.')
+    parser.add_argument('--fatias', nargs='*', choices=FATIAS, default=['municipio'],
+                        help='colunas que definem as fatias (nenhuma = todas as licitações juntas)')
+    parser.add_argument('--top', type=int, default=10, help='pares por fatia')
+    parser.add_argument('--minimo', type=int, default=2, help='mínimo de licitações em comum')
+    parser.add_argument('--vinculados', action='store_true', help='somente pares com vínculo')
+    parser.add_argument('--saida', default=csv_path + 'coparticipacao')
+    args = parser.parse_args()
+
+    with ins.etapa('coparticipacao') as contagens:
+        informacoes_licitacoes = cd.salvar_informacoes_licitacoes()
+        cnpjs_por_licitacao = cd.salvar_cnpjs_por_licitacao()
+        relacoes_entre_cnpjs = cd.salvar_relacoes_vinculos(mg.vinculos)
+
+        incidencia = monta_incidencia(cnpjs_por_licitacao)
+        vinculos = chaves_vinculos(relacoes_entre_cnpjs, incidencia.cnpjs)
+        pares = top_pares_por_fatia(incidencia, informacoes_licitacoes, args.fatias, args.top, args.minimo,
+                                    vinculos, args.vinculados)
+        pares.to_csv(args.saida, index=False)
+        contagens['linhas'] = len(pares)
+    print('Output saved to', args.saida)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,23 @@
+import hashlib
+import os
+import pickle
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import networkx as nx
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+# Pacotes implementados
+import instrumentacao as ins
+
+# Cache das métricas dos grafos reaproveitado entre execuções.
+cache_metricas_path = '../data/output/cache/metricas_grafos.pkl'
 
 
 def inicializa_grafo():
@@ -11,24 +28,322 @@ def inicializa_grafo():
 def gera_grafo_licitacao(licitacao: str, dic_relacoes, dic_licitacoes):
     """Gera o grafo da licitacao."""
     cnpjs_licitantes = dic_licitacoes[licitacao]
+    conjunto_licitantes = set(cnpjs_licitantes)
     G = inicializa_grafo()
     for cnpj in cnpjs_licitantes:
         G.add_node(cnpj)
         relacoes_do_cnpj = dic_relacoes[cnpj]
         for cnpj_relacionado in relacoes_do_cnpj:
-            if cnpj_relacionado in cnpjs_licitantes:
+            if cnpj_relacionado in conjunto_licitantes:
                 G.add_edge(cnpj, cnpj_relacionado)
     return G
 
 
+@ins.medido('grafos.arestas', lambda r: {'arestas': len(r[0])})
+def extrai_arestas_tipadas(d_relacoes, d_licitacoes) -> tuple:
+    """Extrai, em uma única passada vetorizada, as arestas induzidas de todas as
+    licitações e a máscara de vínculos de cada uma. Recebe os índices CSR de
+    carregamento_dados.indices_compactos.
+
+    Cada licitante (licitacao, cnpj_a) é unido às relações de cnpj_a e cada
+    relação (cnpj_a, cnpj_b) é mantida se (licitacao, cnpj_b) também for um
+    licitante. Retorna um vetor int32 (n, 3) de linhas (licitacao, cnpj_a, cnpj_b)
+    em IDs internados, sem repetições e ordenado por licitação, e um vetor
+    uint8 com a união dos tipos de vínculo de cada aresta.
+    """
+    n_cnpjs = len(d_licitacoes.valores)
+    grau_licitacoes = d_licitacoes.grau()
+    licitacao = np.repeat(np.arange(len(grau_licitacoes), dtype=np.int64), grau_licitacoes)
+    cnpj_a = d_licitacoes.vizinhos.astype(np.int64)
+    licitantes = licitacao * n_cnpjs + cnpj_a
+
+    # Expande cada licitante nas relações do seu CNPJ.
+    inicio = d_relacoes.offsets[cnpj_a]
+    grau = d_relacoes.offsets[cnpj_a + 1] - inicio
+    deslocamento = np.arange(grau.sum(), dtype=np.int64) - np.repeat(np.cumsum(grau) - grau, grau)
+    posicao = np.repeat(inicio, grau) + deslocamento
+    cnpj_b = d_relacoes.vizinhos[posicao].astype(np.int64)
+    licitacao = np.repeat(licitacao, grau)
+    cnpj_a = np.repeat(cnpj_a, grau)
+    if d_relacoes.tipos is None:
+        tipos = np.ones(len(posicao), dtype=np.uint8)
+    else:
+        tipos = d_relacoes.tipos[posicao]
+
+    # Mantém somente as relações cujo outro extremo também é licitante.
+    induzida = np.isin(licitacao * n_cnpjs + cnpj_b, licitantes)
+
+    arestas = np.stack([
+        licitacao[induzida],
+        np.minimum(cnpj_a[induzida], cnpj_b[induzida]),
+        np.maximum(cnpj_a[induzida], cnpj_b[induzida]),
+    ], axis=1).astype(np.int32)
+    tipos = tipos[induzida]
+
+    # Grafos não direcionados: a mesma aresta pode surgir nos dois sentidos,
+    # possivelmente com tipos diferentes, que são unidos.
+    if len(arestas):
+        ordem = np.lexsort((arestas[:, 2], arestas[:, 1], arestas[:, 0]))
+        arestas = arestas[ordem]
+        nova = np.ones(len(arestas), dtype=bool)
+        nova[1:] = np.any(arestas[1:] != arestas[:-1], axis=1)
+        tipos = np.bitwise_or.reduceat(tipos[ordem], np.flatnonzero(nova))
+        arestas = arestas[nova]
+    return arestas, tipos
+
+
+def extrai_arestas_induzidas(d_relacoes, d_licitacoes) -> np.ndarray:
+    """Extrai as arestas induzidas de todas as licitações, sem os tipos de
+    vínculo. Veja extrai_arestas_tipadas.
+    """
+    return extrai_arestas_tipadas(d_relacoes, d_licitacoes)[0]
+
+
+def filtra_vinculos(arestas: np.ndarray, tipos: np.ndarray, mascara: int) -> np.ndarray:
+    """Mantém as arestas com algum dos vínculos da máscara."""
+    return arestas[(tipos & mascara) != 0]
+
+
+@ins.medido('grafos.networkx', lambda r: {'grafos': len(r)})
+def gera_grafos_licitacoes(licitacoes, arestas: np.ndarray, d_licitacoes) -> list:
+    """Gera os grafos das licitações a partir das arestas de extrai_arestas_induzidas.
+    Retorna uma lista de grafos na mesma ordem das licitações recebidas.
+    """
+    cnpjs = np.asarray(d_licitacoes.valores, dtype=object)
+    inicio_arestas = np.searchsorted(arestas[:, 0], np.arange(len(d_licitacoes.chaves) + 1))
+    ids = d_licitacoes.chaves.get_indexer(pd.Index(licitacoes).astype(str))
+
+    grafos = []
+    for i in ids:
+        G = inicializa_grafo()
+        if i >= 0:
+            G.add_nodes_from(cnpjs[d_licitacoes.ids(i)])
+            arestas_licitacao = arestas[inicio_arestas[i]:inicio_arestas[i + 1]]
+            G.add_edges_from(zip(cnpjs[arestas_licitacao[:, 1]], cnpjs[arestas_licitacao[:, 2]]))
+        grafos.append(G)
+    return grafos
+
+
+# Grafos com até LIMITE_BITSET vértices têm as cliques enumeradas com
+# máscaras de bits; os maiores usam o networkX.
+LIMITE_BITSET = 64
+
+
+class OrcamentoEsgotado(Exception):
+    """Sinaliza que o orçamento de tempo ou de cliques de um grafo acabou."""
+
+
+def conta_bits(mascara: int) -> int:
+    """Retorna a quantidade de bits ligados na máscara."""
+    return bin(mascara).count('1')
+
+
+if hasattr(int, 'bit_count'):
+    conta_bits = int.bit_count
+
+
+def mascaras_adjacencia(grafo: nx.Graph, vertices: list) -> list:
+    """Retorna a vizinhança de cada vértice como máscara de bits sobre as
+    posições em vertices. Laços são ignorados.
+    """
+    indice = {v: i for i, v in enumerate(vertices)}
+    vizinhanca = [0] * len(vertices)
+    for u, v in grafo.edges:
+        if u != v:
+            vizinhanca[indice[u]] |= 1 << indice[v]
+            vizinhanca[indice[v]] |= 1 << indice[u]
+    return vizinhanca
+
+
+def poda_k_core(grafo: nx.Graph, k: int) -> nx.Graph:
+    """Retorna o k-core do grafo (laços são ignorados). Toda clique com mais de
+    k vértices está contida nele.
+    """
+    if k <= 0:
+        return grafo
+    if nx.number_of_selfloops(grafo):
+        grafo = grafo.copy()
+        grafo.remove_edges_from(list(nx.selfloop_edges(grafo)))
+    return nx.k_core(grafo, k)
+
+
+def cliques_maximais_bitset(grafo: nx.Graph, limite_cliques: int = None, prazo: float = None) -> list:
+    """Enumera as cliques maximais do grafo com Bron–Kerbosch com pivoteamento,
+    representando a vizinhança de cada vértice como uma máscara de bits.
+    Produz as mesmas cliques que nx.find_cliques (laços são ignorados e
+    vértices isolados formam cliques de tamanho 1).
+
+    Se limite_cliques ou prazo (instante de time.perf_counter) forem
+    informados e excedidos, OrcamentoEsgotado é lançada com as cliques já
+    encontradas em seu primeiro argumento.
+    """
+    vertices = list(grafo)
+    vizinhanca = mascaras_adjacencia(grafo, vertices)
+    cliques = []
+
+    def emite(clique: list):
+        cliques.append([vertices[i] for i in clique])
+        if limite_cliques is not None and len(cliques) >= limite_cliques:
+            raise OrcamentoEsgotado(cliques)
+
+    def expande(clique: list, candidatos: int, excluidos: int):
+        if prazo is not None and time.perf_counter() > prazo:
+            raise OrcamentoEsgotado(cliques)
+        if not candidatos:
+            if not excluidos:
+                emite(clique)
+            return
+
+        # O pivô é o vértice de candidatos | excluidos com mais vizinhos
+        # entre os candidatos.
+        pivo_vizinhos, maior = 0, -1
+        total = conta_bits(candidatos)
+        restantes = candidatos | excluidos
+        while restantes and maior < total:
+            bit = restantes & -restantes
+            restantes ^= bit
+            vizinhos = vizinhanca[bit.bit_length() - 1] & candidatos
+            quantidade = conta_bits(vizinhos)
+            if quantidade > maior:
+                pivo_vizinhos, maior = vizinhos, quantidade
+
+        restantes = candidatos & ~pivo_vizinhos
+        while restantes:
+            bit = restantes & -restantes
+            restantes ^= bit
+            v = bit.bit_length() - 1
+            clique.append(v)
+            novos_candidatos = candidatos & vizinhanca[v]
+            novos_excluidos = excluidos & vizinhanca[v]
+            if novos_candidatos:
+                expande(clique, novos_candidatos, novos_excluidos)
+            elif not novos_excluidos:
+                # Folha da recursão resolvida sem nova chamada.
+                emite(clique)
+            clique.pop()
+            candidatos &= ~bit
+            excluidos |= bit
+
+    if vertices:
+        expande([], (1 << len(vertices)) - 1, 0)
+    return cliques
+
+
+def encontra_cliques(grafo: nx.Graph) -> list:
+    """Retorna as cliques maximais do grafo, usando máscaras de bits para
+    grafos pequenos e o networkX para os demais.
+    """
+    if grafo.number_of_nodes() <= LIMITE_BITSET:
+        return cliques_maximais_bitset(grafo)
+    return list(nx.find_cliques(grafo))
+
+
+def enumera_cliques(grafo: nx.Graph, tamanho_minimo: int = 2, limite_cliques: int = None,
+                    tempo_limite: float = None) -> tuple:
+    """Modo limitado da enumeração das cliques maximais com pelo menos
+    tamanho_minimo vértices. O grafo é podado ao (tamanho_minimo - 1)-core e a
+    enumeração para ao atingir limite_cliques cliques ou tempo_limite segundos.
+    Retorna (cliques, truncado), em que truncado indica se algum limite foi atingido.
+    """
+    prazo = time.perf_counter() + tempo_limite if tempo_limite is not None else None
+    grafo = poda_k_core(grafo, tamanho_minimo - 1)
+    try:
+        if grafo.number_of_nodes() <= LIMITE_BITSET:
+            cliques = cliques_maximais_bitset(grafo, limite_cliques, prazo)
+        else:
+            cliques = []
+            for clique in nx.find_cliques(grafo):
+                cliques.append(clique)
+                if (limite_cliques is not None and len(cliques) >= limite_cliques) or \
+                        (prazo is not None and time.perf_counter() > prazo):
+                    raise OrcamentoEsgotado(cliques)
+    except OrcamentoEsgotado as orcamento:
+        return [c for c in orcamento.args[0] if len(c) >= tamanho_minimo], True
+    return [c for c in cliques if len(c) >= tamanho_minimo], False
+
+
+def max_clique(grafo: nx.Graph, tempo_limite: float = None, limite_nos: int = None) -> tuple:
+    """Busca uma clique máxima por branch-and-bound com limitantes por coloração
+    gulosa (MCQ) sobre máscaras de bits. Vértices cujo core é menor que o tamanho
+    da melhor clique já encontrada são podados.
+    Retorna (clique, exata); exata é False se o tempo_limite ou o limite_nos
+    (número de nós da árvore de busca) forem atingidos antes de provar a
+    otimalidade, caso em que a melhor clique encontrada é retornada.
+    """
+    if grafo.number_of_nodes() == 0:
+        return [], True
+    prazo = time.perf_counter() + tempo_limite if tempo_limite is not None else None
+    sem_lacos = poda_k_core(grafo, 1)
+    if sem_lacos.number_of_nodes() == 0:
+        return [next(iter(grafo))], True
+
+    # Clique inicial gulosa a partir do vértice de maior core.
+    core = nx.core_number(sem_lacos)
+    melhor = [max(core, key=core.get)]
+    for v in sorted(sem_lacos[melhor[0]], key=core.get, reverse=True):
+        if all(sem_lacos.has_edge(v, u) for u in melhor):
+            melhor.append(v)
+
+    # Poda pelo core e ordena os vértices por core decrescente.
+    vertices = sorted((v for v in core if core[v] >= len(melhor)), key=core.get, reverse=True)
+    if not vertices:
+        return melhor, True
+    vizinhanca = mascaras_adjacencia(sem_lacos.subgraph(vertices), vertices)
+
+    def colore(candidatos: int) -> tuple:
+        ordem, cores = [], []
+        cor = 0
+        sem_cor = candidatos
+        while sem_cor:
+            cor += 1
+            disponiveis = sem_cor
+            while disponiveis:
+                bit = disponiveis & -disponiveis
+                v = bit.bit_length() - 1
+                sem_cor &= ~bit
+                disponiveis &= ~bit & ~vizinhanca[v]
+                ordem.append(v)
+                cores.append(cor)
+        return ordem, cores
+
+    nos = 0
+
+    def expande(clique: list, candidatos: int):
+        nonlocal melhor, nos
+        if prazo is not None and time.perf_counter() > prazo:
+            raise OrcamentoEsgotado()
+        nos += 1
+        if limite_nos is not None and nos > limite_nos:
+            raise OrcamentoEsgotado()
+        ordem, cores = colore(candidatos)
+        for i in range(len(ordem) - 1, -1, -1):
+            if len(clique) + cores[i] <= len(melhor):
+                return
+            v = ordem[i]
+            clique.append(v)
+            novos_candidatos = candidatos & vizinhanca[v]
+            if novos_candidatos:
+                expande(clique, novos_candidatos)
+            elif len(clique) > len(melhor):
+                melhor = [vertices[j] for j in clique]
+            clique.pop()
+            candidatos &= ~(1 << v)
+
+    try:
+        expande([], (1 << len(vertices)) - 1)
+    except OrcamentoEsgotado:
+        return melhor, False
+    return melhor, True
+
+
 def lista_cliques(grafo: nx.Graph) -> list:
     """Retorna a lista de cliques encontradas no grafo."""
-    return list(nx.find_cliques(grafo))
+    return encontra_cliques(grafo)
 
 
 def conta_cliques(grafo: nx.Graph) -> int:
     """Conta o numero de cliques ignorando aquelas de tamanho menor que 2."""
-    cliques = list(nx.find_cliques(grafo))
+    cliques = encontra_cliques(grafo)
     qtd = 0
     for clique in cliques:
         tamanho = len(clique)
@@ -41,9 +356,8 @@ def expande_cliques(linha: pd.Series) -> list:
     """Retorna uma lista de tuplas em que cada tupla armazena os cnpjs daquela
     clique e o tamanho da clique (se a clique é menor que 2 é ignorada.).
     """
-    resultado = pd.DataFrame(linha)
     grafo = linha['grafo']
-    cliques = list(nx.find_cliques(grafo))
+    cliques = encontra_cliques(grafo)
     resultado = []
     for clique in cliques:
         tamanho = len(clique)
@@ -57,14 +371,9 @@ def calcula_densidade(grafo: nx.Graph) -> float:
     return nx.density(grafo)
 
 
-def lista_cnpjs_max_clique(grafo: nx.Graph) -> list:
+def lista_cnpjs_max_clique(grafo: nx.Graph, tempo_limite: float = None) -> list:
     """Retorna lista dos cnpjs integrantes da max clique."""
-    cliques = list(nx.find_cliques(grafo))
-    cliques.sort(reverse=True, key=len)
-    try:
-        return cliques[0]
-    except:
-        return []
+    return max_clique(grafo, tempo_limite)[0]
 
 
 def calcula_tamanho_max_clique(cliques: list):
@@ -98,6 +407,261 @@ def calcula_grau_competicao(grafo: nx.Graph) -> int:
         return float('NaN')
 
 
+@ins.medido('grafos.grau_competicao', lambda r: {'grafos': len(r)})
+def calcula_grau_competicao_lote(offsets_vertices: np.ndarray, vertices: np.ndarray,
+                                 offsets_arestas: np.ndarray, arestas: np.ndarray) -> np.ndarray:
+    """Calcula o grau de competição de vários grafos de uma só vez, sem
+    montar os grafos networkX.
+
+    Os vértices do grafo i são vertices[offsets_vertices[i]:offsets_vertices[i + 1]]
+    e as suas arestas são as linhas (a, b) de arestas[offsets_arestas[i]:offsets_arestas[i + 1]],
+    em IDs internados. Retorna um vetor com o grau de cada grafo (NaN se vazio).
+    """
+    n_grafos = len(offsets_vertices) - 1
+    n_ids = int(max(vertices.max(initial=-1), arestas.max(initial=-1))) + 1
+
+    # Cada vértice (grafo, id) vira uma chave única, de forma que todos os
+    # grafos formam um único grafo esparso com um bloco por licitação.
+    grafo_vertices = np.repeat(np.arange(n_grafos, dtype=np.int64), np.diff(offsets_vertices))
+    chaves = np.unique(grafo_vertices * n_ids + vertices)
+    grafo_arestas = np.repeat(np.arange(n_grafos, dtype=np.int64), np.diff(offsets_arestas))
+    origem = np.searchsorted(chaves, grafo_arestas * n_ids + arestas[:, 0])
+    destino = np.searchsorted(chaves, grafo_arestas * n_ids + arestas[:, 1])
+
+    adjacencia = coo_matrix(
+        (np.ones(len(origem), dtype=np.int8), (origem, destino)),
+        shape=(len(chaves), len(chaves))
+    ).tocsr()
+    n_componentes, rotulos = connected_components(adjacencia, directed=False)
+
+    # Todos os vértices de uma componente pertencem ao mesmo grafo.
+    grafo_componentes = np.empty(n_componentes, dtype=np.int64)
+    grafo_componentes[rotulos] = chaves // n_ids
+    componentes = np.bincount(grafo_componentes, minlength=n_grafos)
+    quantidade_vertices = np.bincount(chaves // n_ids, minlength=n_grafos)
+
+    grau = np.full(n_grafos, np.nan)
+    np.divide(componentes, quantidade_vertices, out=grau, where=quantidade_vertices != 0)
+    return grau
+
+
+# Registro com todas as métricas de um grafo. A lista de cliques guarda somente
+# as cliques maximais de tamanho maior ou igual a 2, enquanto o tamanho da max
+# clique considera também vértices isolados (cliques de tamanho 1). truncado
+# indica que o orçamento do grafo acabou e as cliques estão incompletas, e
+# max_clique_exata é False se a max clique também não foi provada ótima.
+Metricas = namedtuple('Metricas', [
+    'quantidade_vertices', 'quantidade_arestas', 'densidade', 'componentes',
+    'cliques', 'tamanho_max_clique', 'grau_competicao', 'truncado', 'max_clique_exata'
+], defaults=(False, True))
+
+
+def calcula_metricas(grafo: nx.Graph, limite_cliques: int = None, tempo_limite: float = None) -> Metricas:
+    """Calcula todas as métricas do grafo percorrendo-o uma única vez.
+    Grafos sem arestas ou com uma única aresta, a grande maioria, são
+    resolvidos sem percorrer o grafo.
+
+    Se limite_cliques ou tempo_limite (segundos) forem informados, as cliques
+    são enumeradas no modo limitado e a max clique é obtida por branch-and-bound.
+    tempo_limite vale para o grafo todo: o branch-and-bound usa o que sobrou
+    da enumeração. limite_cliques também limita o número de nós do
+    branch-and-bound, para que o modo limitado só pela contagem termine.
+    """
+    n = grafo.number_of_nodes()
+    m = grafo.number_of_edges()
+    if n == 0:
+        return Metricas(0, 0, 0, 0, [], 0, float('NaN'))
+    densidade = nx.density(grafo)
+    if m == 0:
+        return Metricas(n, 0, densidade, n, [], 1, 1.0)
+    if m == 1:
+        u, v = next(iter(grafo.edges))
+        if u != v:
+            return Metricas(n, 1, densidade, n - 1, [[u, v]], 2, (n - 1) / n)
+
+    componentes = nx.number_connected_components(grafo)
+    if limite_cliques is not None or tempo_limite is not None:
+        inicio = time.perf_counter()
+        cliques, truncado = enumera_cliques(grafo, 2, limite_cliques, tempo_limite)
+        exata = True
+        if truncado:
+            restante = None
+            if tempo_limite is not None:
+                restante = max(tempo_limite - (time.perf_counter() - inicio), 0.0)
+            maior, exata = max_clique(grafo, restante, limite_cliques)
+            tamanho_max_clique = len(maior)
+        else:
+            tamanho_max_clique = max([len(clique) for clique in cliques], default=1)
+        return Metricas(n, m, densidade, componentes, cliques, tamanho_max_clique, componentes / n, truncado,
+                        exata)
+
+    cliques = []
+    tamanho_max_clique = 0
+    for clique in encontra_cliques(grafo):
+        tamanho_max_clique = max(tamanho_max_clique, len(clique))
+        if len(clique) >= 2:
+            cliques.append(clique)
+    return Metricas(n, m, densidade, componentes, cliques, tamanho_max_clique, componentes / n)
+
+
+def impressao_digital(grafo: nx.Graph, limite_cliques: int = None, tempo_limite: float = None) -> bytes:
+    """Identifica o grafo pelo conjunto ordenado de vértices e pelo conjunto
+    ordenado de arestas (cada uma com o menor vértice primeiro), junto com os
+    orçamentos da enumeração das cliques.
+    """
+    vertices = sorted(map(str, grafo.nodes))
+    arestas = sorted(tuple(sorted((str(u), str(v)))) for u, v in grafo.edges)
+    return hashlib.blake2b(repr((vertices, arestas, limite_cliques, tempo_limite)).encode(),
+                           digest_size=16).digest()
+
+
+class CacheMetricas:
+    """Cache LRU das métricas dos grafos, indexado pela impressão digital do
+    grafo. As mesmas empresas concorrem juntas em muitas licitações, e as
+    métricas de grafos idênticos são calculadas uma única vez.
+
+    O cache é lido de caminho e salvo nele (salva), sendo reaproveitado entre
+    execuções enquanto o código deste módulo não mudar. Com caminho None, ele
+    fica somente em memória.
+    """
+
+    def __init__(self, capacidade: int = 100000, caminho: str = cache_metricas_path):
+        self.capacidade = capacidade
+        self.caminho = caminho
+        self.acertos = 0
+        self.faltas = 0
+        self._itens = OrderedDict()
+        if caminho is not None and os.path.exists(caminho):
+            with open(caminho, 'rb') as f:
+                versao, itens = pickle.load(f)
+            if versao == self.versao():
+                self._itens = itens
+                self._limita()
+
+    @staticmethod
+    def versao() -> str:
+        with open(__file__, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    def __len__(self) -> int:
+        return len(self._itens)
+
+    def busca(self, chave: bytes):
+        """Retorna as métricas da chave (None se não estiverem no cache)."""
+        registro = self._itens.get(chave)
+        if registro is None:
+            self.faltas += 1
+        else:
+            self.acertos += 1
+            self._itens.move_to_end(chave)
+        return registro
+
+    def guarda(self, chave: bytes, registro: Metricas):
+        self._itens[chave] = registro
+        self._itens.move_to_end(chave)
+        self._limita()
+
+    def _limita(self):
+        while len(self._itens) > self.capacidade:
+            self._itens.popitem(last=False)
+
+    def taxa_acertos(self) -> float:
+        consultas = self.acertos + self.faltas
+        return self.acertos / consultas if consultas else 0.0
+
+    def estatisticas(self) -> dict:
+        """Contagens do cache, registradas pela instrumentação das etapas."""
+        return {'acertos': self.acertos, 'faltas': self.faltas, 'itens': len(self)}
+
+    def salva(self):
+        if self.caminho is None:
+            return
+        os.makedirs(os.path.dirname(self.caminho) or '.', exist_ok=True)
+        temporario = self.caminho + '.tmp'
+        with open(temporario, 'wb') as f:
+            pickle.dump((self.versao(), self._itens), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporario, self.caminho)
+
+
+def calcula_metricas_lote(grafos, processos: int = 1, tamanho_lote: int = 1000,
+                          limite_cliques: int = None, tempo_limite: float = None,
+                          cache: CacheMetricas = None) -> list:
+    """Calcula as métricas de vários grafos, na mesma ordem recebida.
+    Com mais de um processo, o trabalho é distribuído em lotes de
+    tamanho_lote grafos entre os processos. limite_cliques e tempo_limite
+    são os orçamentos de cada grafo (ver calcula_metricas).
+
+    Com cache, grafos com pelo menos 2 arestas são buscados no cache e os
+    grafos idênticos do lote são calculados uma única vez. Os demais são
+    resolvidos mais rapidamente do que a impressão digital. Métricas truncadas
+    dependem do tempo de execução e não são guardadas no cache.
+    """
+    calcula = partial(calcula_metricas, limite_cliques=limite_cliques, tempo_limite=tempo_limite)
+    if cache is None:
+        if processos <= 1:
+            return [calcula(grafo) for grafo in grafos]
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            return list(executor.map(calcula, grafos, chunksize=tamanho_lote))
+
+    grafos = list(grafos)
+    registros = [None] * len(grafos)
+    pendentes = {}
+    for i, grafo in enumerate(grafos):
+        if grafo.number_of_edges() < 2:
+            pendentes[i] = [i]
+            continue
+        chave = impressao_digital(grafo, limite_cliques, tempo_limite)
+        if chave in pendentes:
+            # Repetição de um grafo do lote que ainda será calculado.
+            cache.acertos += 1
+            pendentes[chave].append(i)
+            continue
+        registros[i] = cache.busca(chave)
+        if registros[i] is None:
+            pendentes[chave] = [i]
+
+    chaves = list(pendentes)
+    calculados = calcula_metricas_lote([grafos[pendentes[chave][0]] for chave in chaves],
+                                       processos, tamanho_lote, limite_cliques, tempo_limite)
+    for chave, registro in zip(chaves, calculados):
+        if isinstance(chave, bytes) and not registro.truncado:
+            cache.guarda(chave, registro)
+        for i in pendentes[chave]:
+            registros[i] = registro
+    return registros
+
+
+def contagens_metricas(metricas: dict) -> dict:
+    """Quantidade de grafos, de cliques, de grafos truncados e de max cliques
+    não provadas ótimas em d[vinculo][licitacao].
+    """
+    registros = [registro for d in metricas.values() for registro in d.values()]
+    return {
+        'grafos': len(registros),
+        'cliques': sum(len(registro.cliques) for registro in registros),
+        'truncados': sum(bool(registro.truncado) for registro in registros),
+        'max_cliques_aproximadas': sum(not registro.max_clique_exata for registro in registros)
+    }
+
+
+@ins.medido('grafos.metricas', contagens_metricas)
+def calcula_metricas_vinculos(grafos: dict, processos: int = 1, tamanho_lote: int = 1000,
+                              limite_cliques: int = None, tempo_limite: float = None,
+                              cache: CacheMetricas = None) -> dict:
+    """Calcula, em um único lote, as métricas dos grafos d[vinculo][licitacao]
+    de todas as combinações de vínculos. Retorna d[vinculo][licitacao] = Metricas.
+    """
+    chaves = [(vinculo, licitacao) for vinculo, d in grafos.items() for licitacao in d]
+    registros = calcula_metricas_lote(
+        (grafos[vinculo][licitacao] for vinculo, licitacao in chaves),
+        processos, tamanho_lote, limite_cliques, tempo_limite, cache
+    )
+    metricas = {vinculo: {} for vinculo in grafos}
+    for (vinculo, licitacao), registro in zip(chaves, registros):
+        metricas[vinculo][licitacao] = registro
+    return metricas
+
+
 def plota_grafo(grafo: nx.Graph, titulo: str, caminho_saida: str = None) -> plt.figure:
     """Plota o grafo.
     """
@@ -0,0 +1,174 @@
+# ==============================================================================
+# GERAÇÃO DE DADOS SINTÉTICOS
+# ==============================================================================
+
+# Gera arquivos no formato das entradas do projeto, para testes e medições de
+# desempenho sem os dados reais:
+
+# infos_licitacoes.csv               uma linha por licitação (separador ';')
+# licitacoes_cnpjs_licitantes.csv    seq_dim_licitacao;cnpj
+# relacao_societario_tratada.csv     cnpj_1,cnpj_2 (sem cabeçalho, cnpj_1 < cnpj_2)
+
+# Os CNPJs são divididos em grupos econômicos (tamanho geométrico com média
+# tamanho_grupo). Cada par de CNPJs de um mesmo grupo é vinculado com
+# probabilidade densidade e, além disso, vinculos_aleatorios * cnpjs pares
+# quaisquer são vinculados. Uma fração prob_grupo das licitações tem como
+# primeiros licitantes os CNPJs de um grupo, o que produz cliques nos grafos.
+
+# Uso: python gera_dados_sinteticos.py destino [--licitacoes N] [--cnpjs N]
+#          [--media-licitantes M] [--distribuicao {poisson,geometrica}]
+#          [--densidade P] [--tamanho-grupo T] [--prob-grupo P]
+#          [--vinculos-aleatorios R] [--semente S]
+
+import argparse
+import os
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+Parametros = namedtuple('Parametros', [
+    'licitacoes', 'cnpjs', 'media_licitantes', 'distribuicao', 'densidade',
+    'tamanho_grupo', 'prob_grupo', 'vinculos_aleatorios', 'semente'
+])
+
+PADRAO = Parametros(
+    licitacoes=10000,
+    cnpjs=20000,
+    media_licitantes=4.0,
+    distribuicao='poisson',
+    densidade=0.5,
+    tamanho_grupo=3.0,
+    prob_grupo=0.3,
+    vinculos_aleatorios=0.05,
+    semente=0
+)
+
+MODALIDADES = ['Concorrência', 'Convite', 'Pregão Eletrônico', 'Pregão Presencial', 'Tomada de Preços']
+PRIMEIRA_LICITACAO = 700000
+
+
+def quantidade_licitantes(rng, p: Parametros) -> np.ndarray:
+    """Sorteia a quantidade de licitantes de cada licitação (pelo menos 1)."""
+    if p.distribuicao == 'poisson':
+        quantidade = 1 + rng.poisson(max(p.media_licitantes - 1, 0), p.licitacoes)
+    elif p.distribuicao == 'geometrica':
+        # Cauda longa: poucas licitações com muitos licitantes.
+        quantidade = rng.geometric(1 / max(p.media_licitantes, 1), p.licitacoes)
+    else:
+        raise ValueError(f"distribuição desconhecida: {p.distribuicao}")
+    return np.minimum(quantidade, p.cnpjs)
+
+
+def grupos_economicos(rng, p: Parametros) -> tuple:
+    """Divide os CNPJs 0..cnpjs-1, em ordem, em grupos. Retorna (inicio, tamanho)."""
+    tamanhos = rng.geometric(1 / max(p.tamanho_grupo, 1), p.cnpjs)
+    fim = np.cumsum(tamanhos)
+    n = int(np.searchsorted(fim, p.cnpjs)) + 1
+    tamanhos = tamanhos[:n].copy()
+    tamanhos[-1] -= fim[n - 1] - p.cnpjs
+    return np.cumsum(tamanhos) - tamanhos, tamanhos
+
+
+def gera_cnpjs(rng, n: int) -> np.ndarray:
+    """Sorteia n CNPJs distintos de 14 dígitos."""
+    numeros = rng.choice(9 * 10 ** 13, n, replace=False) + 10 ** 13
+    return numeros.astype(str)
+
+
+def gera_vinculos(rng, p: Parametros, inicio: np.ndarray, tamanho: np.ndarray) -> np.ndarray:
+    """Sorteia os pares (a, b) de IDs de CNPJs vinculados, com a < b."""
+    # Todos os pares de cada grupo: o membro k do grupo é combinado com os
+    # tamanho - k - 1 membros seguintes (os grupos são contíguos).
+    membro = np.arange(p.cnpjs)
+    posicao = membro - np.repeat(inicio, tamanho)
+    seguintes = np.repeat(tamanho, tamanho) - posicao - 1
+    a = np.repeat(membro, seguintes)
+    b = a + 1 + np.arange(len(a)) - np.repeat(np.cumsum(seguintes) - seguintes, seguintes)
+    sorteados = rng.random(len(a)) < p.densidade
+    pares = np.column_stack([a[sorteados], b[sorteados]])
+
+    aleatorios = rng.integers(0, p.cnpjs, size=(int(p.vinculos_aleatorios * p.cnpjs), 2))
+    aleatorios = aleatorios[aleatorios[:, 0] != aleatorios[:, 1]]
+    pares = np.concatenate([pares, np.sort(aleatorios, axis=1)])
+    return np.unique(pares, axis=0)
+
+
+def gera_licitantes(rng, p: Parametros, inicio: np.ndarray, tamanho: np.ndarray) -> tuple:
+    """Sorteia os licitantes de cada licitação. Retorna (licitacao, cnpj) em IDs."""
+    quantidade = quantidade_licitantes(rng, p)
+    licitacao = np.repeat(np.arange(p.licitacoes), quantidade)
+    cnpj = rng.integers(0, p.cnpjs, len(licitacao))
+
+    # Nas licitações com grupo, os primeiros licitantes são os CNPJs do grupo.
+    grupo = rng.integers(0, len(tamanho), p.licitacoes)
+    com_grupo = rng.random(p.licitacoes) < p.prob_grupo
+    posicao = np.arange(len(licitacao)) - np.repeat(np.cumsum(quantidade) - quantidade, quantidade)
+    do_grupo = com_grupo[licitacao] & (posicao < tamanho[grupo][licitacao])
+    cnpj[do_grupo] = inicio[grupo][licitacao[do_grupo]] + posicao[do_grupo]
+
+    # Um CNPJ participa no máximo uma vez de cada licitação.
+    _, unicos = np.unique(licitacao * np.int64(p.cnpjs) + cnpj, return_index=True)
+    unicos.sort()
+    return licitacao[unicos], cnpj[unicos]
+
+
+def gera_infos(rng, p: Parametros, licitacoes: np.ndarray) -> pd.DataFrame:
+    n_municipios = max(1, p.licitacoes // 50)
+    modalidade = rng.integers(0, len(MODALIDADES), p.licitacoes)
+    return pd.DataFrame({
+        'seq_dim_licitacao': licitacoes,
+        'nom_entidade': np.char.add('Municipio ', rng.integers(0, n_municipios, p.licitacoes).astype(str)),
+        'sgl_entidade_pai': 'MG',
+        'nom_modalidade': np.asarray(MODALIDADES)[modalidade],
+        'num_modalidade': modalidade + 1,
+        'num_exercicio_licitacao': rng.integers(2015, 2021, p.licitacoes),
+        'dsc_objeto': 'Objeto sintetico',
+        'vlr_licitacao': np.round(rng.lognormal(11, 1.5, p.licitacoes), 2)
+    })
+
+
+def gera(destino: str, p: Parametros = PADRAO):
+    """Gera os três arquivos de entrada em destino."""
+    rng = np.random.default_rng(p.semente)
+    cnpjs = gera_cnpjs(rng, p.cnpjs)
+    licitacoes = np.arange(PRIMEIRA_LICITACAO, PRIMEIRA_LICITACAO + p.licitacoes).astype(str)
+    inicio, tamanho = grupos_economicos(rng, p)
+
+    pares = gera_vinculos(rng, p, inicio, tamanho)
+    a, b = cnpjs[pares[:, 0]], cnpjs[pares[:, 1]]
+    relacoes = pd.DataFrame({'cnpj_1': np.where(a < b, a, b), 'cnpj_2': np.where(a < b, b, a)})
+
+    licitacao, cnpj = gera_licitantes(rng, p, inicio, tamanho)
+    licitantes = pd.DataFrame({'seq_dim_licitacao': licitacoes[licitacao], 'cnpj': cnpjs[cnpj]})
+
+    os.makedirs(destino, exist_ok=True)
+    gera_infos(rng, p, licitacoes).to_csv(os.path.join(destino, 'infos_licitacoes.csv'), sep=';', index=False)
+    licitantes.to_csv(os.path.join(destino, 'licitacoes_cnpjs_licitantes.csv'), sep=';', index=False)
+    relacoes.to_csv(os.path.join(destino, 'relacao_societario_tratada.csv'), header=False, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gera arquivos de entrada sintéticos.')
+    parser.add_argument('destino', help='diretório dos arquivos gerados')
+    parser.add_argument('--licitacoes', type=int, default=PADRAO.licitacoes)
+    parser.add_argument('--cnpjs', type=int, default=PADRAO.cnpjs)
+    parser.add_argument('--media-licitantes', type=float, default=PADRAO.media_licitantes,
+                        help='média de licitantes por licitação')
+    parser.add_argument('--distribuicao', choices=['poisson', 'geometrica'], default=PADRAO.distribuicao,
+                        help='distribuição da quantidade de licitantes por licitação')
+    parser.add_argument('--densidade', type=float, default=PADRAO.densidade,
+                        help='probabilidade de vínculo entre CNPJs do mesmo grupo')
+    parser.add_argument('--tamanho-grupo', type=float, default=PADRAO.tamanho_grupo,
+                        help='tamanho médio dos grupos econômicos')
+    parser.add_argument('--prob-grupo', type=float, default=PADRAO.prob_grupo,
+                        help='fração das licitações com os CNPJs de um grupo')
+    parser.add_argument('--vinculos-aleatorios', type=float, default=PADRAO.vinculos_aleatorios,
+                        help='vínculos entre CNPJs quaisquer, por CNPJ')
+    parser.add_argument('--semente', type=int, default=PADRAO.semente)
+    args = parser.parse_args()
+    gera(args.destino, Parametros(*[getattr(args, campo) for campo in Parametros._fields]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,281 @@
+# ==============================================================================
+# MODO INCREMENTAL - RECÁLCULO SOMENTE DAS LICITAÇÕES AFETADAS
+# ==============================================================================
+
+# Gera as mesmas saídas do pipeline.py (armazém de grafos, relatórios 1, 2 e 3,
+# grau_competicao e edges), mas calcula as métricas (incluindo as cliques)
+# somente dos grafos das licitações afetadas desde a última execução:
+
+# - licitações novas ou cujos CNPJs licitantes mudaram;
+# - licitações em que os dois CNPJs de um vínculo adicionado, removido ou com
+#   tipo alterado concorreram, encontradas pelo índice reverso CNPJ -> licitações;
+# - licitações cujas métricas salvas foram truncadas pelos limites das cliques.
+
+# As métricas das demais licitações vêm do estado salvo em estado_path, junto
+# com os licitantes e as relações da última execução. Licitações removidas saem
+# do estado. As etapas vetorizadas (arestas, armazém, grau de competição e
+# edges) e a montagem dos relatórios usam todas as licitações, de forma que as
+# saídas são as mesmas de uma execução completa do pipeline.
+
+# Sem estado salvo, ou se as combinações de vínculos, os limites das cliques ou
+# o ferramentas_grafos.py mudarem, todas as licitações são recalculadas.
+
+# Uso: python incremental.py [--completo] [--processos N] [--lote N]
+#                            [--limite-cliques N] [--tempo-limite S]
+#                            [--vinculos V [V ...]] [--capacidade-cache N]
+
+import argparse
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+# Pacotes implementados
+import carregamento_dados as cd
+import ferramentas_grafos as fg
+import instrumentacao as ins
+import modela_grafos as mg
+import pipeline as pl
+
+estado_path = '../data/output/incremental/estado.pkl'
+
+
+def configuracao() -> tuple:
+    """Parâmetros que, se mudarem, invalidam as métricas do estado salvo."""
+    return list(pl.vinculos), pl.limite_cliques, pl.tempo_limite, fg.CacheMetricas.versao()
+
+
+def carrega_estado(caminho: str = estado_path) -> dict:
+    """Retorna o estado da última execução (None se não existir ou se a
+    configuração tiver mudado).
+    """
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, 'rb') as f:
+        estado = pickle.load(f)
+    return estado if estado['configuracao'] == configuracao() else None
+
+
+def salva_estado(estado: dict, caminho: str = estado_path):
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    temporario = caminho + '.tmp'
+    with open(temporario, 'wb') as f:
+        pickle.dump(estado, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporario, caminho)
+
+
+def compara_licitantes(anteriores: pd.DataFrame, atuais: pd.DataFrame) -> tuple:
+    """Compara os licitantes (seq_dim_licitacao, cnpj) de duas execuções.
+    Retorna as licitações novas ou com licitantes alterados e as removidas.
+    """
+    licitacoes = cd.interna_chaves(anteriores.iloc[:, 0], atuais.iloc[:, 0])
+    cnpjs = cd.interna_chaves(anteriores.iloc[:, 1], atuais.iloc[:, 1])
+
+    def chaves(licitantes: pd.DataFrame) -> np.ndarray:
+        licitacao = cd.ids_internados(licitacoes, licitantes.iloc[:, 0]).astype(np.int64)
+        return np.unique(licitacao * len(cnpjs) + cd.ids_internados(cnpjs, licitantes.iloc[:, 1]))
+
+    antes, depois = chaves(anteriores), chaves(atuais)
+    diferentes = np.setxor1d(antes, depois, assume_unique=True) // len(cnpjs)
+    presentes = np.unique(depois // len(cnpjs))
+    alteradas = np.intersect1d(diferentes, presentes)
+    removidas = np.setdiff1d(np.unique(antes // len(cnpjs)), presentes, assume_unique=True)
+    return licitacoes[alteradas], licitacoes[removidas]
+
+
+def pares_tipados(relacoes: pd.DataFrame, cnpjs: pd.Index) -> tuple:
+    """Pares (a <= b) das relações codificados como a * len(cnpjs) + b, em
+    ordem crescente, e a união das máscaras de vínculo de cada par.
+    """
+    a = cd.ids_internados(cnpjs, relacoes['cnpj_1']).astype(np.int64)
+    b = cd.ids_internados(cnpjs, relacoes['cnpj_2']).astype(np.int64)
+    chave = np.minimum(a, b) * len(cnpjs) + np.maximum(a, b)
+    ordem = np.argsort(chave, kind='stable')
+    chaves, inicio = np.unique(chave[ordem], return_index=True)
+    if not len(chaves):
+        return chaves, np.zeros(0, dtype=np.uint8)
+    return chaves, np.bitwise_or.reduceat(relacoes['tipo'].to_numpy(np.uint8)[ordem], inicio)
+
+
+def compara_relacoes(anteriores: pd.DataFrame, atuais: pd.DataFrame, vinculos: list) -> tuple:
+    """Compara as relações de duas execuções. Retorna o vocabulário de CNPJs e,
+    para cada combinação de vínculos, os pares (ver pares_tipados) que
+    passaram a ser ou deixaram de ser uma aresta da combinação.
+    """
+    cnpjs = cd.interna_chaves(anteriores['cnpj_1'], anteriores['cnpj_2'], atuais['cnpj_1'], atuais['cnpj_2'])
+    chaves_antes, tipos_antes = pares_tipados(anteriores, cnpjs)
+    chaves_depois, tipos_depois = pares_tipados(atuais, cnpjs)
+    chaves = np.union1d(chaves_antes, chaves_depois)
+    antes = np.zeros(len(chaves), dtype=np.uint8)
+    antes[np.searchsorted(chaves, chaves_antes)] = tipos_antes
+    depois = np.zeros(len(chaves), dtype=np.uint8)
+    depois[np.searchsorted(chaves, chaves_depois)] = tipos_depois
+
+    alterados = {}
+    for vinculo in vinculos:
+        mascara = cd.mascara_vinculo(vinculo)
+        alterados[vinculo] = chaves[((antes & mascara) != 0) != ((depois & mascara) != 0)]
+    return cnpjs, alterados
+
+
+def indice_reverso(licitantes: pd.DataFrame, cnpjs: pd.Index) -> cd.IndiceCSR:
+    """Índice reverso CNPJ -> licitações em que o CNPJ concorreu, para os CNPJs
+    do vocabulário. indice[cnpj] = [licitacao_1, ..., licitacao_n]
+    """
+    licitacoes = cd.interna_chaves(licitantes.iloc[:, 0])
+    licitacao = cd.ids_internados(licitacoes, licitantes.iloc[:, 0])
+    cnpj = cd.ids_internados(cnpjs, licitantes.iloc[:, 1])
+    conhecidos = cnpj >= 0
+    offsets, vizinhos = cd.monta_csr(cnpj[conhecidos], licitacao[conhecidos], len(cnpjs))
+    return cd.IndiceCSR(offsets, vizinhos, cnpjs, licitacoes)
+
+
+def licitacoes_dos_pares(pares: np.ndarray, indice: cd.IndiceCSR) -> pd.Index:
+    """Licitações em que os dois CNPJs de algum dos pares (a * len(cnpjs) + b,
+    com os IDs do vocabulário do índice reverso) concorreram juntos.
+    """
+    n_cnpjs = len(indice.chaves)
+    grau = indice.grau()
+    a, b = pares // n_cnpjs, pares % n_cnpjs
+
+    # Percorre as licitações do CNPJ do par que concorreu menos vezes e mantém
+    # as licitações em que o outro também concorreu.
+    troca = grau[a] > grau[b]
+    a, b = np.where(troca, b, a), np.where(troca, a, b)
+    inicio = indice.offsets[a]
+    contagem = grau[a]
+    deslocamento = np.arange(contagem.sum(), dtype=np.int64) - np.repeat(np.cumsum(contagem) - contagem, contagem)
+    licitacao = indice.vizinhos[np.repeat(inicio, contagem) + deslocamento].astype(np.int64)
+    outro = np.repeat(b, contagem)
+
+    cnpj = np.repeat(np.arange(n_cnpjs, dtype=np.int64), grau)
+    licitantes = indice.vizinhos.astype(np.int64) * n_cnpjs + cnpj
+    juntos = np.isin(licitacao * n_cnpjs + outro, licitantes)
+    return indice.valores[np.unique(licitacao[juntos])]
+
+
+def truncadas(metricas: dict) -> pd.Index:
+    """Licitações cujas métricas salvas foram truncadas por um limite das
+    cliques. Elas dependem do tempo de execução e são sempre recalculadas.
+    """
+    return pd.Index([licitacao for licitacao, registro in metricas.items() if registro.truncado])
+
+
+def licitacoes_afetadas(estado: dict, carga: dict) -> tuple:
+    """Licitações afetadas de cada combinação de vínculos e licitações removidas
+    desde a execução do estado.
+    """
+    alteradas, removidas = compara_licitantes(estado['licitantes'], carga['licitantes'])
+    cnpjs, pares = compara_relacoes(estado['relacoes'], carga['relacoes'], pl.vinculos)
+    indice = indice_reverso(carga['licitantes'], cnpjs)
+    afetadas = {
+        vinculo: alteradas.union(licitacoes_dos_pares(pares[vinculo], indice)).union(
+            truncadas(estado['metricas'].get(vinculo, {})).difference(removidas))
+        for vinculo in pl.vinculos
+    }
+    return afetadas, removidas
+
+
+def atualiza_metricas(carga: dict, afetadas: dict, metricas: dict) -> dict:
+    """Calcula as métricas dos grafos das licitações afetadas e as combina com
+    as métricas anteriores. Retorna d[vinculo][licitacao] = fg.Metricas com as
+    licitações na ordem de uma execução completa.
+    """
+    licitantes = carga['licitantes']
+    uniao = pd.Index([]).append([afetadas[vinculo] for vinculo in pl.vinculos]).unique()
+    subconjunto = licitantes[licitantes.iloc[:, 0].astype(str).isin(uniao)]
+
+    grafos = {vinculo: {} for vinculo in pl.vinculos}
+    if len(subconjunto):
+        arestas, tipos, d_licitacoes = mg.extrai_arestas(carga['relacoes'], subconjunto)
+        todos = mg.gera_grafos_vinculos(arestas, tipos, d_licitacoes, pl.vinculos)
+        for vinculo in pl.vinculos:
+            grafos[vinculo] = {licitacao: todos[vinculo][licitacao] for licitacao in afetadas[vinculo]}
+
+    cache = fg.CacheMetricas(pl.capacidade_cache) if pl.capacidade_cache else None
+    novas = fg.calcula_metricas_vinculos(grafos, pl.processos, pl.tamanho_lote,
+                                         pl.limite_cliques, pl.tempo_limite, cache)
+    if cache is not None:
+        cache.salva()
+
+    licitacoes = cd.interna_chaves(licitantes.iloc[:, 0])
+    resultado = {}
+    for vinculo in pl.vinculos:
+        anteriores = metricas.get(vinculo, {})
+        anteriores.update(novas[vinculo])
+        resultado[vinculo] = {licitacao: anteriores[licitacao] for licitacao in licitacoes}
+    return resultado
+
+
+def gera_saidas(carga: dict, metricas: dict):
+    """Gera as saídas do pipeline a partir das métricas de todas as licitações."""
+    grafos = pl.grafos(carga)
+    pl.relatorio_1(grafos, metricas)
+    pl.relatorio_3(pl.relatorio_2(carga, metricas))
+    pl.grau_competicao(grafos)
+    pl.edges(grafos)
+
+
+def atualiza(completo: bool = False) -> dict:
+    """Executa o modo incremental. Retorna as contagens da execução."""
+    with ins.etapa('incremental') as contagens:
+        carga = pl.carga()
+        estado = None if completo else carrega_estado()
+        if estado is None:
+            licitacoes = cd.interna_chaves(carga['licitantes'].iloc[:, 0])
+            afetadas = {vinculo: licitacoes for vinculo in pl.vinculos}
+            removidas, metricas = [], {}
+        else:
+            afetadas, removidas = licitacoes_afetadas(estado, carga)
+            metricas = estado['metricas']
+
+        metricas = atualiza_metricas(carga, afetadas, metricas)
+        gera_saidas(carga, metricas)
+        salva_estado({
+            'configuracao': configuracao(),
+            'licitantes': carga['licitantes'],
+            'relacoes': carga['relacoes'],
+            'metricas': metricas
+        })
+
+        contagens['licitacoes'] = len(next(iter(metricas.values()), {}))
+        contagens['recalculadas'] = sum(len(afetadas[vinculo]) for vinculo in pl.vinculos)
+        contagens['removidas'] = len(removidas)
+    return contagens
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Atualiza as saídas do pipeline recalculando somente as licitações afetadas.'
+    )
+    parser.add_argument('--completo', action='store_true', help='ignora o estado salvo e recalcula tudo')
+    parser.add_argument('--processos', type=int, default=pl.processos,
+                        help='processos usados no cálculo das métricas')
+    parser.add_argument('--lote', type=int, default=pl.tamanho_lote,
+                        help='grafos enviados a cada processo por vez')
+    parser.add_argument('--limite-cliques', type=int, default=pl.limite_cliques,
+                        help='máximo de cliques enumeradas por grafo (sem limite por padrão)')
+    parser.add_argument('--tempo-limite', type=float, default=pl.tempo_limite,
+                        help='segundos de enumeração por grafo (sem limite por padrão)')
+    parser.add_argument('--vinculos', nargs='+', default=pl.vinculos,
+                        help="combinações de vínculos, como 1 ou 1+3 (1 = societário, "
+                             "2 = endereço, 3 = telefone)")
+    parser.add_argument('--capacidade-cache', type=int, default=pl.capacidade_cache,
+                        help='grafos mantidos no cache das métricas (0 = sem cache)')
+    args = parser.parse_args()
+    for vinculo in args.vinculos:
+        try:
+            cd.mascara_vinculo(vinculo)
+        except ValueError:
+            parser.error(f"combinação de vínculos inválida: {vinculo}")
+    pl.configura(args.processos, args.lote, args.limite_cliques or None, args.tempo_limite or None,
+                 args.vinculos, args.capacidade_cache)
+
+    contagens = atualiza(args.completo)
+    print(f"{contagens['recalculadas']} grafos recalculados de {contagens['licitacoes']} licitações, "
+          f"{contagens['removidas']} licitações removidas.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+# Índice invertido dos pares de CNPJs vinculados que concorreram juntos.
+
+# Gerado a partir do armazém de grafos (armazem_grafos.py), um por combinação
+# de vínculos. Assim como no armazém, cada vetor é um arquivo .npy que pode ser
+# mapeado em memória:
+
+# cnpjs.npy              vocabulário de CNPJs, em ordem crescente (ID = posição)
+# licitacoes.npy         seq_dim_licitacao das licitações da combinação de vínculos
+# chaves.npy             pares (cnpj_a, cnpj_b), com a < b, codificados como
+#                        a * len(cnpjs) + b, em ordem crescente
+# offsets.npy            licitações do par i em [offsets[i], offsets[i + 1])
+# lista.npy              posições em licitacoes.npy das licitações de cada par
+# ocorrencias_cnpj.npy   quantidade de linhas (par, licitação) de cada CNPJ
+# parceiros.npy          quantidade de CNPJs distintos vinculados a cada CNPJ
+
+# A quantidade de licitações de cada par é diff(offsets). Como as chaves e o
+# vocabulário estão ordenados, as licitações em que dois CNPJs concorreram
+# juntos são encontradas com duas buscas binárias.
+
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+import armazem_grafos as ag
+import carregamento_dados as cd
+
+indice_pares_path = '../data/output/indice_pares/'
+
+
+def caminho_vinculo(vinculo: str, caminho: str = indice_pares_path) -> str:
+    """Diretório do índice de uma combinação de vínculos."""
+    return os.path.join(caminho, cd.normaliza_vinculo(vinculo))
+
+
+def salva(caminho: str, armazem: ag.ArmazemGrafos, vinculo: str = '1'):
+    """Salva o índice dos pares da combinação de vínculos a partir do armazém
+    (o diretório caminho é substituído por completo).
+    """
+    n_cnpjs = len(armazem.cnpjs)
+    linhas_vinculo = np.flatnonzero(armazem.metadados['vinculo_em_uso'] == cd.mascara_vinculo(vinculo))
+    contagem = np.diff(armazem.offsets_arestas)[linhas_vinculo]
+    linhas = np.repeat(np.arange(len(linhas_vinculo)), contagem)
+    arestas = ag.junta_fatias(np.asarray(armazem.arestas), armazem.offsets_arestas[linhas_vinculo], contagem)
+
+    a = np.minimum(arestas[:, 0], arestas[:, 1]).astype(np.int64)
+    b = np.maximum(arestas[:, 0], arestas[:, 1]).astype(np.int64)
+    chave = a * n_cnpjs + b
+    # A ordenação estável mantém as licitações de cada par na ordem do armazém.
+    ordem = np.argsort(chave, kind='stable')
+    chaves, contagens = np.unique(chave[ordem], return_counts=True)
+    primeiros = chaves // n_cnpjs
+    segundos = chaves % n_cnpjs
+
+    vetores = {
+        'cnpjs': np.asarray(armazem.cnpjs),
+        'licitacoes': np.asarray(armazem.licitacoes)[linhas_vinculo],
+        'chaves': chaves,
+        'offsets': ag.offsets_de(contagens),
+        'lista': linhas[ordem].astype(np.int32),
+        'ocorrencias_cnpj': np.bincount(a, minlength=n_cnpjs) + np.bincount(b, minlength=n_cnpjs),
+        'parceiros': np.bincount(primeiros, minlength=n_cnpjs) + np.bincount(segundos, minlength=n_cnpjs)
+    }
+
+    caminho = caminho.rstrip('/')
+    temporario = caminho + '.tmp'
+    shutil.rmtree(temporario, ignore_errors=True)
+    os.makedirs(temporario)
+    for nome, vetor in vetores.items():
+        np.save(os.path.join(temporario, nome + '.npy'), vetor)
+    shutil.rmtree(caminho, ignore_errors=True)
+    os.replace(temporario, caminho)
+
+
+class IndicePares:
+    """Leitura do índice de pares. Por padrão os vetores são mapeados em memória."""
+
+    def __init__(self, caminho: str = caminho_vinculo('1'), mmap: bool = True):
+        modo = 'r' if mmap else None
+        for nome in ['cnpjs', 'licitacoes', 'chaves', 'offsets', 'lista', 'ocorrencias_cnpj', 'parceiros']:
+            setattr(self, nome, np.load(os.path.join(caminho, nome + '.npy'), mmap_mode=modo))
+
+    def __len__(self) -> int:
+        return len(self.chaves)
+
+    def id_cnpj(self, cnpj: str) -> int:
+        """Retorna o ID do CNPJ (-1 se não estiver no vocabulário)."""
+        i = int(np.searchsorted(self.cnpjs, str(cnpj)))
+        return i if i < len(self.cnpjs) and self.cnpjs[i] == str(cnpj) else -1
+
+    def posicao_par(self, cnpj_1: str, cnpj_2: str) -> int:
+        """Retorna a posição do par no índice (-1 se o par nunca concorreu junto)."""
+        a, b = sorted([self.id_cnpj(cnpj_1), self.id_cnpj(cnpj_2)])
+        if a < 0 or a == b:
+            return -1
+        chave = a * len(self.cnpjs) + b
+        i = int(np.searchsorted(self.chaves, chave))
+        return i if i < len(self.chaves) and self.chaves[i] == chave else -1
+
+    def licitacoes_em_comum(self, cnpj_1: str, cnpj_2: str) -> list:
+        """Licitações em que os dois CNPJs vinculados concorreram juntos."""
+        i = self.posicao_par(cnpj_1, cnpj_2)
+        if i < 0:
+            return []
+        return self.licitacoes[self.lista[self.offsets[i]:self.offsets[i + 1]]].tolist()
+
+    def contagens(self) -> np.ndarray:
+        """Quantidade de licitações de cada par."""
+        return np.diff(self.offsets)
+
+    def pares(self) -> pd.DataFrame:
+        """Tabela com os CNPJs e a quantidade de licitações de cada par."""
+        n = len(self.cnpjs)
+        return pd.DataFrame({
+            'cnpj_1': self.cnpjs[self.chaves // n],
+            'cnpj_2': self.cnpjs[self.chaves % n],
+            'ocorrencias': self.contagens()
+        })
+
+    def histograma_pares(self) -> pd.Series:
+        """Quantidade de pares por número de licitações em que o par concorreu junto."""
+        histograma = np.bincount(self.contagens())
+        return pd.Series(histograma, name='pares').rename_axis('ocorrencias')[histograma > 0]
+
+    def histograma_cnpjs(self, coluna: str = 'ocorrencias_cnpj') -> pd.Series:
+        """Quantidade de CNPJs por valor de ocorrencias_cnpj (linhas par-licitação
+        do CNPJ) ou de parceiros (CNPJs vinculados distintos).
+        """
+        valores = np.asarray(getattr(self, coluna))
+        histograma = np.bincount(valores[valores > 0])
+        return pd.Series(histograma, name='cnpjs').rename_axis(coluna)[histograma > 0]
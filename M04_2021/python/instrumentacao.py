@@ -0,0 +1,190 @@
+# ==============================================================================
+# INSTRUMENTAÇÃO DAS ETAPAS
+# ==============================================================================
+
+# Cada etapa medida (carregamentos, construção de grafos, métricas, relatórios)
+# gera uma linha JSON em registro_path com:
+
+# execucao      identificador da execução (data de início e PID)
+# etapa         nome da etapa, precedido das etapas em que está contida ('rel2/carga.infos')
+# situacao      'ok' ou 'erro'
+# segundos      tempo decorrido
+# cpu           tempo de CPU do processo e dos subprocessos encerrados na etapa
+# rss           memória residente ao final da etapa (bytes)
+# max_rss       pico de memória residente do processo até o final da etapa (bytes)
+# contagens     linhas, grafos, cliques... e a vazão de cada uma (<contagem>_por_segundo)
+
+# Uma única etapa pode ser perfilada (etapa_perfilada, ou a variável de ambiente
+# PERFILAR) com o cProfile ('cprofile', arquivo .prof para o pstats/snakeviz)
+# ou por amostragem da pilha ('amostragem', arquivo .folded no formato das
+# ferramentas de flame graph), que tem custo bem menor em execuções longas.
+
+import cProfile
+import functools
+import json
+import os
+import resource
+import signal
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+registro_path = '../data/output/instrumentacao/etapas.jsonl'
+perfil_path = '../data/output/instrumentacao/'
+
+etapa_perfilada = os.environ.get('PERFILAR')
+perfilador = os.environ.get('PERFILADOR', 'cprofile')
+
+# Intervalo (segundos de CPU) entre as amostras da pilha.
+intervalo_amostragem = 0.005
+
+execucao = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+
+_pilha = []
+
+
+def configura(caminho: str = None, perfilar: str = None, tipo_perfilador: str = None):
+    """Altera o arquivo de registro (None mantém o atual, '' desativa) e a
+    etapa perfilada com o perfilador ('cprofile' ou 'amostragem').
+    """
+    global registro_path, etapa_perfilada, perfilador
+    if caminho is not None:
+        registro_path = caminho
+    if perfilar is not None:
+        etapa_perfilada = perfilar
+    if tipo_perfilador is not None:
+        perfilador = tipo_perfilador
+
+
+def rss_atual() -> int:
+    """Memória residente atual do processo (somente Linux; None nos demais)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+
+def max_rss() -> int:
+    """Pico de memória residente do processo e dos subprocessos encerrados."""
+    # ru_maxrss é dado em KiB no Linux.
+    return 1024 * max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                      resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+
+
+def tempo_cpu() -> float:
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+class Amostrador:
+    """Perfilador por amostragem: a cada intervalo de tempo de CPU, registra a
+    pilha de chamadas do processo. Funciona somente na thread principal.
+    """
+
+    def __init__(self, intervalo: float = intervalo_amostragem):
+        self.intervalo = intervalo
+        self.amostras = Counter()
+
+    def _amostra(self, sinal, frame):
+        funcoes = []
+        while frame is not None:
+            codigo = frame.f_code
+            funcoes.append(f"{os.path.basename(codigo.co_filename)}:{codigo.co_name}")
+            frame = frame.f_back
+        self.amostras[';'.join(reversed(funcoes))] += 1
+
+    def enable(self):
+        self._anterior = signal.signal(signal.SIGPROF, self._amostra)
+        signal.setitimer(signal.ITIMER_PROF, self.intervalo, self.intervalo)
+
+    def disable(self):
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, self._anterior)
+
+    def dump_stats(self, caminho: str):
+        with open(caminho, 'w') as f:
+            for pilha, quantidade in self.amostras.most_common():
+                f.write(f"{pilha} {quantidade}\n")
+
+
+def _perfil(nome: str):
+    if nome != etapa_perfilada:
+        return None, None
+    extensao = {'cprofile': '.prof', 'amostragem': '.folded'}[perfilador]
+    perfil = cProfile.Profile() if perfilador == 'cprofile' else Amostrador()
+    os.makedirs(perfil_path, exist_ok=True)
+    return perfil, os.path.join(perfil_path, f"{nome.replace('/', '.')}-{execucao}{extensao}")
+
+
+def escreve(registro: dict):
+    if not registro_path:
+        return
+    os.makedirs(os.path.dirname(registro_path) or '.', exist_ok=True)
+    with open(registro_path, 'a') as f:
+        f.write(json.dumps(registro, ensure_ascii=False) + '\n')
+
+
+@contextmanager
+def etapa(nome: str, **contagens):
+    """Mede o bloco como uma etapa. O dicionário retornado recebe as
+    contagens conhecidas somente ao final (linhas, grafos, cliques...):
+
+    with etapa('rel1') as contagens:
+        ...
+        contagens['linhas'] = len(df)
+    """
+    _pilha.append(nome)
+    caminho = '/'.join(_pilha)
+    perfil, arquivo_perfil = _perfil(nome)
+    situacao = 'ok'
+    inicio, cpu = time.perf_counter(), tempo_cpu()
+    if perfil is not None:
+        perfil.enable()
+    try:
+        yield contagens
+    except BaseException:
+        situacao = 'erro'
+        raise
+    finally:
+        if perfil is not None:
+            perfil.disable()
+            perfil.dump_stats(arquivo_perfil)
+        segundos = time.perf_counter() - inicio
+        _pilha.pop()
+        rss = rss_atual()
+        registro = {
+            'execucao': execucao,
+            'etapa': caminho,
+            'situacao': situacao,
+            'segundos': segundos,
+            'cpu': tempo_cpu() - cpu,
+            'rss': rss,
+            # ru_maxrss só é atualizado periodicamente pelo kernel.
+            'max_rss': max(max_rss(), rss or 0),
+            'contagens': dict(contagens)
+        }
+        for contagem, valor in contagens.items():
+            if isinstance(valor, (int, float)) and segundos > 0:
+                registro['contagens'][contagem + '_por_segundo'] = valor / segundos
+        escreve(registro)
+
+
+def medido(nome: str, contagem=None):
+    """Decorador que mede cada chamada da função como a etapa nome. contagem
+    recebe o resultado e retorna o dicionário de contagens da etapa.
+    """
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def medida(*args, **kwargs):
+            with etapa(nome) as contagens:
+                resultado = funcao(*args, **kwargs)
+                if contagem is not None:
+                    contagens.update(contagem(resultado))
+            return resultado
+        return medida
+    return decorador
+
+
+def linhas(df) -> dict:
+    return {'linhas': len(df)}
@@ -1,35 +1,148 @@
+# Normaliza e remove as repetições dos vínculos societários.
+
+# Cada linha de relacao_cnpjs_societario.csv tem dois CNPJs separados por
+# espaço. O par é escrito com o menor CNPJ primeiro e uma única vez em
+# relacao_societario_tratada.csv (cnpj_1,cnpj_2).
+
+# Cada CNPJ (14 dígitos) é lido como um inteiro de 64 bits e cada par como
+# dois deles. No modo padrão, o arquivo inteiro é carregado e os pares ficam na
+# ordem em que aparecem pela primeira vez. Com --streaming, arquivos maiores que
+# a memória são processados em blocos de --bloco linhas: cada bloco é ordenado,
+# sem repetições, e salvo em disco; as sequências ordenadas são intercaladas
+# lendo uma janela de cada uma por vez, e a saída fica em ordem crescente.
+
+# Uso: python limpa_arestas.py [entrada] [saida] [--streaming] [--bloco N]
+#                              [--temporario DIR] [--sep SEP]
+
+import argparse
+import os
+import shutil
+import tempfile
+
+import numpy as np
 import pandas as pd
 
+dump_path = '../data/input/'
+entrada_path = dump_path + 'relacao_cnpjs_societario.csv'
+saida_path = dump_path + 'relacao_societario_tratada.csv'
+
+DIGITOS_CNPJ = 14
+
+# Pares por bloco no modo streaming (16 bytes por par).
+tamanho_bloco = 5000000
+
+
+def le_blocos(caminho: str, tamanho: int = None, sep: str = ' '):
+    """Lê os pares de CNPJs como inteiros, em blocos de tamanho linhas (um único
+    bloco se tamanho for None). Em cada par, o menor CNPJ fica primeiro.
+    """
+    leitor = pd.read_csv(caminho, header=None, names=['cnpj_1', 'cnpj_2'], dtype=np.int64, sep=sep,
+                         chunksize=tamanho)
+    for bloco in ([leitor] if tamanho is None else leitor):
+        pares = bloco.to_numpy()
+        pares.sort(axis=1)
+        yield pares
+
+
+def ordena_unicos(pares: np.ndarray) -> np.ndarray:
+    """Ordena os pares (pelo primeiro CNPJ e depois pelo segundo) e remove os repetidos."""
+    pares = pares[np.lexsort((pares[:, 1], pares[:, 0]))]
+    novo = np.ones(len(pares), dtype=bool)
+    novo[1:] = (pares[1:] != pares[:-1]).any(axis=1)
+    return pares[novo]
+
+
+def conta_ate(pares: np.ndarray, corte: np.ndarray) -> int:
+    """Quantidade de pares ordenados menores ou iguais ao par corte."""
+    inicio = np.searchsorted(pares[:, 0], corte[0], 'left')
+    fim = np.searchsorted(pares[:, 0], corte[0], 'right')
+    return int(inicio + np.searchsorted(pares[inicio:fim, 1], corte[1], 'right'))
+
+
+def intercala(sequencias: list, tamanho: int = tamanho_bloco):
+    """Intercala as sequências ordenadas sem repetições (arquivos .npy) e gera
+    blocos ordenados, sem repetições também entre sequências. No máximo
+    tamanho pares das sequências ficam em memória ao mesmo tempo.
+    """
+    vetores = [np.load(sequencia, mmap_mode='r') for sequencia in sequencias]
+    posicoes = [0] * len(vetores)
+    janela = max(1, tamanho // max(len(vetores), 1))
+    ultimo = None
+    while True:
+        janelas = [(i, np.asarray(v[p:p + janela])) for i, (v, p) in enumerate(zip(vetores, posicoes))
+                   if p < len(v)]
+        if not janelas:
+            return
+        # Todos os pares até o menor dos últimos pares das janelas já estão nelas.
+        corte = min((j[-1] for _, j in janelas), key=tuple)
+        partes = []
+        for i, j in janelas:
+            n = conta_ate(j, corte)
+            partes.append(j[:n])
+            posicoes[i] += n
+        bloco = ordena_unicos(np.concatenate(partes))
+        if ultimo is not None and (bloco[0] == ultimo).all():
+            bloco = bloco[1:]
+        if len(bloco):
+            ultimo = bloco[-1].copy()
+            yield bloco
+
+
+def escreve(f, pares: np.ndarray):
+    """Escreve os pares como cnpj_1,cnpj_2, com os zeros à esquerda."""
+    if len(pares):
+        cnpjs = np.char.zfill(pares.astype(str), DIGITOS_CNPJ)
+        f.write('\n'.join(np.char.add(np.char.add(cnpjs[:, 0], ','), cnpjs[:, 1]).tolist()) + '\n')
+
+
+def limpa(entrada: str = entrada_path, saida: str = saida_path, sep: str = ' ') -> int:
+    """Modo em memória. Retorna a quantidade de pares escritos."""
+    pares = next(le_blocos(entrada, sep=sep))
+    pares = pd.DataFrame(pares).drop_duplicates().to_numpy()
+    with open(saida, 'w') as f:
+        escreve(f, pares)
+    return len(pares)
+
+
+def limpa_streaming(entrada: str = entrada_path, saida: str = saida_path, sep: str = ' ',
+                    tamanho: int = tamanho_bloco, temporario: str = None) -> int:
+    """Modo streaming, com no máximo tamanho pares em memória por vez. As
+    sequências ordenadas ficam em um diretório criado em temporario.
+    Retorna a quantidade de pares escritos.
+    """
+    diretorio = tempfile.mkdtemp(prefix='limpa_arestas-', dir=temporario)
+    try:
+        sequencias = []
+        for i, pares in enumerate(le_blocos(entrada, tamanho, sep)):
+            sequencias.append(os.path.join(diretorio, f'sequencia_{i}.npy'))
+            np.save(sequencias[-1], ordena_unicos(pares))
+
+        total = 0
+        with open(saida, 'w', buffering=1 << 20) as f:
+            for bloco in intercala(sequencias, tamanho):
+                escreve(f, bloco)
+                total += len(bloco)
+        return total
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
 
 def main():
-    # Carrega o arquivo de cnpjs por licitação e o arquivo de vínculos.
-    dump_path = '../data/input/'
-
-    relacoes_entre_cnpjs = pd.read_csv(
-        dump_path + 'relacao_cnpjs_societario.csv',
-        header=None,
-        names=['cnpj_1', 'cnpj_2'],
-        dtype=str,
-        sep=' '
-    )
-
-    # Iniciamos um dicionário em que a chave é o par de cnpjs vinculados.
-    # Inicialmente cada chave referencia uma lista vazia.
-    lista_relacoes = relacoes_entre_cnpjs.values
-
-    # Ordenamos o vínculo para não adicionarmos duas vezes uma mesma aresta.
-    lista_relacoes_ordenada = [sorted(relacao) for relacao in lista_relacoes]
-
-    # O uso do dicionário remove potenciais dados duplicados.
-    d = {(relacao[0], relacao[1]): None for relacao in lista_relacoes_ordenada}
-
-    with open(dump_path + 'relacao_societario_tratada.csv', 'w') as f:
-        for cnpj_pair in d.keys():
-            cnpj1 = cnpj_pair[0]
-            cnpj2 = cnpj_pair[1]
-            f.write(
-                f"{cnpj1},{cnpj2}\n"
-            )
+    parser = argparse.ArgumentParser(description='Normaliza e remove as repetições dos vínculos entre CNPJs.')
+    parser.add_argument('entrada', nargs='?', default=entrada_path)
+    parser.add_argument('saida', nargs='?', default=saida_path)
+    parser.add_argument('--streaming', action='store_true',
+                        help='processa em blocos, com memória limitada (saída em ordem crescente)')
+    parser.add_argument('--bloco', type=int, default=tamanho_bloco, help='pares por bloco no modo streaming')
+    parser.add_argument('--temporario', help='diretório dos arquivos temporários do modo streaming')
+    parser.add_argument('--sep', default=' ', help='separador dos CNPJs na entrada')
+    args = parser.parse_args()
+
+    if args.streaming:
+        total = limpa_streaming(args.entrada, args.saida, args.sep, args.bloco, args.temporario)
+    else:
+        total = limpa(args.entrada, args.saida, args.sep)
+    print(f"{total} vínculos salvos em {args.saida}")
 
 
 if __name__ == '__main__':
@@ -12,58 +12,72 @@
 # ocorre. Haverá repetição de duplas de cnpjs, mas o valor no campo licitação
 # deve variar entre as linhas que apresentam a mesma dupla.
 
+# Também salva o índice invertido dos pares (indice_pares.py), com as
+# licitações de cada par e as contagens de ocorrências já calculadas.
+
+import numpy as np
 import pandas as pd
+
+import armazem_grafos as ag
 import carregamento_dados as cd
+import indice_pares as ip
+import instrumentacao as ins
+
+
+def gera_arestas(armazem: ag.ArmazemGrafos, vinculo: str = None) -> pd.DataFrame:
+    """Retorna uma linha (cnpj_1, cnpj_2, licitacao) por aresta de cada licitação,
+    lida diretamente dos vetores do armazém de grafos. Se vinculo for informado,
+    somente as linhas do armazém dessa combinação de vínculos são usadas.
+    """
+    linhas = np.repeat(np.arange(len(armazem)), np.diff(armazem.offsets_arestas))
+    arestas = np.asarray(armazem.arestas)
+    if vinculo is not None:
+        mantida = armazem.metadados['vinculo_em_uso'][linhas] == cd.mascara_vinculo(vinculo)
+        linhas, arestas = linhas[mantida], arestas[mantida]
+    df = pd.DataFrame({
+        'cnpj_1': armazem.cnpjs[arestas[:, 0]],
+        'cnpj_2': armazem.cnpjs[arestas[:, 1]],
+        'licitacao': armazem.licitacoes[linhas]
+    })
+
+    # Agrupa as linhas de um mesmo par de CNPJs, mantendo os pares na ordem em
+    # que aparecem pela primeira vez e as licitações na ordem do armazém.
+    par = pd.factorize(arestas[:, 0].astype(np.int64) * len(armazem.cnpjs) + arestas[:, 1])[0]
+    return df.iloc[np.argsort(par, kind='stable')]
+
+
+def arquivo_arestas(vinculo: str) -> str:
+    """Nome do arquivo de arestas de uma combinação de vínculos. O vínculo
+    societário mantém o nome original, 'edges'.
+    """
+    vinculo = cd.normaliza_vinculo(vinculo)
+    return 'edges' if vinculo == '1' else 'edges_' + vinculo
+
+
+def salva_arestas(arestas: pd.DataFrame, caminho: str):
+    """Salva uma linha cnpj_1,cnpj_2,licitacao por licitação de cada par de CNPJs."""
+    arestas.to_csv(caminho, header=False, index=False)
 
 
 def main():
-    # Carrega o arquivo de cnpjs por licitação e o arquivo de vínculos.
-    dump_path = '../data/output/csv/'
-    relacoes_entre_cnpjs = cd.salvar_relacoes_entre_cnpjs()
-    cnpjs_por_licitacao = cd.salvar_cnpjs_por_licitacao()
-    print("Raw files loaded.")
-
-    # O uso do dicionário remove potenciais dados duplicados.
-    d: dict = {}
-
-    # Vamos extrair arestas dos grafos criados pelo script modela_grafos.py,
-    # para isso, utilizamos o resultado salvo em pickle.
-    df = pd.read_pickle('../data/output/pickles/' + 'grafos_licitacoes')
-    print("Graph data loaded.")
-
-    # Extraimos somente as colunas 'licitacao' (para identificar o grafo) e 'grafo'.
-    lic_graph = df[['licitacao', 'grafo']].values
-
-    # Inicializa o dicionário com listas vazias para cada aresta,
-    # sendo cada aresta um par de CNPJs.
-    for lic, graph in lic_graph:
-        edges = graph.edges
-        if len(edges) != 0:
-            # muitas licitações não possuem qualquer aresta
-            # por isso checamos se há aresta ou não
-            for edge in edges:
-                d[edge] = []
-
-    # Alimenta o dicionário com as licitações onde esse par de CNPJs
-    # ocorre.
-    for lic, graph in lic_graph:
-        edges = graph.edges
-        if len(edges) != 0:
-            for edge in edges:
-                d[edge].append(lic)
-
-    # Temos até aqui um dicionário indexado por par de CNPJs em que cada
-    # chave armazena uma lista de licitações. Percorremos então cada chave
-    # do dicionário e entramos na lista de licitações. Para cada licitação
-    # desta chave, criamos uma nova linha de saída.
-    with open(dump_path + 'edges', 'w') as f:
-        for cnpj_pair in d.keys():
-            cnpj1 = cnpj_pair[0]
-            cnpj2 = cnpj_pair[1]
-            licitacoes = d[cnpj_pair]
-            for licitacao in licitacoes:
-                f.write(f"{cnpj1},{cnpj2},{licitacao}\n")
-    print('Output saved to', dump_path + 'edges')
+    with ins.etapa('modela_arestas') as contagens:
+        dump_path = '../data/output/csv/'
+
+        # Vamos extrair arestas dos grafos criados pelo script modela_grafos.py,
+        # para isso, utilizamos o armazém de grafos.
+        armazem = ag.ArmazemGrafos(ag.grafos_path)
+        print("Graph data loaded.")
+
+        # Um arquivo por combinação de vínculos presente no armazém.
+        for vinculo in map(cd.formata_vinculo, np.unique(armazem.metadados['vinculo_em_uso'])):
+            arestas = gera_arestas(armazem, vinculo)
+            salva_arestas(arestas, dump_path + arquivo_arestas(vinculo))
+            contagens['linhas'] = contagens.get('linhas', 0) + len(arestas)
+            print('Output saved to', dump_path + arquivo_arestas(vinculo))
+
+            # Índice invertido dos pares, para consultas sem reler o arquivo.
+            ip.salva(ip.caminho_vinculo(vinculo), armazem, vinculo)
+            print('Pair index saved to', ip.caminho_vinculo(vinculo))
 
 
 if __name__ == '__main__':
@@ -1,49 +1,113 @@
 import pandas as pd
 
 # Pacotes implementados
+import armazem_grafos as ag
 import carregamento_dados as cd
 import ferramentas_grafos as fg
+import instrumentacao as ins
 
+# Combinações de vínculos modeladas ('1' = societário, '1+3' = societário e
+# telefone, ...). Veja carregamento_dados.mascara_vinculo.
+vinculos = ['1']
 
-def main():
-    # Carrega os 3 arquivos principais
-    dump_path = '../data/output/pickles/'
-    relacoes_entre_cnpjs = cd.salvar_relacoes_entre_cnpjs()
-    informacoes_licitacoes = cd.salvar_informacoes_licitacoes()
-    cnpjs_por_licitacao = cd.salvar_cnpjs_por_licitacao()
-    print("Files loaded.")
-
-    licitacoes_data = {
-        'ano': informacoes_licitacoes['num_exercicio_licitacao'],
-        'municipio': informacoes_licitacoes['nom_entidade'],
-        'modalidade': informacoes_licitacoes['nom_modalidade'],
-        'licitacao': informacoes_licitacoes['seq_dim_licitacao'],
-        'valor': informacoes_licitacoes['vlr_licitacao'],
-        'vinculo_em_uso': 1
-    }
-    licitacoes = pd.DataFrame(licitacoes_data)
 
+def monta_tabela_licitacoes(informacoes_licitacoes: pd.DataFrame, vinculos=('1',)) -> pd.DataFrame:
+    """Monta a tabela com as informações principais de cada licitação, com uma
+    linha por licitação para cada combinação de vínculos.
+    """
+    tabelas = []
+    for vinculo in vinculos:
+        licitacoes_data = {
+            'ano': informacoes_licitacoes['num_exercicio_licitacao'],
+            'municipio': informacoes_licitacoes['nom_entidade'],
+            'modalidade': informacoes_licitacoes['nom_modalidade'],
+            'licitacao': informacoes_licitacoes['seq_dim_licitacao'],
+            'valor': informacoes_licitacoes['vlr_licitacao'],
+            'vinculo_em_uso': cd.normaliza_vinculo(vinculo)
+        }
+        tabelas.append(pd.DataFrame(licitacoes_data))
+    return pd.concat(tabelas, ignore_index=True)
+
+
+def extrai_arestas(relacoes_entre_cnpjs: pd.DataFrame, cnpjs_por_licitacao: pd.DataFrame) -> tuple:
+    """Extrai as arestas de todas as licitações de uma só vez, para todos os
+    tipos de vínculo presentes nas relações. Retorna as arestas, as máscaras de
+    vínculo das arestas e o índice de CNPJs por licitação.
+    """
     # Dicionários necessários carregados por meio de funções implementadas
     # externamente.
-    d_relacoes = cd.cnpjs_relacionados_por_cnpj(relacoes_entre_cnpjs)
-    d_licitacoes = cd.cnpjs_por_licitacao(cnpjs_por_licitacao)
-    print("Created dictionaries.")
+    d_relacoes, d_licitacoes = cd.indices_compactos(
+        relacoes_entre_cnpjs, cnpjs_por_licitacao
+    )
+    arestas, tipos = fg.extrai_arestas_tipadas(d_relacoes, d_licitacoes)
+    return arestas, tipos, d_licitacoes
+
+
+def gera_grafos_vinculos(arestas, tipos, d_licitacoes, vinculos=('1',)) -> dict:
+    """Gera os grafos de todas as licitações para cada combinação de vínculos,
+    filtrando as mesmas arestas extraídas.
+    Retorna o dicionário d[vinculo][licitacao] = grafo.
+    """
+    licitacoes = list(d_licitacoes.chaves)
+    grafos = {}
+    for vinculo in vinculos:
+        arestas_vinculo = fg.filtra_vinculos(arestas, tipos, cd.mascara_vinculo(vinculo))
+        grafos[cd.normaliza_vinculo(vinculo)] = dict(zip(
+            licitacoes, fg.gera_grafos_licitacoes(licitacoes, arestas_vinculo, d_licitacoes)
+        ))
+    return grafos
+
 
-    # Gera a coluna dos grafos das licitações
+def gera_grafos(relacoes_entre_cnpjs: pd.DataFrame, cnpjs_por_licitacao: pd.DataFrame) -> tuple:
+    """Gera o grafo de todas as licitações que possuem CNPJs licitantes, com
+    todos os vínculos das relações recebidas.
+    Retorna o dicionário d[licitacao] = grafo e o índice de CNPJs por licitação.
+    """
+    arestas, _, d_licitacoes = extrai_arestas(relacoes_entre_cnpjs, cnpjs_por_licitacao)
+    licitacoes = list(d_licitacoes.chaves)
+    grafos = dict(zip(licitacoes, fg.gera_grafos_licitacoes(licitacoes, arestas, d_licitacoes)))
+    return grafos, d_licitacoes
+
+
+def monta_grafos_licitacoes(informacoes_licitacoes: pd.DataFrame, grafos: dict, d_licitacoes,
+                            vinculo: str = '1') -> pd.DataFrame:
+    """Monta a tabela de licitações de uma combinação de vínculos com as colunas
+    dos grafos e dos cnpjs licitantes.
+    """
+    licitacoes = monta_tabela_licitacoes(informacoes_licitacoes, [vinculo])
+
+    # Gera a coluna dos grafos das licitações. Licitações sem CNPJs licitantes
+    # recebem um grafo vazio.
     licitacoes["grafo"] = licitacoes['licitacao'].apply(
-        lambda x: fg.gera_grafo_licitacao(x, d_relacoes, d_licitacoes)
+        lambda x: grafos[x] if x in grafos else fg.inicializa_grafo()
     )
-    print("Created graphs.")
 
     # Gera a coluna dos cnpjs licitantes
     licitacoes['cnpjs'] = licitacoes['licitacao'].apply(
         lambda x: d_licitacoes[str(x)]
     )
+    return licitacoes
+
+
+def main():
+    with ins.etapa('modela_grafos') as contagens:
+        # Carrega os 3 arquivos principais
+        # As relações de todos os vínculos são carregadas em uma única tabela.
+        relacoes_entre_cnpjs = cd.salvar_relacoes_vinculos(vinculos)
+        informacoes_licitacoes = cd.salvar_informacoes_licitacoes()
+        cnpjs_por_licitacao = cd.salvar_cnpjs_por_licitacao()
+        print("Files loaded.")
+
+        arestas, tipos, d_licitacoes = extrai_arestas(relacoes_entre_cnpjs, cnpjs_por_licitacao)
+        print("Created graphs.")
 
-    # Salva o resultado em formato Pickle para processamento posterior por
-    # outros scripts na geração de relatórios.
-    licitacoes.to_pickle(dump_path + 'grafos_licitacoes')
-    print("File saved to ", dump_path + 'grafos_licitacoes')
+        # Salva o resultado no armazém colunar de grafos para processamento
+        # posterior por outros scripts na geração de relatórios. Cada combinação
+        # de vínculos ocupa as suas próprias linhas.
+        tabela = monta_tabela_licitacoes(informacoes_licitacoes, vinculos)
+        ag.salva(ag.grafos_path, tabela, d_licitacoes, arestas, tipos)
+        print("Graphs saved to ", ag.grafos_path)
+        contagens['linhas'] = len(tabela)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,361 @@
+# ==============================================================================
+# PIPELINE - EXECUÇÃO ÚNICA DAS ETAPAS COM CACHE DOS RESULTADOS
+# ==============================================================================
+
+# Substitui a execução independente de modela_grafos.py, calcula_competicao.py,
+# rel1.py, rel2.py, rel3.py e modela_arestas.py. As etapas formam o grafo:
+
+# carga -> grafos -> metricas -> relatorio_1
+#                             -> relatorio_2 -> relatorio_3
+#                -> grau_competicao
+#                -> edges
+
+# Cada etapa é executada uma única vez e o seu resultado é salvo em cache_path,
+# identificado pelo hash das suas entradas (arquivos de entrada, código dos
+# módulos utilizados e chaves das etapas anteriores). Ao executar novamente, as
+# etapas cujas entradas não mudaram são puladas. O cache guarda somente as
+# arestas, as tabelas e as métricas; os grafos networkX são gerados novamente
+# a partir das arestas quando necessários.
+
+# Todas as combinações de vínculos (ver carregamento_dados.mascara_vinculo) são
+# processadas juntas: as relações de todos os vínculos são carregadas em uma
+# única tabela e as arestas das licitações são extraídas uma única vez. Os
+# relatórios trazem uma linha por combinação na coluna vinculo_em_uso.
+
+# Uso: python pipeline.py [etapa ...] [--forcar] [--processos N] [--lote N]
+#                          [--limite-cliques N] [--tempo-limite S]
+#                          [--vinculos V [V ...]] [--registro ARQUIVO]
+#                          [--perfilar ETAPA] [--perfilador {cprofile,amostragem}]
+
+# As medidas de tempo, memória e contagens de cada etapa são registradas pelo
+# instrumentacao.py.
+
+# Quando somente parte das licitações ou dos vínculos muda, o incremental.py
+# gera as mesmas saídas recalculando apenas as métricas das licitações afetadas.
+
+import argparse
+import hashlib
+import os
+import pickle
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# Pacotes implementados
+import armazem_grafos as ag
+import carregamento_dados as cd
+import ferramentas_grafos as fg
+import indice_pares as ip
+import instrumentacao as ins
+import modela_grafos as mg
+import calcula_competicao as cc
+import modela_arestas as ma
+import rel1
+import rel2
+import rel3
+
+csv_path = '../data/output/csv/'
+pickle_path = '../data/output/pickles/'
+cache_path = '../data/output/cache/'
+
+# Processos e tamanho do lote usados no cálculo das métricas dos grafos.
+processos = 1
+tamanho_lote = 1000
+
+# Limites da enumeração das cliques de cada grafo (None = sem limite, o cálculo
+# exato). Grafos que atingem algum deles são marcados como truncados nos
+# relatórios e, como o resultado depende do tempo, não são guardados no cache
+# das métricas nem no estado do modo incremental.
+limite_cliques = None
+tempo_limite = None
+
+# Grafos mantidos no cache das métricas (0 = sem cache). O cache é salvo em
+# fg.cache_metricas_path e reaproveitado entre execuções.
+capacidade_cache = 100000
+
+# Combinações de vínculos processadas, como '1' ou '1+3'.
+vinculos = ['1']
+
+arquivos_entrada = [
+    'infos_licitacoes.csv',
+    'licitacoes_cnpjs_licitantes.csv'
+]
+
+Etapa = namedtuple('Etapa', ['nome', 'dependencias', 'modulos', 'saidas', 'funcao'])
+
+
+def carga() -> dict:
+    """Carrega os arquivos principais e as relações de todos os vínculos usados."""
+    return {
+        'relacoes': cd.salvar_relacoes_vinculos(vinculos),
+        'infos': cd.salvar_informacoes_licitacoes(),
+        'licitantes': cd.salvar_cnpjs_por_licitacao()
+    }
+
+
+def monta_tabela(infos: pd.DataFrame, d_licitacoes) -> pd.DataFrame:
+    """Monta a tabela das licitações de todas as combinações de vínculos com a
+    coluna dos CNPJs licitantes, sem os grafos.
+    """
+    tabela = mg.monta_tabela_licitacoes(infos, vinculos)
+    tabela['cnpjs'] = tabela['licitacao'].apply(lambda x: d_licitacoes[str(x)])
+    return tabela
+
+
+def grafos(carga: dict) -> dict:
+    """Extrai as arestas de todas as licitações para cada combinação de
+    vínculos e gera a tabela das licitações e o armazém de grafos.
+    Os grafos networkX não fazem parte do resultado (nem do cache): a etapa
+    metricas os gera a partir das arestas.
+    """
+    arestas, tipos, d_licitacoes = mg.extrai_arestas(carga['relacoes'], carga['licitantes'])
+    tabela = monta_tabela(carga['infos'], d_licitacoes)
+    ag.salva(ag.grafos_path, tabela, d_licitacoes, arestas, tipos)
+    return {'armazem': ag.grafos_path, 'tabela': tabela, 'arestas': arestas, 'tipos': tipos,
+            'd_licitacoes': d_licitacoes}
+
+
+def metricas(grafos: dict) -> dict:
+    """Calcula as métricas (incluindo as cliques) de cada grafo uma única vez.
+    Grafos idênticos, de licitações ou execuções diferentes, são calculados
+    uma única vez com o cache das métricas.
+    """
+    d_grafos = mg.gera_grafos_vinculos(grafos['arestas'], grafos['tipos'], grafos['d_licitacoes'], vinculos)
+    cache = fg.CacheMetricas(capacidade_cache) if capacidade_cache else None
+    resultado = fg.calcula_metricas_vinculos(d_grafos, processos, tamanho_lote,
+                                             limite_cliques, tempo_limite, cache)
+    if cache is not None:
+        with ins.etapa('cache', **cache.estatisticas()):
+            cache.salva()
+        print(f"Cache das métricas: {cache.acertos} acertos, {cache.faltas} faltas "
+              f"({cache.taxa_acertos():.1%}).")
+    return resultado
+
+
+def relatorio_1(grafos: dict, metricas: dict):
+    # As métricas cobrem todas as licitações com CNPJs licitantes. O grafo só
+    # seria usado para as demais, cujo grafo é vazio.
+    tabela = grafos['tabela'].copy()
+    tabela['grafo'] = [fg.inicializa_grafo() for _ in range(len(tabela))]
+    rel1.gera_relatorio(tabela, metricas).to_csv(csv_path + 'relatorio_1')
+
+
+def relatorio_2(carga: dict, metricas: dict):
+    d = rel2.monta_dados_licitacoes(carga['infos'], carga['licitantes'])
+    cliques = rel2.gera_relatorio(d, metricas)
+    cliques.to_csv(csv_path + 'relatorio_2')
+    cliques.to_pickle(pickle_path + 'cliques_picles')
+    return cliques
+
+
+def relatorio_3(relatorio_2):
+    rel3.gera_relatorio(relatorio_2).to_csv(csv_path + 'relatorio_3')
+    rel3.indice_recorrencia(relatorio_2).to_csv(csv_path + 'recorrencia_cliques', index=False)
+
+
+def grau_competicao(grafos: dict):
+    tabela = grafos['tabela'].drop('cnpjs', axis=1)
+    cc.calcula(tabela, grafos['arestas'], grafos['d_licitacoes'], grafos['tipos']).to_csv(
+        csv_path + 'grau_competicao', index=False
+    )
+
+
+def edges(grafos: dict):
+    armazem = ag.ArmazemGrafos(grafos['armazem'])
+    for vinculo in vinculos:
+        ma.salva_arestas(ma.gera_arestas(armazem, vinculo), csv_path + ma.arquivo_arestas(vinculo))
+        ip.salva(ip.caminho_vinculo(vinculo), armazem, vinculo)
+
+
+def saidas_edges() -> list:
+    return [csv_path + ma.arquivo_arestas(vinculo) for vinculo in vinculos] + \
+        [ip.caminho_vinculo(vinculo) for vinculo in vinculos]
+
+
+ETAPAS = [
+    Etapa('carga', [], [cd], [], carga),
+    Etapa('grafos', ['carga'], [cd, fg, mg, ag], [ag.grafos_path], grafos),
+    Etapa('metricas', ['grafos'], [fg, mg], [], metricas),
+    Etapa('relatorio_1', ['grafos', 'metricas'], [rel1], [csv_path + 'relatorio_1'], relatorio_1),
+    Etapa('relatorio_2', ['carga', 'metricas'], [rel2],
+          [csv_path + 'relatorio_2', pickle_path + 'cliques_picles'], relatorio_2),
+    Etapa('relatorio_3', ['relatorio_2'], [rel3], [csv_path + 'relatorio_3', csv_path + 'recorrencia_cliques'],
+          relatorio_3),
+    Etapa('grau_competicao', ['grafos'], [fg, cc], [csv_path + 'grau_competicao'], grau_competicao),
+    Etapa('edges', ['grafos'], [ag, ma, ip], saidas_edges, edges),
+]
+
+
+def hash_arquivo(caminho: str, h=None):
+    """Acumula o conteúdo do arquivo no hash h (sha256 por padrão)."""
+    h = h or hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloco)
+    return h
+
+
+def calcula_chaves(etapas: dict) -> dict:
+    """Calcula a chave de cada etapa a partir do hash das suas entradas."""
+    chaves = {}
+    for etapa in etapas.values():
+        h = hashlib.sha256(etapa.nome.encode())
+        for modulo in etapa.modulos:
+            hash_arquivo(modulo.__file__, h)
+        if not etapa.dependencias:
+            for arquivo in arquivos_carga():
+                hash_arquivo(arquivo, h)
+            h.update(repr(vinculos).encode())
+            # Os resultados guardam objetos do pandas e do numpy, cujo formato
+            # no Pickle pode mudar entre versões.
+            h.update(repr((pd.__version__, np.__version__)).encode())
+        if etapa.nome == 'metricas':
+            # Os limites da enumeração das cliques mudam o resultado da etapa.
+            h.update(repr((limite_cliques, tempo_limite)).encode())
+        for dependencia in etapa.dependencias:
+            h.update(chaves[dependencia].encode())
+        chaves[etapa.nome] = h.hexdigest()
+    return chaves
+
+
+def arquivos_carga() -> list:
+    """Arquivos de entrada lidos pela carga, incluindo os dos vínculos usados."""
+    mascara = 0
+    for vinculo in vinculos:
+        mascara |= cd.mascara_vinculo(vinculo)
+    arquivos = [cd.data_path + arquivo for arquivo in arquivos_entrada]
+    return arquivos + [arquivo for codigo, arquivo in sorted(cd.arquivos_vinculos.items())
+                       if mascara >> (codigo - 1) & 1]
+
+
+def saidas(etapa: Etapa) -> list:
+    """Arquivos gerados pela etapa. saidas pode ser uma lista ou uma função que
+    a retorna, para saídas que dependem da configuração.
+    """
+    return etapa.saidas() if callable(etapa.saidas) else etapa.saidas
+
+
+def caminho_cache(nome: str, chave: str) -> str:
+    return os.path.join(cache_path, f'{nome}-{chave[:16]}.pkl')
+
+
+def seleciona_etapas(alvos: list) -> dict:
+    """Retorna, em ordem topológica, as etapas alvo e todas as suas dependências."""
+    por_nome = {etapa.nome: etapa for etapa in ETAPAS}
+    necessarias = set()
+    pendentes = list(alvos)
+    while pendentes:
+        nome = pendentes.pop()
+        if nome not in necessarias:
+            necessarias.add(nome)
+            pendentes.extend(por_nome[nome].dependencias)
+    return {etapa.nome: etapa for etapa in ETAPAS if etapa.nome in necessarias}
+
+
+def executa(alvos: list = None, forcar: bool = False) -> dict:
+    """Executa as etapas alvo (todas por padrão), reaproveitando do cache as
+    etapas cujas entradas não mudaram. Retorna a situação de cada etapa.
+    """
+    os.makedirs(cache_path, exist_ok=True)
+    etapas = seleciona_etapas(alvos or [etapa.nome for etapa in ETAPAS])
+    chaves = calcula_chaves(etapas)
+
+    # Uma etapa só é executada se o seu resultado não estiver em cache ou se
+    # algum dos arquivos que ela gera não existir. Mudanças nas etapas
+    # anteriores já estão refletidas na chave.
+    executar = set()
+    for etapa in etapas.values():
+        if forcar or not os.path.exists(caminho_cache(etapa.nome, chaves[etapa.nome])) \
+                or not all(os.path.exists(saida) for saida in saidas(etapa)):
+            executar.add(etapa.nome)
+
+    resultados = {}
+
+    def resultado(nome: str):
+        # Resultados de etapas puladas só são lidos do cache quando necessários.
+        if nome not in resultados:
+            with open(caminho_cache(nome, chaves[nome]), 'rb') as f:
+                resultados[nome] = pickle.load(f)
+        return resultados[nome]
+
+    situacao = {}
+    for etapa in etapas.values():
+        if etapa.nome not in executar:
+            situacao[etapa.nome] = 'cache'
+            print(f"Etapa {etapa.nome}: reaproveitada do cache.")
+            continue
+
+        dependencias = [resultado(d) for d in etapa.dependencias]
+        with ins.etapa(etapa.nome):
+            resultados[etapa.nome] = etapa.funcao(*dependencias)
+
+        # Escreve em um arquivo temporário e o troca pelo definitivo ao final,
+        # para que uma interrupção nunca deixe um resultado pela metade na
+        # chave da etapa. Os resultados antigos são removidos depois.
+        caminho = caminho_cache(etapa.nome, chaves[etapa.nome])
+        with open(caminho + '.tmp', 'wb') as f:
+            pickle.dump(resultados[etapa.nome], f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(caminho + '.tmp', caminho)
+        for arquivo in os.listdir(cache_path):
+            if arquivo.startswith(etapa.nome + '-') and os.path.join(cache_path, arquivo) != caminho:
+                os.remove(os.path.join(cache_path, arquivo))
+        situacao[etapa.nome] = 'executada'
+        print(f"Etapa {etapa.nome}: executada.")
+    return situacao
+
+
+def configura(n_processos: int, lote: int, limite: int = limite_cliques, tempo: float = tempo_limite,
+              combinacoes: list = None, capacidade: int = None):
+    """Altera o número de processos, o tamanho do lote, os limites e a
+    capacidade do cache do cálculo das métricas e as combinações de vínculos
+    processadas.
+    """
+    global processos, tamanho_lote, limite_cliques, tempo_limite, vinculos, capacidade_cache
+    processos, tamanho_lote, limite_cliques, tempo_limite = n_processos, lote, limite, tempo
+    # Combinações repetidas (como 1+3 e 3+1) são processadas uma única vez.
+    vinculos = list(dict.fromkeys(cd.normaliza_vinculo(vinculo) for vinculo in combinacoes or vinculos))
+    if capacidade is not None:
+        capacidade_cache = capacidade
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Executa o pipeline de grafos e relatórios.')
+    parser.add_argument('etapas', nargs='*', help='etapas a executar (todas por padrão)')
+    parser.add_argument('--forcar', action='store_true', help='ignora o cache e executa tudo')
+    parser.add_argument('--processos', type=int, default=processos,
+                        help='processos usados no cálculo das métricas')
+    parser.add_argument('--lote', type=int, default=tamanho_lote,
+                        help='grafos enviados a cada processo por vez')
+    parser.add_argument('--limite-cliques', type=int, default=limite_cliques,
+                        help='máximo de cliques enumeradas por grafo (sem limite por padrão)')
+    parser.add_argument('--tempo-limite', type=float, default=tempo_limite,
+                        help='segundos de enumeração por grafo (sem limite por padrão)')
+    parser.add_argument('--capacidade-cache', type=int, default=capacidade_cache,
+                        help='grafos mantidos no cache das métricas (0 = sem cache)')
+    parser.add_argument('--vinculos', nargs='+', default=vinculos,
+                        help="combinações de vínculos, como 1 ou 1+3 (1 = societário, "
+                             "2 = endereço, 3 = telefone)")
+    parser.add_argument('--registro', default=ins.registro_path,
+                        help="arquivo JSONL com as medidas de cada etapa ('' desativa)")
+    parser.add_argument('--perfilar', metavar='ETAPA',
+                        help='etapa perfilada, como metricas ou grafos.metricas')
+    parser.add_argument('--perfilador', choices=['cprofile', 'amostragem'], default=ins.perfilador)
+    args = parser.parse_args()
+    nomes = [etapa.nome for etapa in ETAPAS]
+    for nome in args.etapas:
+        if nome not in nomes:
+            parser.error(f"etapa desconhecida: {nome} (opções: {', '.join(nomes)})")
+    for vinculo in args.vinculos:
+        try:
+            cd.mascara_vinculo(vinculo)
+        except ValueError:
+            parser.error(f"combinação de vínculos inválida: {vinculo}")
+    configura(args.processos, args.lote, args.limite_cliques or None, args.tempo_limite or None,
+              args.vinculos, args.capacidade_cache)
+    ins.configura(args.registro, args.perfilar, args.perfilador)
+    executa(args.etapas, args.forcar)
+
+
+if __name__ == '__main__':
+    main()
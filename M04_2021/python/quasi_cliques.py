@@ -0,0 +1,291 @@
+# ==============================================================================
+# CROSS-GRAPH QUASI-CLIQUES MAXIMAIS ENTRE LICITAÇÕES
+# ==============================================================================
+
+# Substitui as duas chamadas ao multidupehack e o filtro em awk de
+# l_scripts/maximal-cross-graph-quasi-cliques/maximal-cross-graph-quasi-cliques.sh.
+
+# A entrada é o tensor (cnpj, cnpj, licitação, peso) formado pelos arquivos de
+# arestas do modela_arestas.py (uma linha cnpj_1,cnpj_2,licitacao por vínculo em
+# uma licitação). O vínculo societário tem peso 1 e o telefônico tem o peso
+# informado (0,6 por padrão); se um par tiver os dois, vale o maior peso.
+
+# Um padrão é um conjunto de CNPJs X e um conjunto de licitações L tal que, em
+# cada licitação de L, o ruído de X é no máximo o ruído máximo. O ruído de uma
+# licitação soma 1 - peso para cada par ordenado de CNPJs distintos de X, como
+# no grafo direcionado do multidupehack: um vínculo que falta conta 2 e um
+# vínculo telefônico de peso 0,6 conta 0,8. Todo CNPJ de X deve ter algum
+# vínculo em cada licitação de L. Os padrões gerados são maximais: nenhum CNPJ
+# ou licitação pode ser acrescentado sem exceder o ruído.
+
+# Saída, uma linha por padrão (o mesmo formato lido por rank.sh e pdf-table.sh):
+
+# cnpj_1#ruído,...,cnpj_n#ruído licitação_1#ruído,...,licitação_m#ruído
+
+# Primeiro vêm as quasi-cliques com pelo menos tamanho_minimo CNPJs e, depois,
+# as cliques exatas de 2 CNPJs (somente vínculos de peso 1, sem ruído) que não
+# estão contidas em nenhuma quasi-clique anterior.
+
+# Uso: python quasi_cliques.py vinculo-societario [vinculo-telefonico] [peso-telefonico]
+#          [--ruido R] [--tamanho-minimo S] [--processos N] [--saida arquivo]
+
+import argparse
+import sys
+from collections import defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Pacotes implementados
+import carregamento_dados as cd
+
+PESO_TELEFONE = 0.6
+
+# Ruído máximo por licitação: um vínculo que falta (duas arestas no grafo
+# direcionado).
+RUIDO_MAXIMO = 2
+TAMANHO_MINIMO = 3
+
+# Tolerância nas comparações de ruídos calculados com pesos fracionários.
+TOLERANCIA = 1e-9
+
+# Tensor com CNPJs e licitações internados em IDs. pesos[(a, b)], com a < b, é o
+# dicionário d[licitacao] = peso do vínculo entre a e b na licitação.
+Tensor = namedtuple('Tensor', ['cnpjs', 'licitacoes', 'pesos', 'participantes', 'licitacoes_por_cnpj'])
+
+# Padrão encontrado, com o ruído de cada CNPJ e de cada licitação.
+Padrao = namedtuple('Padrao', ['cnpjs', 'licitacoes', 'ruido_cnpjs', 'ruido_licitacoes'])
+
+
+def carrega_vinculos(caminho: str) -> pd.DataFrame:
+    """Lê um arquivo de arestas com três campos separados por ',' e/ou ' ':
+    dois CNPJs vinculados e uma licitação da qual participaram.
+    """
+    return pd.read_csv(
+        caminho,
+        sep='[, ]+',
+        engine='python',
+        header=None,
+        names=['cnpj_1', 'cnpj_2', 'licitacao'],
+        dtype=str
+    )
+
+
+def monta_tensor(camadas: list) -> Tensor:
+    """Monta o tensor a partir de uma lista de pares (arestas, peso), em que
+    arestas é uma tabela de carrega_vinculos.
+    """
+    vinculos = pd.concat([arestas.assign(peso=peso) for arestas, peso in camadas], ignore_index=True)
+    vinculos = vinculos[vinculos['cnpj_1'] != vinculos['cnpj_2']]
+    cnpjs = cd.interna_chaves(vinculos['cnpj_1'], vinculos['cnpj_2'])
+    licitacoes = cd.interna_chaves(vinculos['licitacao'])
+
+    # Vínculos são simétricos: cada par é guardado uma única vez, com a < b.
+    a = cd.ids_internados(cnpjs, vinculos['cnpj_1'])
+    b = cd.ids_internados(cnpjs, vinculos['cnpj_2'])
+    vinculos = pd.DataFrame({
+        'a': np.minimum(a, b),
+        'b': np.maximum(a, b),
+        'licitacao': cd.ids_internados(licitacoes, vinculos['licitacao']),
+        'peso': vinculos['peso'].to_numpy(dtype=float)
+    }).groupby(['a', 'b', 'licitacao'], as_index=False)['peso'].max()
+
+    pesos = defaultdict(dict)
+    participantes = defaultdict(set)
+    licitacoes_por_cnpj = defaultdict(set)
+    for a, b, licitacao, peso in vinculos.itertuples(index=False):
+        pesos[(a, b)][licitacao] = peso
+        participantes[licitacao].update((a, b))
+        licitacoes_por_cnpj[a].add(licitacao)
+        licitacoes_por_cnpj[b].add(licitacao)
+    return Tensor(cnpjs, licitacoes, dict(pesos), dict(participantes), dict(licitacoes_por_cnpj))
+
+
+def par(a: int, b: int) -> tuple:
+    return (a, b) if a < b else (b, a)
+
+
+def ruido_com(tensor: Tensor, cnpjs: list, y: int, ruido: dict, ruido_maximo: float) -> dict:
+    """Retorna o ruído de cada licitação de ruido (d[licitacao] = ruído de cnpjs)
+    depois de acrescentar o CNPJ y, sem as licitações que excedem o ruído máximo
+    ou das quais y não participa.
+    """
+    soma_pesos = defaultdict(float)
+    for x in cnpjs:
+        for licitacao, peso in tensor.pesos.get(par(x, y), {}).items():
+            soma_pesos[licitacao] += peso
+
+    participa = tensor.licitacoes_por_cnpj[y]
+    novo = {}
+    for licitacao, r in ruido.items():
+        if licitacao in participa:
+            # Os pares (x, y) e (y, x) contribuem, cada um, com 1 - peso.
+            r += 2 * (len(cnpjs) - soma_pesos[licitacao])
+            if r <= ruido_maximo + TOLERANCIA:
+                novo[licitacao] = r
+    return novo
+
+
+def eh_maximal(tensor: Tensor, cnpjs: list, ruido: dict, ruido_maximo: float) -> bool:
+    """Verifica se nenhum CNPJ pode ser acrescentado mantendo todas as licitações."""
+    licitacoes = sorted(ruido, key=lambda l: len(tensor.participantes[l]))
+    candidatos = set(tensor.participantes[licitacoes[0]])
+    for licitacao in licitacoes[1:]:
+        candidatos &= tensor.participantes[licitacao]
+    candidatos.difference_update(cnpjs)
+    return all(len(ruido_com(tensor, cnpjs, y, ruido, ruido_maximo)) < len(ruido) for y in candidatos)
+
+
+def monta_padrao(tensor: Tensor, cnpjs: list, ruido: dict) -> Padrao:
+    licitacoes = sorted(ruido)
+    ruido_cnpjs = []
+    for x in cnpjs:
+        r = 0.0
+        for y in cnpjs:
+            if y != x:
+                pesos = tensor.pesos.get(par(x, y), {})
+                r += sum(1 - pesos.get(licitacao, 0.0) for licitacao in licitacoes)
+        ruido_cnpjs.append(r)
+    return Padrao(tuple(cnpjs), tuple(licitacoes), tuple(ruido_cnpjs), tuple(ruido[l] for l in licitacoes))
+
+
+# Parâmetros da busca em cada processo: (tensor, ruido_maximo, tamanho_minimo).
+_busca = None
+
+
+def _inicia_busca(tensor: Tensor, ruido_maximo: float, tamanho_minimo: int):
+    global _busca
+    _busca = (tensor, ruido_maximo, tamanho_minimo)
+
+
+def busca_raiz(raiz: int) -> list:
+    """Busca em profundidade os padrões maximais cujo menor CNPJ é raiz. Os CNPJs
+    são acrescentados em ordem crescente de ID, de forma que cada conjunto é
+    visitado uma única vez, e um ramo termina quando nenhuma licitação resta.
+    """
+    tensor, ruido_maximo, tamanho_minimo = _busca
+    padroes = []
+
+    def expande(cnpjs: list, ruido: dict):
+        if len(cnpjs) >= tamanho_minimo and eh_maximal(tensor, cnpjs, ruido, ruido_maximo):
+            padroes.append(monta_padrao(tensor, cnpjs, ruido))
+
+        candidatos = set()
+        for licitacao in ruido:
+            candidatos |= tensor.participantes[licitacao]
+        for y in sorted(c for c in candidatos if c > cnpjs[-1]):
+            novo = ruido_com(tensor, cnpjs, y, ruido, ruido_maximo)
+            if novo:
+                cnpjs.append(y)
+                expande(cnpjs, novo)
+                cnpjs.pop()
+
+    expande([raiz], {licitacao: 0.0 for licitacao in tensor.licitacoes_por_cnpj[raiz]})
+    return padroes
+
+
+def quasi_cliques(tensor: Tensor, ruido_maximo: float = RUIDO_MAXIMO, tamanho_minimo: int = TAMANHO_MINIMO,
+                  processos: int = 1, tamanho_lote: int = 64) -> list:
+    """Retorna as quasi-cliques maximais com pelo menos tamanho_minimo CNPJs.
+    Com mais de um processo, os CNPJs raiz da busca são distribuídos em lotes
+    de tamanho_lote entre os processos.
+    """
+    raizes = sorted(tensor.licitacoes_por_cnpj)
+    if processos <= 1:
+        _inicia_busca(tensor, ruido_maximo, tamanho_minimo)
+        resultados = map(busca_raiz, raizes)
+        return [padrao for padroes in resultados for padrao in padroes]
+    with ProcessPoolExecutor(max_workers=processos, initializer=_inicia_busca,
+                             initargs=(tensor, ruido_maximo, tamanho_minimo)) as executor:
+        resultados = executor.map(busca_raiz, raizes, chunksize=tamanho_lote)
+        return [padrao for padroes in resultados for padrao in padroes]
+
+
+def cliques_de_pares(tensor: Tensor) -> list:
+    """Retorna as cliques exatas de 2 CNPJs: cada par com vínculo de peso 1 e
+    todas as licitações em que esse vínculo ocorre.
+    """
+    padroes = []
+    for (a, b), pesos in sorted(tensor.pesos.items()):
+        licitacoes = tuple(sorted(l for l, peso in pesos.items() if peso >= 1 - TOLERANCIA))
+        if licitacoes:
+            padroes.append(Padrao((a, b), licitacoes, (0.0, 0.0), (0.0,) * len(licitacoes)))
+    return padroes
+
+
+def remove_contidos(pares: list, padroes: list) -> list:
+    """Remove os pares cujos CNPJs e licitações estão contidos em algum padrão.
+    Os padrões candidatos de cada par vêm de um índice invertido CNPJ -> padrões.
+    """
+    indice = defaultdict(set)
+    for i, padrao in enumerate(padroes):
+        for cnpj in padrao.cnpjs:
+            indice[cnpj].add(i)
+    licitacoes = [frozenset(padrao.licitacoes) for padrao in padroes]
+
+    restantes = []
+    for p in pares:
+        a, b = p.cnpjs
+        if not any(licitacoes[i].issuperset(p.licitacoes) for i in indice[a] & indice[b]):
+            restantes.append(p)
+    return restantes
+
+
+def minera(tensor: Tensor, ruido_maximo: float = RUIDO_MAXIMO, tamanho_minimo: int = TAMANHO_MINIMO,
+           processos: int = 1) -> tuple:
+    """Retorna as quasi-cliques maximais e as cliques de 2 CNPJs que não estão
+    contidas nelas.
+    """
+    padroes = quasi_cliques(tensor, ruido_maximo, tamanho_minimo, processos)
+    return padroes, remove_contidos(cliques_de_pares(tensor), padroes)
+
+
+def formata_ruido(ruido: float) -> str:
+    return f"{ruido:g}"
+
+
+def formata_padrao(tensor: Tensor, padrao: Padrao, com_ruido: bool = True) -> str:
+    """Escreve o padrão no formato de saída, com os elementos em ordem crescente."""
+    cnpjs = tensor.cnpjs[list(padrao.cnpjs)]
+    licitacoes = tensor.licitacoes[list(padrao.licitacoes)]
+    if not com_ruido:
+        return ','.join(cnpjs) + ' ' + ','.join(licitacoes)
+    return ','.join(f"{c}#{formata_ruido(r)}" for c, r in zip(cnpjs, padrao.ruido_cnpjs)) + ' ' + \
+        ','.join(f"{l}#{formata_ruido(r)}" for l, r in zip(licitacoes, padrao.ruido_licitacoes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Minera cross-graph quasi-cliques maximais.')
+    parser.add_argument('societario', help='arquivo de arestas do vínculo societário (peso 1)')
+    parser.add_argument('telefonico', nargs='?', help='arquivo de arestas do vínculo telefônico')
+    parser.add_argument('peso_telefonico', nargs='?', type=float, default=PESO_TELEFONE,
+                        help=f'peso do vínculo telefônico (padrão {PESO_TELEFONE})')
+    parser.add_argument('--ruido', type=float, default=RUIDO_MAXIMO,
+                        help='ruído máximo por licitação (um vínculo que falta = 2)')
+    parser.add_argument('--tamanho-minimo', type=int, default=TAMANHO_MINIMO,
+                        help='número mínimo de CNPJs das quasi-cliques')
+    parser.add_argument('--processos', type=int, default=1, help='processos usados na busca')
+    parser.add_argument('--saida', help='arquivo de saída (saída padrão se omitido)')
+    args = parser.parse_args()
+
+    camadas = [(carrega_vinculos(args.societario), 1.0)]
+    if args.telefonico:
+        camadas.append((carrega_vinculos(args.telefonico), args.peso_telefonico))
+    tensor = monta_tensor(camadas)
+
+    padroes, pares = minera(tensor, args.ruido, args.tamanho_minimo, args.processos)
+
+    saida = open(args.saida, 'w') if args.saida else sys.stdout
+    try:
+        for padrao in padroes:
+            saida.write(formata_padrao(tensor, padrao) + '\n')
+        for padrao in pares:
+            saida.write(formata_padrao(tensor, padrao, com_ruido=False) + '\n')
+    finally:
+        if args.saida:
+            saida.close()
+
+
+if __name__ == '__main__':
+    main()
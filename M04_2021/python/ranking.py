@@ -0,0 +1,169 @@
+# ==============================================================================
+# RANKING DE ALARME DOS PADRÕES E DOS PARES DE CNPJs
+# ==============================================================================
+
+# Substitui o awk de l_scripts/maximal-cross-graph-quasi-cliques/rank.sh e
+# completa o esboço de p_rank.sh.
+
+# Padrões (saída do quasi_cliques.py): uma linha "cnpjs licitações", ambos
+# separados por ',', em que cada licitação pode ser seguida de '#' e do seu
+# ruído (0 se omitido). O nível de alarme de um padrão com n CNPJs é
+
+# soma, sobre as licitações, de valor * (max_arestas - ruído)^2 / max_arestas / 2
+
+# com max_arestas = n * (n - 1). A saída tem uma linha por padrão, como no
+# rank.sh:
+
+# cnpjs    licitações    alarme    qtd_cnpjs    qtd_licitacoes    soma_valores
+
+# Pares (saída do modela_arestas.py ou arquivos de vínculos): uma linha
+# cnpj_1,cnpj_2,licitacao. A saída tem uma linha por par de CNPJs:
+
+# cnpj_1,cnpj_2    licitações    qtd_licitacoes    soma_valores
+
+# As linhas são ordenadas da maior para a menor. Com --top k, somente as k
+# primeiras são selecionadas, sem ordenar as demais.
+
+# Uso: python ranking.py padroes arquivo [valores] [--top K]
+#      python ranking.py pares arquivo [valores] [--top K]
+
+import argparse
+import io
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Pacotes implementados
+import carregamento_dados as cd
+
+valores_path = cd.data_path + 'valores_lic.csv'
+
+
+def carrega_valores(caminho: str = valores_path) -> pd.Series:
+    """Retorna o valor de cada licitação (licitações sem valor valem 0).
+    Como no rank.sh, cada linha tem a licitação e o seu valor separados por
+    ';' ou ' ', e o cabeçalho do valores_lic.csv é opcional.
+    """
+    # Os espaços viram ';' para que a leitura use o parser em C do pandas.
+    with open(caminho, 'r') as arquivo:
+        texto = arquivo.read().replace(' ', ';')
+    cabecalho = texto.startswith('seq_dim_licitacao;')
+    valores = pd.read_csv(io.StringIO(texto), sep=';', header=None, skiprows=1 if cabecalho else 0,
+                          usecols=[0, 1], names=['seq_dim_licitacao', 'vlr_licitacao'],
+                          dtype={'seq_dim_licitacao': str})
+    valores = valores.drop_duplicates('seq_dim_licitacao', keep='last')
+    valores = valores.set_index('seq_dim_licitacao')['vlr_licitacao']
+    return pd.to_numeric(valores, errors='coerce').fillna(0.0)
+
+
+def le_padroes(linhas) -> pd.DataFrame:
+    """Monta a tabela de padrões (cnpjs, licitacoes) a partir das linhas da saída
+    do quasi_cliques.py (um arquivo aberto ou qualquer iterável de linhas).
+    """
+    campos = [linha.split() for linha in linhas if linha.strip()]
+    return pd.DataFrame(campos, columns=['cnpjs', 'licitacoes'])
+
+
+def seleciona(df: pd.DataFrame, colunas: list, crescentes: list, top: int = None) -> pd.DataFrame:
+    """Ordena df pelas colunas. Com top, seleciona antes as top linhas pelas
+    colunas numéricas decrescentes com nlargest (seleção parcial) e ordena
+    somente elas, mantendo os empates na última posição.
+    """
+    if top is not None:
+        decrescentes = [c for c, crescente in zip(colunas, crescentes) if not crescente]
+        df = df.nlargest(top, decrescentes, keep='all')
+    df = df.sort_values(colunas, ascending=crescentes, kind='stable')
+    return df if top is None else df.head(top)
+
+
+def ranking_padroes(padroes: pd.DataFrame, valores: pd.Series, top: int = None) -> pd.DataFrame:
+    """Calcula o nível de alarme, a quantidade de CNPJs e de licitações e a
+    soma dos valores das licitações de cada padrão.
+    """
+    padroes = padroes.reset_index(drop=True)
+    qtd_cnpjs = padroes['cnpjs'].str.count(',').to_numpy() + 1
+    max_arestas = qtd_cnpjs * (qtd_cnpjs - 1)
+
+    # Uma linha por (padrão, licitação), com o valor e o ruído da licitação.
+    licitacoes = padroes['licitacoes'].str.split(',').explode()
+    partes = licitacoes.str.split('#', n=1, expand=True).reindex(columns=[0, 1])
+    valor = partes[0].map(valores).fillna(0.0).to_numpy()
+    ruido = pd.to_numeric(partes[1], errors='coerce').fillna(0.0).to_numpy()
+    padrao = licitacoes.index.to_numpy()
+
+    m = max_arestas[padrao]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        alarme = valor * (m - ruido) ** 2 / m / 2
+    n = len(padroes)
+    df = pd.DataFrame({
+        'cnpjs': padroes['cnpjs'],
+        'licitacoes': padroes['licitacoes'],
+        # Os valores são truncados para inteiros, como no rank.sh.
+        'alarme': np.trunc(np.bincount(padrao, weights=alarme, minlength=n)).astype(np.int64),
+        'qtd_cnpjs': qtd_cnpjs,
+        'qtd_licitacoes': np.bincount(padrao, minlength=n),
+        'soma_valores': np.trunc(np.bincount(padrao, weights=valor, minlength=n)).astype(np.int64)
+    })
+    return seleciona(df, ['alarme', 'qtd_cnpjs', 'qtd_licitacoes', 'cnpjs'], [False, False, False, True], top)
+
+
+def ranking_pares(arestas: pd.DataFrame, valores: pd.Series, top: int = None) -> pd.DataFrame:
+    """Soma o valor das licitações em que cada par de CNPJs vinculados concorre.
+    arestas tem as colunas cnpj_1, cnpj_2 e licitacao (como modela_arestas.gera_arestas).
+    """
+    cnpj_1 = arestas['cnpj_1'].to_numpy(dtype=str)
+    cnpj_2 = arestas['cnpj_2'].to_numpy(dtype=str)
+    # O vínculo não tem direção: o par é escrito com o menor CNPJ primeiro.
+    menor = np.where(cnpj_1 <= cnpj_2, cnpj_1, cnpj_2)
+    maior = np.where(cnpj_1 <= cnpj_2, cnpj_2, cnpj_1)
+    df = pd.DataFrame({
+        'cnpjs': pd.Series(menor) + ',' + pd.Series(maior),
+        'licitacao': arestas['licitacao'].astype(str).to_numpy()
+    }).drop_duplicates().sort_values('licitacao', kind='stable')
+    df['valor'] = df['licitacao'].map(valores).fillna(0.0)
+
+    pares = df.groupby('cnpjs', sort=False).agg(
+        licitacoes=('licitacao', ','.join),
+        qtd_licitacoes=('licitacao', 'size'),
+        soma_valores=('valor', 'sum')
+    ).reset_index()
+    pares['soma_valores'] = np.trunc(pares['soma_valores']).astype(np.int64)
+    return seleciona(pares, ['soma_valores', 'qtd_licitacoes', 'cnpjs'], [False, False, True], top)
+
+
+def le_arestas(caminho: str) -> pd.DataFrame:
+    """Lê um arquivo de arestas cnpj_1,cnpj_2,licitacao (separados por ',' e/ou ' ')."""
+    return pd.read_csv(
+        caminho,
+        sep='[, ]+',
+        engine='python',
+        header=None,
+        names=['cnpj_1', 'cnpj_2', 'licitacao'],
+        dtype=str
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ordena padrões ou pares de CNPJs pelo nível de alarme.')
+    parser.add_argument('tipo', choices=['padroes', 'pares'])
+    parser.add_argument('arquivo', help="arquivo de padrões ou de arestas ('-' para a entrada padrão)")
+    parser.add_argument('valores', nargs='?', default=valores_path, help='arquivo de valores das licitações')
+    parser.add_argument('--top', type=int, help='quantidade de linhas na saída (todas por padrão)')
+    args = parser.parse_args()
+
+    valores = carrega_valores(args.valores)
+    entrada = sys.stdin if args.arquivo == '-' else args.arquivo
+    if args.tipo == 'padroes':
+        if entrada is sys.stdin:
+            ranking = ranking_padroes(le_padroes(entrada), valores, args.top)
+        else:
+            with open(entrada) as f:
+                ranking = ranking_padroes(le_padroes(f), valores, args.top)
+    else:
+        ranking = ranking_pares(le_arestas(entrada), valores, args.top)
+    ranking.to_csv(sys.stdout, sep='\t', header=False, index=False)
+
+
+if __name__ == '__main__':
+    main()
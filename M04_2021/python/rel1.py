@@ -4,7 +4,11 @@
 
 # ano;municipio;tipo_processo_licitatorio;id_licitacao;valor;vínculo_em_uso;
 # quantidade_cnpjs(vértices);quantidade_vinculos(arestas);densidade_grafo;
-# tamanho_max_clique_encontrada;lista_de_cnpjs_separado_por_virgula
+# tamanho_max_clique_encontrada;lista_de_cnpjs_separado_por_virgula;truncado
+
+# OBS. truncado indica que a enumeração das cliques do grafo parou no limite
+# de cliques ou de tempo. Nesse caso qtd_cliques é parcial e
+# tamanho_max_clique vem da busca da max clique (também sujeita ao tempo).
 
 # OBS. colocar os CNPJs separados por vírgula permitirá que eles fiquem
 # dentro de um único campo.
@@ -14,6 +18,9 @@
 # - Vínculo Endereços  = 2
 # - Vínculo Telefones  = 3
 
+# Combinações de vínculos usam os códigos separados por '+' (por exemplo,
+# 1+3 para os vínculos societário e telefônico) e geram as suas próprias linhas.
+
 # ou usar strings até termos previsão de um banco de dados para isso:
 # - Vínculo Societário = V_SOCIE
 # - Vínculo Endereços  = V_ENDER
@@ -22,50 +29,61 @@
 import pandas as pd
 
 # Pacotes implementados
-import carregamento_dados as cd
+import armazem_grafos as ag
 import ferramentas_grafos as fg
-
-
-def main():
-    dump_path = '../data/output/csv/'
-    df = pd.read_pickle('../data/output/pickles/' + 'grafos_licitacoes')
-
-    # Gera a coluna com o número de vértices do grafo das licitações
-    df["quantidade_cnpjs"] = df['grafo'].apply(
-        lambda x: fg.calcula_quantidade_vertices(x)
-    )
-
-    # Gera a coluna com o número de arestas do grafo das licitações
-    df["quantidade_vinculos"] = df['grafo'].apply(
-        lambda x: fg.calcula_quantidade_arestas(x)
-    )
-
-    # Gera a coluna com a densidade do grafo das licitações
-    df["densidade"] = df['grafo'].apply(
-        lambda x: fg.calcula_densidade(x)
-    )
-
-    # Gera a coluna das cliques dos grafos das licitações
-    df["qtd_cliques"] = df['grafo'].apply(
-        lambda x: fg.conta_cliques(x)
-    )
-
-    # Gera a coluna das cliques dos grafos das licitações
-    df["tamanho_max_clique"] = df['grafo'].apply(
-        lambda x: fg.calcula_tamanho_max_clique(fg.lista_cliques(x))
-    )
+import instrumentacao as ins
+
+
+def gera_relatorio(df: pd.DataFrame, metricas: dict = None, processos: int = 1,
+                   cache: fg.CacheMetricas = None) -> pd.DataFrame:
+    """Gera o relatório 1 a partir da tabela de grafos das licitações.
+    Se as métricas de cada licitação (d[vinculo][licitacao] = fg.Metricas) já
+    tiverem sido calculadas, elas são reaproveitadas. Caso contrário, são
+    calculadas com o cache informado.
+    """
+    df = df.copy()
+
+    # Calcula todas as métricas dos grafos das licitações de uma só vez.
+    if metricas is None:
+        registros = fg.calcula_metricas_lote(df['grafo'], processos, cache=cache)
+    else:
+        registros = [
+            metricas[vinculo][licitacao] if licitacao in metricas.get(vinculo, {}) else fg.calcula_metricas(grafo)
+            for vinculo, licitacao, grafo in df[['vinculo_em_uso', 'licitacao', 'grafo']].values
+        ]
+
+    # Gera as colunas com o número de vértices, o número de arestas, a
+    # densidade, a quantidade de cliques e o tamanho da max clique do grafo
+    # das licitações.
+    df["quantidade_cnpjs"] = [r.quantidade_vertices for r in registros]
+    df["quantidade_vinculos"] = [r.quantidade_arestas for r in registros]
+    df["densidade"] = [r.densidade for r in registros]
+    df["qtd_cliques"] = [len(r.cliques) for r in registros]
+    df["tamanho_max_clique"] = [r.tamanho_max_clique for r in registros]
+    df["truncado"] = [r.truncado for r in registros]
 
     df = df[df.quantidade_cnpjs != 0]
 
     # A coluna que armazena o grafo para cada licitação não é necessária
     # no relatório e pode ser removida.
-    df = df.drop('grafo', axis=1)
+    return df.drop('grafo', axis=1)
 
-    # Salva o relatório 1 em arquivo csv
-    df.to_csv(dump_path + 'relatorio_1')
 
+def main():
+    with ins.etapa('rel1') as contagens:
+        dump_path = '../data/output/csv/'
+        df = ag.ArmazemGrafos(ag.grafos_path).tabela()
 
-if __name__ == '__main__':
-    main()
+        cache = fg.CacheMetricas()
+        df = gera_relatorio(df, cache=cache)
+        cache.salva()
+        contagens.update(cache.estatisticas())
+
+        # Salva o relatório 1 em arquivo csv
+        df.to_csv(dump_path + 'relatorio_1')
+        contagens['linhas'] = len(df)
+    print(f"Cache das métricas: {cache.acertos} acertos, {cache.faltas} faltas ({cache.taxa_acertos():.1%}).")
 
 
+if __name__ == '__main__':
+    main()
@@ -5,13 +5,19 @@
 
 # ano;municipio;tipo_processo_licitatorio;id_licitacao;valor;vínculo_em_uso;
 # quantidade_cnpjs(vértices);quantidade_vinculos(arestas);densidade_grafo;
-# tam_clique_encontrada;lista_de_cnpjs_separado_por_virgula_compondo_clique
+# tam_clique_encontrada;lista_de_cnpjs_separado_por_virgula_compondo_clique;truncado
 
 # OBS. se uma licitação tiver 5 cliques maximais, ela aparecerá em 5 linhas,
 # cada linha só mudará o tamanho da clique e os CNPJs envolvidos
 
 # A menor clique interessante é a de tamanho 2.
 
+# OBS. vinculo_em_uso é a combinação de vínculos do grafo (veja o rel1.py). Com
+# mais de uma combinação, as cliques de cada uma aparecem em linhas próprias.
+
+# OBS. truncado indica que a enumeração das cliques da licitação parou no
+# limite de cliques ou de tempo, e as linhas dela não são todas as cliques.
+
 
 from collections import defaultdict
 
@@ -19,34 +25,25 @@ import pandas as pd
 
 import carregamento_dados as cd
 import ferramentas_grafos as fg
+import instrumentacao as ins
+import modela_grafos as mg
 
 
-def main():
-    # Carrega os 3 arquivos principais.
-    csv_path = '../data/output/csv/'
-    pickle_path = '../data/output/pickles/'
-    relacoes_entre_cnpjs = cd.salvar_relacoes_entre_cnpjs()
-    informacoes_licitacoes = cd.salvar_informacoes_licitacoes()
-    cnpjs_por_licitacao = cd.salvar_cnpjs_por_licitacao()
-
-    # Cria dicionários de relações entre CNPJs e de CNPJs por licitação.
-    d_relacoes = cd.cnpjs_relacionados_por_cnpj(relacoes_entre_cnpjs)
-    d_licitacoes = cd.cnpjs_por_licitacao(cnpjs_por_licitacao)
-
+def monta_dados_licitacoes(informacoes_licitacoes: pd.DataFrame, cnpjs_por_licitacao: pd.DataFrame) -> dict:
+    """Cria dicionário que armazena informações principais por licitação que
+    possui informações de CNPJs licitantes.
+    """
     # Cria a lista de licitações que possui informações de CNPJs licitantes.
     dados_licitacao = cnpjs_por_licitacao.values
     licitacoes = [licitacao for licitacao, _ in dados_licitacao]
 
-    # Cria dicionário que armazena informações principais por licitação.
     d = {
         licitacao: {
             'cnpjs': [],
             'ano': None,
             'municipio': None,
             'modalidade': None,
-            'valor': None,
-            'grafo': None,
-            'cliques': None
+            'valor': None
         } for licitacao in licitacoes
     }
 
@@ -67,27 +64,23 @@ def main():
             # Exceção para licitações que não possuem informações de CNPJs licitantes,
             # nada é feito.
             pass
+    return d
 
-    # Gera o grafo de cada licitação e, em seguida, lista as cliques desse grafo.
-    # Idealmente, poderia ser recuperado do arquivo gerado em gera_grafos_licitacoes.py
-    # Como a execução do script é relativamente rápida, optou-se por recalcular esses dados.
-    for licitacao in licitacoes:
-        grafo = fg.gera_grafo_licitacao(
-            licitacao, d_relacoes, d_licitacoes
-        )
-        cliques = fg.lista_cliques(grafo)
-
-        d[licitacao]['grafo'] = grafo
-        d[licitacao]['cliques'] = cliques
 
+def gera_relatorio(d: dict, metricas: dict) -> pd.DataFrame:
+    """Gera o relatório 2, com uma linha por clique maximal de cada licitação e
+    combinação de vínculos. As métricas de cada grafo
+    (d[vinculo][licitacao] = fg.Metricas) são calculadas previamente, uma única
+    vez por licitação.
+    """
     # Cria o dicionário para armazenar informações relativas às cliques encontradas.
     c = defaultdict(dict)
 
     clique_id = 0
-    for licitacao in pd.Series(licitacoes).unique():
-        for clique in d[licitacao]['cliques']:
-            tamanho_clique = len(clique)
-            if tamanho_clique >= 2:
+    for vinculo in metricas:
+        for licitacao in d:
+            registro = metricas[vinculo][licitacao]
+            for clique in registro.cliques:
                 cnpjs = []
                 printable_cnpjs = ''
                 for cnpj in clique:
@@ -99,28 +92,57 @@ def main():
                     'tipo_processo_licitatorio': d[licitacao]['modalidade'],
                     'id_licitacao': licitacao,
                     'valor': d[licitacao]['valor'],
-                    'vinculo_em_uso': '1',
+                    'vinculo_em_uso': vinculo,
                     'quantidade_cnpjs': len(d[licitacao]['cnpjs']),
-                    'quantidade_vinculos': fg.calcula_quantidade_arestas(d[licitacao]['grafo']),
-                    'densidade_grafo': fg.calcula_densidade(d[licitacao]['grafo']),
-                    'tam_clique_encontrada': tamanho_clique,
+                    'quantidade_vinculos': registro.quantidade_arestas,
+                    'densidade_grafo': registro.densidade,
+                    'tam_clique_encontrada': len(clique),
                     'lista_de_cnpjs_compondo_clique': printable_cnpjs,
+                    'truncado': registro.truncado,
                     'cnpjs': cnpjs
                 }
                 clique_id += 1
 
     # Transforma o dicionário de cliques em um DataFrame para melhor visualização dos
     # dados e para salvamento do arquivo.
-    cliques = pd.DataFrame.from_dict(
+    return pd.DataFrame.from_dict(
         data=c,
         orient='index'
     )
 
-    # Salva o resultado em arquivo .csv e em Pickle para processamento posterior.
-    cliques.to_csv(csv_path + 'relatorio_2')
-    cliques.to_pickle(pickle_path + 'cliques_picles')
+
+def calcula_cliques(cache: fg.CacheMetricas = None) -> pd.DataFrame:
+    """Carrega os 3 arquivos principais e gera o relatório 2."""
+    relacoes_entre_cnpjs = cd.salvar_relacoes_vinculos(mg.vinculos)
+    informacoes_licitacoes = cd.salvar_informacoes_licitacoes()
+    cnpjs_por_licitacao = cd.salvar_cnpjs_por_licitacao()
+
+    d = monta_dados_licitacoes(informacoes_licitacoes, cnpjs_por_licitacao)
+
+    # Gera o grafo de cada licitação para cada combinação de vínculos e, em
+    # seguida, calcula as métricas desse grafo (incluindo as cliques) uma única vez.
+    # O pipeline.py reaproveita as métricas já calculadas para os outros relatórios.
+    arestas, tipos, d_licitacoes = mg.extrai_arestas(relacoes_entre_cnpjs, cnpjs_por_licitacao)
+    grafos = mg.gera_grafos_vinculos(arestas, tipos, d_licitacoes, mg.vinculos)
+    metricas = fg.calcula_metricas_vinculos(grafos, cache=cache)
+    return gera_relatorio(d, metricas)
+
+
+def main():
+    with ins.etapa('rel2') as contagens:
+        csv_path = '../data/output/csv/'
+        pickle_path = '../data/output/pickles/'
+        cache = fg.CacheMetricas()
+        cliques = calcula_cliques(cache)
+        cache.salva()
+        contagens.update(cache.estatisticas())
+
+        # Salva o resultado em arquivo .csv e em Pickle para processamento posterior.
+        cliques.to_csv(csv_path + 'relatorio_2')
+        cliques.to_pickle(pickle_path + 'cliques_picles')
+        contagens['linhas'] = len(cliques)
+    print(f"Cache das métricas: {cache.acertos} acertos, {cache.faltas} faltas ({cache.taxa_acertos():.1%}).")
 
 
 if __name__ == '__main__':
     main()
-
@@ -11,131 +11,141 @@
 # cnpj;qtdade_licitacoes_que_figurou_com_alguem_com_vinculo;
 # lista_licitacoes_onde_isso_ocorreu
 
+# Com mais de uma combinação de vínculos (coluna vinculo_em_uso), cada CNPJ
+# aparece uma vez por combinação.
+
 # OBS. Podemos avaliar a possibilidade de ver se as cliques que foram
 # identificadas no relatório 2 aparecem em outras linhas.
 # Isso seria muito interessante.
 
+# Isso é feito pelo índice de recorrência (arquivo recorrencia_cliques): para
+# cada clique distinta, as licitações em que ela aparece exatamente ou contida
+# em uma clique maior, da mesma combinação de vínculos:
+
+# vinculo_em_uso;cnpjs;tam_clique;qtd_licitacoes_exata;qtd_licitacoes;
+# lista_licitacoes
 
-from collections import defaultdict
+# Somente cliques que aparecem em pelo menos 2 licitações são listadas.
 
+
+import numpy as np
 import pandas as pd
 
 import carregamento_dados as cd
 import ferramentas_grafos as fg
+import instrumentacao as ins
+import rel2
+
+
+def tabela_longa(cliques: pd.DataFrame) -> pd.DataFrame:
+    """Uma linha por (clique, CNPJ) do relatório 2, com as colunas clique_id,
+    vinculo_em_uso, licitacao e cnpj.
+    """
+    longa = cliques[['vinculo_em_uso', 'id_licitacao', 'cnpjs']].rename(columns={'id_licitacao': 'licitacao'})
+    longa = longa.rename_axis('clique_id').reset_index().explode('cnpjs', ignore_index=True)
+    return longa.rename(columns={'cnpjs': 'cnpj'})
+
+
+def gera_relatorio(cliques: pd.DataFrame) -> pd.DataFrame:
+    """Gera o relatório 3 a partir do relatório 2 (uma linha por clique). Cada
+    CNPJ tem uma linha por combinação de vínculos em que aparece em cliques.
+    """
+    qtd = 'qtdade_licitacoes_que_figurou_com_alguem_com_vinculo'
+    lic = 'lista_licitacoes_onde_isso_ocorreu'
+    if cliques.empty:
+        return pd.DataFrame(columns=[qtd, lic, 'vinculo_em_uso']).rename_axis('cnpj')
+
+    # Os CNPJs ficam na ordem em que aparecem pela primeira vez nas cliques
+    # (o código de pd.factorize segue essa ordem).
+    longa = tabela_longa(cliques)
+    codigos, chaves = pd.factorize(pd.MultiIndex.from_arrays([longa['vinculo_em_uso'], longa['cnpj']]))
+    cnpjs_cliques = longa['licitacao'].groupby(codigos).agg([('qtd', 'size'), ('lic', ';'.join)])
+    return pd.DataFrame({
+        qtd: cnpjs_cliques['qtd'].to_numpy(),
+        lic: (cnpjs_cliques['lic'] + ';').to_numpy(),
+        'vinculo_em_uso': chaves.get_level_values(0)
+    }, index=pd.Index(chaves.get_level_values(1), name='cnpj'))
+
+
+def indice_recorrencia(cliques: pd.DataFrame, minimo: int = 2) -> pd.DataFrame:
+    """Índice de recorrência das cliques do relatório 2: para cada clique
+    distinta, as licitações em que ela aparece, exatamente ou contida em outra
+    clique da mesma combinação de vínculos. Somente cliques presentes em pelo
+    menos minimo licitações são retornadas.
+
+    As cliques iguais são agrupadas pelo hash da sua forma canônica (CNPJs
+    ordenados). Os superconjuntos de uma clique são a interseção das listas
+    ordenadas de cliques de cada um dos seus CNPJs, começando pela menor, sem
+    comparar todos os pares de cliques.
+    """
+    colunas = ['vinculo_em_uso', 'cnpjs', 'tam_clique', 'qtd_licitacoes_exata', 'qtd_licitacoes', 'lista_licitacoes']
+    if cliques.empty:
+        return pd.DataFrame(columns=colunas)
+
+    # ID de cada clique distinta (canônica) por combinação de vínculos.
+    canonicas = pd.Series([tuple(sorted(cnpjs)) for cnpjs in cliques['cnpjs']], index=cliques.index)
+    ids, unicas = pd.factorize(pd.MultiIndex.from_arrays([cliques['vinculo_em_uso'], canonicas]))
+    vinculos = unicas.get_level_values(0)
+    membros_unicas = unicas.get_level_values(1)
+
+    # Licitações em que cada clique distinta aparece exatamente.
+    ocorrencias = pd.DataFrame({'id': ids, 'licitacao': cliques['id_licitacao'].to_numpy()}).drop_duplicates()
+    licitacoes = cd.interna_chaves(ocorrencias['licitacao'])
+    offsets_ocorrencias, lic_ocorrencias = cd.monta_csr(
+        ocorrencias['id'].to_numpy(), cd.ids_internados(licitacoes, ocorrencias['licitacao']), len(unicas)
+    )
 
+    # Índice invertido (vínculo, CNPJ) -> cliques distintas, em ordem crescente.
+    tamanhos = np.fromiter((len(m) for m in membros_unicas), dtype=np.int64, count=len(unicas))
+    clique = np.repeat(np.arange(len(unicas)), tamanhos)
+    offsets_membros = np.concatenate([[0], np.cumsum(tamanhos)])
+    item, itens = pd.factorize(pd.MultiIndex.from_arrays([
+        np.repeat(np.asarray(vinculos, dtype=object), tamanhos),
+        np.concatenate([np.asarray(m, dtype=object) for m in membros_unicas])
+    ]))
+    offsets_postings, postings = cd.monta_csr(item, clique, len(itens))
+    tamanho_posting = np.diff(offsets_postings)
+
+    linhas = []
+    for i in range(len(unicas)):
+        exatas = lic_ocorrencias[offsets_ocorrencias[i]:offsets_ocorrencias[i + 1]]
+        itens_clique = item[offsets_membros[i]:offsets_membros[i + 1]]
+        itens_clique = itens_clique[np.argsort(tamanho_posting[itens_clique], kind='stable')]
+        superconjuntos = postings[offsets_postings[itens_clique[0]]:offsets_postings[itens_clique[0] + 1]]
+        for j in itens_clique[1:]:
+            if len(superconjuntos) == 1:
+                break
+            superconjuntos = np.intersect1d(superconjuntos, postings[offsets_postings[j]:offsets_postings[j + 1]],
+                                            assume_unique=True)
+        todas = np.unique(np.concatenate([
+            lic_ocorrencias[offsets_ocorrencias[s]:offsets_ocorrencias[s + 1]] for s in superconjuntos
+        ]))
+        if len(todas) >= minimo:
+            linhas.append((vinculos[i], ';'.join(membros_unicas[i]), int(tamanhos[i]), len(exatas), len(todas),
+                           ';'.join(licitacoes[todas])))
+
+    recorrencia = pd.DataFrame(linhas, columns=colunas)
+    return recorrencia.sort_values(['qtd_licitacoes', 'tam_clique', 'cnpjs'], ascending=[False, False, True],
+                                   kind='stable', ignore_index=True)
 
-def main():
-    # Carrega os 3 arquivos principais.
-    csv_path = '../data/output/csv/'
-    pickle_path = '../data/output/pickles/'
-    relacoes_entre_cnpjs = cd.salvar_relacoes_entre_cnpjs()
-    informacoes_licitacoes = cd.salvar_informacoes_licitacoes()
-    cnpjs_por_licitacao = cd.salvar_cnpjs_por_licitacao()
-
-    # Cria dicionários de relações entre CNPJs e de CNPJs por licitação.
-    d_relacoes = cd.cnpjs_relacionados_por_cnpj(relacoes_entre_cnpjs)
-    d_licitacoes = cd.cnpjs_por_licitacao(cnpjs_por_licitacao)
-
-    # Cria a lista de licitações que possui informações de CNPJs licitantes.
-    dados_licitacao = cnpjs_por_licitacao.values
-    licitacoes = [licitacao for licitacao, _ in dados_licitacao]
-
-    # Cria dicionário que armazena informações principais por licitação.
-    d = {
-        licitacao: {
-            'cnpjs': [],
-            'ano': None,
-            'municipio': None,
-            'modalidade': None,
-            'valor': None,
-            'grafo': None,
-            'cliques': None
-        } for licitacao in licitacoes
-    }
-
-    # Alimenta o dicionário com a lista de CNPJs licitantes por licitação.
-    for licitacao, cnpj in cnpjs_por_licitacao.values:
-        d[licitacao]['cnpjs'].append(cnpj)
-
-    # Alimenta o dicionário com dados de cada licitação (município, ano, ...)
-    # Utiliza a posição da coluna no arquivo original, deve ser checado se essa
-    # ordem for alterada.
-    for l in informacoes_licitacoes.values:
-        try:
-            d[l[0]]['municipio'] = l[1]
-            d[l[0]]['ano'] = l[5]
-            d[l[0]]['modalidade'] = l[3]
-            d[l[0]]['valor'] = l[7]
-        except:
-            # Exceção para licitações que não possuem informações de CNPJs licitantes,
-            # nada é feito.
-            pass
-
-    # Gera o grafo de cada licitação e, em seguida, lista as cliques desse grafo.
-    # Idealmente, poderia ser recuperado do arquivo gerado em gera_grafos_licitacoes.py
-    # Como a execução do script é relativamente rápida, optou-se por recalcular esses dados.
-    for licitacao in licitacoes:
-        grafo = fg.gera_grafo_licitacao(
-            licitacao, d_relacoes, d_licitacoes
-        )
-        cliques = fg.lista_cliques(grafo)
-
-        d[licitacao]['grafo'] = grafo
-        d[licitacao]['cliques'] = cliques
-
-    # Cria o dicionário para armazenar informações relativas às cliques encontradas.
-    c = defaultdict(dict)
-
-    clique_id = 0
-    for licitacao in pd.Series(licitacoes).unique():
-        for clique in d[licitacao]['cliques']:
-            tamanho_clique = len(clique)
-            if tamanho_clique >= 2:
-                printable_cnpjs = ''
-                for cnpj in clique:
-                    printable_cnpjs += (str(cnpj) + ';')
-                c[clique_id] = {
-                    'ano': d[licitacao]['ano'],
-                    'municipio': d[licitacao]['municipio'],
-                    'tipo_processo_licitatorio': d[licitacao]['modalidade'],
-                    'id_licitacao': licitacao,
-                    'valor': d[licitacao]['valor'],
-                    'vinculo_em_uso': '1',
-                    'quantidade_cnpjs': len(d[licitacao]['cnpjs']),
-                    'quantidade_vinculos': fg.calcula_quantidade_arestas(d[licitacao]['grafo']),
-                    'densidade_grafo': fg.calcula_densidade(d[licitacao]['grafo']),
-                    'tam_clique_encontrada': tamanho_clique,
-                    'lista_de_cnpjs_compondo_clique': printable_cnpjs,
-                    'cnpjs': clique
-                }
-                clique_id += 1
-
-    CNPJs_em_cliques = set()
-    for id in range(clique_id):
-        for cnpj in c[id]['cnpjs']:
-            CNPJs_em_cliques.add(cnpj)
-
-    cnpjs_cliques = {
-        cnpj: {
-            'qtdade_licitacoes_que_figurou_com_alguem_com_vinculo': 0,
-            'lista_licitacoes_onde_isso_ocorreu': ''
-        } for cnpj in CNPJs_em_cliques
-    }
-
-    for id in range(clique_id):
-        qtd = 'qtdade_licitacoes_que_figurou_com_alguem_com_vinculo'
-        lic = 'lista_licitacoes_onde_isso_ocorreu'
-        for cnpj in c[id]['cnpjs']:
-            cnpjs_cliques[cnpj][qtd] += 1
-            cnpjs_cliques[cnpj][lic] += c[id]['id_licitacao'] + ';'
-
-    cnpjs_cliques = pd.DataFrame.from_dict(
-        data=cnpjs_cliques,
-        orient='index'
-    )
-    cnpjs_cliques.index.name = 'cnpj'
 
-    cnpjs_cliques.to_csv(csv_path + 'relatorio_3')
+def main():
+    with ins.etapa('rel3') as contagens:
+        csv_path = '../data/output/csv/'
+
+        # As cliques são sempre recalculadas a partir dos arquivos de entrada, pois
+        # o cliques_picles salvo pode ser de entradas anteriores. O cache das
+        # métricas evita refazer os grafos que não mudaram.
+        cache = fg.CacheMetricas()
+        cliques = rel2.calcula_cliques(cache)
+        cache.salva()
+        contagens.update(cache.estatisticas())
+
+        cnpjs_cliques = gera_relatorio(cliques)
+        cnpjs_cliques.to_csv(csv_path + 'relatorio_3')
+        indice_recorrencia(cliques).to_csv(csv_path + 'recorrencia_cliques', index=False)
+        contagens['linhas'] = len(cnpjs_cliques)
+    print(f"Cache das métricas: {cache.acertos} acertos, {cache.faltas} faltas ({cache.taxa_acertos():.1%}).")
 
 
 if __name__ == '__main__':
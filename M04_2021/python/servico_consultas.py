@@ -0,0 +1,395 @@
+# ==============================================================================
+# SERVIÇO LOCAL DE CONSULTAS SOBRE AS SAÍDAS DO PIPELINE
+# ==============================================================================
+
+# Servidor HTTP (asyncio, somente biblioteca padrão) que carrega os relatórios
+# 1, 2 e 3 e os índices de pares (indice_pares.py) em índices em memória na
+# inicialização e responde em JSON:
+
+# GET /cnpj/<cnpj>                    licitações (relatório 3) e cliques do CNPJ
+# GET /licitacao/<id>                 métricas do grafo (relatório 1) e cliques da licitação
+# GET /alarmes?municipio=M&ano=A&k=K  padrões de alarme (cliques com os mesmos CNPJs) do
+#     [&vinculo=V]                    município e/ou ano, do maior ao menor nível de alarme
+# GET /par/<cnpj_1>/<cnpj_2>          licitações em que os dois CNPJs vinculados concorreram
+#     [?vinculo=V]                    juntos
+# GET /metricas                       tempos de resposta por rota e situação da carga
+# GET /saude                          situação do serviço
+
+# O nível de alarme de um padrão é o do rank.sh (ver ranking.ranking_padroes),
+# calculado com os valores das licitações de ranking.valores_path. Se esse
+# arquivo não existir, são usados os valores das licitações do relatório 2.
+
+# As saídas são verificadas a cada --intervalo segundos. Quando uma nova
+# execução do pipeline termina (os arquivos mudaram e ficaram estáveis entre
+# duas verificações), os índices são montados em segundo plano e substituídos
+# de uma só vez. Cada requisição usa uma única versão dos índices, e uma carga
+# com erro mantém a versão anterior.
+
+# Uso: python servico_consultas.py [--host HOST] [--porta N] [--intervalo S]
+
+import argparse
+import ast
+import asyncio
+import json
+import os
+import time
+from collections import defaultdict, deque
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+import pandas as pd
+
+# Pacotes implementados
+import indice_pares as ip
+import instrumentacao as ins
+import ranking as rk
+
+csv_path = '../data/output/csv/'
+pickle_path = '../data/output/pickles/'
+
+# Padrões de alarme mantidos por escopo (município, ano...) e combinação de vínculos.
+maximo_alarmes = 100
+
+# Tempos de resposta guardados por rota para o cálculo dos percentis.
+janela_latencias = 10000
+
+ESCOPOS = [(), ('municipio',), ('ano',), ('municipio', 'ano')]
+
+
+def arquivos_monitorados() -> list:
+    """Arquivos das saídas do pipeline lidos pelo serviço."""
+    arquivos = [csv_path + 'relatorio_1', csv_path + 'relatorio_3', pickle_path + 'cliques_picles',
+                rk.valores_path]
+    if os.path.isdir(ip.indice_pares_path):
+        for vinculo in sorted(os.listdir(ip.indice_pares_path)):
+            diretorio = os.path.join(ip.indice_pares_path, vinculo)
+            if os.path.isdir(diretorio) and not vinculo.endswith('.tmp'):
+                arquivos += [os.path.join(diretorio, nome) for nome in sorted(os.listdir(diretorio))]
+    return arquivos
+
+
+def assinatura() -> tuple:
+    """Identifica a versão das saídas pelo tamanho e data de modificação dos arquivos."""
+    estado = []
+    for arquivo in arquivos_monitorados():
+        try:
+            info = os.stat(arquivo)
+        except FileNotFoundError:
+            continue
+        estado.append((arquivo, info.st_size, info.st_mtime_ns))
+    return tuple(estado)
+
+
+def registros(df: pd.DataFrame) -> list:
+    """Linhas da tabela como dicionários de objetos Python, com None no lugar de NaN."""
+    df = df.astype(object)
+    return df.where(df.notna(), None).to_dict('records')
+
+
+def para_json(valor):
+    if isinstance(valor, np.generic):
+        return valor.item()
+    if isinstance(valor, np.ndarray):
+        return valor.tolist()
+    raise TypeError(f"tipo não serializável: {type(valor).__name__}")
+
+
+def padroes_alarme(cliques: pd.DataFrame, escopo: tuple, valores_licitacoes: pd.Series,
+                   maximo: int = maximo_alarmes) -> dict:
+    """Padrões de alarme (cliques com os mesmos CNPJs) por valor do escopo, do
+    maior ao menor nível de alarme de ranking.ranking_padroes. As cliques não
+    têm ruído. Retorna d[valores do escopo] = [padrão, ...].
+    """
+    chaves = list(escopo) + ['vinculo_em_uso', 'padrao']
+    agrupado = cliques.groupby(chaves, sort=False).agg(
+        tam_clique=('tam_clique_encontrada', 'first'),
+        licitacoes=('id_licitacao', 'unique')
+    ).reset_index()
+    agrupado['cnpjs'] = agrupado['padrao'].str.split(';')
+    agrupado['licitacoes'] = [sorted(map(str, licitacoes)) for licitacoes in agrupado['licitacoes']]
+
+    # Padrões no formato do quasi_cliques.py: CNPJs e licitações separados por ','.
+    ranking = rk.ranking_padroes(pd.DataFrame({
+        'cnpjs': agrupado['padrao'].str.replace(';', ',', regex=False),
+        'licitacoes': [','.join(licitacoes) for licitacoes in agrupado['licitacoes']]
+    }), valores_licitacoes)
+    agrupado = agrupado.loc[ranking.index]
+    agrupado['alarme'] = ranking['alarme']
+    agrupado['qtd_licitacoes'] = ranking['qtd_licitacoes']
+    agrupado['soma_valores'] = ranking['soma_valores']
+    agrupado = agrupado.groupby(list(escopo) + ['vinculo_em_uso'], sort=False).head(maximo)
+    colunas = ['vinculo_em_uso', 'cnpjs', 'tam_clique', 'alarme', 'qtd_licitacoes', 'soma_valores', 'licitacoes']
+
+    if not escopo:
+        return {(): registros(agrupado[colunas])}
+    return {
+        valores if isinstance(valores, tuple) else (valores,): registros(grupo[colunas])
+        for valores, grupo in agrupado.groupby(list(escopo), sort=False)
+    }
+
+
+def carrega_valores(cliques: pd.DataFrame) -> pd.Series:
+    """Valores das licitações usados no nível de alarme: os do arquivo de
+    valores do rank.sh ou, sem ele, os das licitações do relatório 2.
+    """
+    if os.path.exists(rk.valores_path):
+        return rk.carrega_valores(rk.valores_path)
+    valores = cliques.drop_duplicates('id_licitacao').set_index('id_licitacao')['valor']
+    valores.index = valores.index.astype(str)
+    return pd.to_numeric(valores, errors='coerce').fillna(0.0)
+
+
+class Indices:
+    """Índices em memória de uma versão das saídas do pipeline. As linhas dos
+    relatórios ficam prontas como dicionários, e cada índice guarda as
+    posições das linhas de cada licitação ou CNPJ.
+    """
+
+    def __init__(self):
+        with ins.etapa('servico.carga') as contagens:
+            self.assinatura = assinatura()
+            self.carregado_em = time.time()
+
+            # Relatório 1: métricas dos grafos, uma linha por licitação e vínculo.
+            relatorio_1 = pd.read_csv(csv_path + 'relatorio_1', index_col=0,
+                                      dtype={'licitacao': str, 'ano': str, 'vinculo_em_uso': str})
+            self.relatorio_1 = registros(relatorio_1)
+            self.linhas_licitacao = relatorio_1.groupby('licitacao', sort=False).indices
+
+            # Relatório 2: cliques, indexadas por licitação e por CNPJ.
+            cliques = pd.read_pickle(pickle_path + 'cliques_picles').reset_index(drop=True)
+            cliques['padrao'] = [';'.join(sorted(map(str, cnpjs))) for cnpjs in cliques['cnpjs']]
+            self.cliques = registros(cliques.drop(['lista_de_cnpjs_compondo_clique', 'padrao'], axis=1))
+            self.cliques_licitacao = cliques.groupby('id_licitacao', sort=False).indices
+            membros = cliques['cnpjs'].explode()
+            linhas = membros.index.to_numpy()
+            self.cliques_cnpj = {
+                cnpj: linhas[posicoes]
+                for cnpj, posicoes in pd.Series(linhas).groupby(membros.astype(str).to_numpy()).indices.items()
+            }
+
+            # Relatório 3: licitações de cada CNPJ com alguém com vínculo.
+            relatorio_3 = pd.read_csv(csv_path + 'relatorio_3', dtype={'cnpj': str, 'vinculo_em_uso': str})
+            self.relatorio_3 = registros(relatorio_3)
+            self.linhas_cnpj = relatorio_3.groupby('cnpj', sort=False).indices
+
+            valores = carrega_valores(cliques)
+            self.alarmes = {escopo: padroes_alarme(cliques, escopo, valores) for escopo in ESCOPOS}
+
+            # Índices de pares de cada combinação de vínculos, lidos para a memória.
+            self.pares = {}
+            if os.path.isdir(ip.indice_pares_path):
+                for vinculo in os.listdir(ip.indice_pares_path):
+                    caminho = os.path.join(ip.indice_pares_path, vinculo)
+                    if not vinculo.endswith('.tmp') and os.path.isdir(caminho):
+                        self.pares[vinculo] = ip.IndicePares(caminho, mmap=False)
+
+            contagens['licitacoes'] = len(self.linhas_licitacao)
+            contagens['cliques'] = len(cliques)
+            contagens['cnpjs'] = len(self.linhas_cnpj)
+
+    def cnpj(self, cnpj: str) -> dict:
+        relatorio_3 = []
+        for i in self.linhas_cnpj.get(cnpj, []):
+            lista = self.relatorio_3[i]['lista_licitacoes_onde_isso_ocorreu'] or ''
+            relatorio_3.append(dict(self.relatorio_3[i], lista_licitacoes_onde_isso_ocorreu=lista.strip(';').split(';')))
+        return {
+            'cnpj': cnpj,
+            'relatorio_3': relatorio_3,
+            'cliques': [self.cliques[i] for i in self.cliques_cnpj.get(cnpj, [])]
+        }
+
+    def licitacao(self, licitacao: str) -> dict:
+        metricas = []
+        for i in self.linhas_licitacao.get(licitacao, []):
+            cnpjs = self.relatorio_1[i]['cnpjs']
+            metricas.append(dict(self.relatorio_1[i], cnpjs=ast.literal_eval(cnpjs) if cnpjs else []))
+        return {
+            'licitacao': licitacao,
+            'metricas': metricas,
+            'cliques': [self.cliques[i] for i in self.cliques_licitacao.get(licitacao, [])]
+        }
+
+    def alarmes_escopo(self, municipio: str = None, ano: str = None, k: int = 10, vinculo: str = None) -> list:
+        escopo = tuple(nome for nome, valor in [('municipio', municipio), ('ano', ano)] if valor is not None)
+        valores = tuple(valor for valor in (municipio, ano) if valor is not None)
+        padroes = self.alarmes[escopo].get(valores, [])
+        if vinculo is not None:
+            padroes = [padrao for padrao in padroes if padrao['vinculo_em_uso'] == vinculo]
+        return padroes[:k]
+
+    def par(self, cnpj_1: str, cnpj_2: str, vinculo: str = '1') -> dict:
+        indice = self.pares.get(vinculo)
+        if indice is None:
+            raise KeyError(f"índice de pares do vínculo {vinculo} não encontrado")
+        return {
+            'cnpj_1': cnpj_1,
+            'cnpj_2': cnpj_2,
+            'vinculo_em_uso': vinculo,
+            'licitacoes': indice.licitacoes_em_comum(cnpj_1, cnpj_2)
+        }
+
+
+class Latencias:
+    """Tempos de resposta de cada rota (milissegundos), nas últimas
+    janela_latencias requisições, e contagens totais.
+    """
+
+    def __init__(self, janela: int = janela_latencias):
+        self.tempos = defaultdict(lambda: deque(maxlen=janela))
+        self.requisicoes = defaultdict(int)
+        self.erros = defaultdict(int)
+
+    def registra(self, rota: str, milissegundos: float, erro: bool):
+        self.tempos[rota].append(milissegundos)
+        self.requisicoes[rota] += 1
+        self.erros[rota] += erro
+
+    def resumo(self) -> dict:
+        resumo = {}
+        for rota, tempos in self.tempos.items():
+            tempos = np.fromiter(tempos, dtype=float)
+            p50, p95, p99 = np.percentile(tempos, [50, 95, 99])
+            resumo[rota] = {
+                'requisicoes': self.requisicoes[rota],
+                'erros': self.erros[rota],
+                'media_ms': tempos.mean(),
+                'p50_ms': p50,
+                'p95_ms': p95,
+                'p99_ms': p99,
+                'max_ms': tempos.max()
+            }
+        return resumo
+
+
+class Servico:
+    """Servidor HTTP das consultas, com recarga dos índices em segundo plano."""
+
+    def __init__(self, intervalo: float = 5.0):
+        self.intervalo = intervalo
+        self.indices = None
+        self.latencias = Latencias()
+        self.recargas = 0
+        self.erro_recarga = None
+
+    async def carrega(self):
+        """Monta os índices em uma thread e os substitui de uma só vez."""
+        loop = asyncio.get_running_loop()
+        self.indices = await loop.run_in_executor(None, Indices)
+        self.recargas += 1
+
+    async def monitora(self):
+        """Recarrega os índices quando as saídas mudam e ficam estáveis."""
+        anterior = assinatura()
+        while True:
+            await asyncio.sleep(self.intervalo)
+            atual = assinatura()
+            if atual == self.indices.assinatura or atual != anterior:
+                anterior = atual
+                continue
+            try:
+                await self.carrega()
+                self.erro_recarga = None
+                print(f"Índices recarregados ({self.recargas}).")
+            except Exception as erro:
+                # A versão anterior continua em uso até a próxima mudança.
+                self.erro_recarga = repr(erro)
+                print(f"Erro ao recarregar os índices: {erro!r}")
+            anterior = assinatura()
+
+    def responde(self, caminho: str, consulta: dict) -> tuple:
+        """Retorna (rota, status, corpo) da requisição."""
+        partes = [unquote(parte) for parte in caminho.strip('/').split('/') if parte]
+        parametros = {nome: valores[-1] for nome, valores in consulta.items()}
+        indices = self.indices
+        rota = '/' + partes[0] if partes else '/'
+
+        if partes == ['saude']:
+            return rota, 200, {'situacao': 'ok', 'recargas': self.recargas}
+        if partes == ['metricas']:
+            return rota, 200, {
+                'carregado_em': indices.carregado_em,
+                'recargas': self.recargas,
+                'erro_recarga': self.erro_recarga,
+                'rotas': self.latencias.resumo()
+            }
+        if len(partes) == 2 and partes[0] == 'cnpj':
+            return rota, 200, indices.cnpj(partes[1])
+        if len(partes) == 2 and partes[0] == 'licitacao':
+            return rota, 200, indices.licitacao(partes[1])
+        if partes == ['alarmes']:
+            k = int(parametros.get('k', 10))
+            return rota, 200, indices.alarmes_escopo(parametros.get('municipio'), parametros.get('ano'),
+                                                     min(k, maximo_alarmes), parametros.get('vinculo'))
+        if len(partes) == 3 and partes[0] == 'par':
+            try:
+                return rota, 200, indices.par(partes[1], partes[2], parametros.get('vinculo', '1'))
+            except KeyError as erro:
+                return rota, 404, {'erro': erro.args[0]}
+        return rota, 404, {'erro': 'rota não encontrada'}
+
+    async def atende(self, leitor: asyncio.StreamReader, escritor: asyncio.StreamWriter):
+        """Atende as requisições de uma conexão (HTTP/1.1 com keep-alive)."""
+        try:
+            while True:
+                linha = await leitor.readline()
+                if not linha:
+                    break
+                cabecalhos = {}
+                while True:
+                    cabecalho = await leitor.readline()
+                    if cabecalho in (b'\r\n', b'\n', b''):
+                        break
+                    nome, _, valor = cabecalho.decode('latin-1').partition(':')
+                    cabecalhos[nome.strip().lower()] = valor.strip().lower()
+
+                inicio = time.perf_counter()
+                try:
+                    metodo, alvo, versao = linha.decode('latin-1').split()
+                    url = urlsplit(alvo)
+                    if metodo != 'GET':
+                        rota, status, corpo = url.path, 405, {'erro': 'somente GET'}
+                    else:
+                        rota, status, corpo = self.responde(url.path, parse_qs(url.query))
+                except ValueError as erro:
+                    rota, status, corpo = 'invalida', 400, {'erro': str(erro)}
+                except Exception as erro:
+                    rota, status, corpo = 'erro', 500, {'erro': repr(erro)}
+                dados = json.dumps(corpo, ensure_ascii=False, default=para_json).encode()
+
+                manter = cabecalhos.get('connection') != 'close' and linha.rstrip().endswith(b'1.1')
+                escritor.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'ERRO'}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(dados)}\r\n"
+                    f"Connection: {'keep-alive' if manter else 'close'}\r\n\r\n".encode() + dados
+                )
+                await escritor.drain()
+                self.latencias.registra(rota, (time.perf_counter() - inicio) * 1000, status >= 500)
+                if not manter:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            escritor.close()
+
+    async def executa(self, host: str, porta: int):
+        await self.carrega()
+        servidor = await asyncio.start_server(self.atende, host, porta)
+        print(f"Serviço de consultas em http://{host}:{porta}")
+        async with servidor:
+            await asyncio.gather(servidor.serve_forever(), self.monitora())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serviço HTTP local de consultas sobre as saídas do pipeline.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8050)
+    parser.add_argument('--intervalo', type=float, default=5.0,
+                        help='segundos entre as verificações de novas saídas do pipeline')
+    args = parser.parse_args()
+    asyncio.run(Servico(args.intervalo).executa(args.host, args.porta))
+
+
+if __name__ == '__main__':
+    main()
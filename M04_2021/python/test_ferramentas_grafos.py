@@ -0,0 +1,51 @@
+# ==============================================================================
+# TESTES DO MODO LIMITADO DAS CLIQUES (ferramentas_grafos.py)
+# ==============================================================================
+
+# Os grafos são gerados em memória; nenhum arquivo de ../data é lido.
+
+# Uso: python -m unittest test_ferramentas_grafos
+
+import time
+import unittest
+
+import networkx as nx
+
+# Pacotes implementados
+import ferramentas_grafos as fg
+
+
+class ModoLimitadoTest(unittest.TestCase):
+
+    def test_limite_cliques_sem_tempo_limite_termina(self):
+        # Grafo denso, com muitas cliques maximais e max clique cara de provar.
+        grafo = nx.gnp_random_graph(250, 0.9, seed=1)
+        inicio = time.perf_counter()
+        metricas = fg.calcula_metricas(grafo, limite_cliques=10)
+        self.assertLess(time.perf_counter() - inicio, 30)
+        self.assertTrue(metricas.truncado)
+        self.assertFalse(metricas.max_clique_exata)
+        self.assertEqual(len(metricas.cliques), 10)
+        self.assertGreaterEqual(metricas.tamanho_max_clique, max(len(clique) for clique in metricas.cliques))
+
+    def test_limite_cliques_nao_atingido_e_exato(self):
+        grafo = nx.gnp_random_graph(40, 0.3, seed=1)
+        completo = fg.calcula_metricas(grafo)
+        limitado = fg.calcula_metricas(grafo, limite_cliques=100000)
+        self.assertFalse(limitado.truncado)
+        self.assertTrue(limitado.max_clique_exata)
+        self.assertEqual(limitado.tamanho_max_clique, completo.tamanho_max_clique)
+        self.assertEqual(sorted(map(sorted, limitado.cliques)), sorted(map(sorted, completo.cliques)))
+
+    def test_max_clique_limite_nos(self):
+        grafo = nx.gnp_random_graph(60, 0.5, seed=1)
+        exata, prova = fg.max_clique(grafo)
+        self.assertTrue(prova)
+        clique, prova = fg.max_clique(grafo, limite_nos=1)
+        self.assertFalse(prova)
+        self.assertLessEqual(len(clique), len(exata))
+        self.assertTrue(all(grafo.has_edge(u, v) for i, u in enumerate(clique) for v in clique[i + 1:]))
+
+
+if __name__ == '__main__':
+    unittest.main()
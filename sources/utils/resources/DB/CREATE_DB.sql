@@ -16,6 +16,8 @@ CREATE TABLE auditors (
                           name TEXT NOT NULL
 );
 
+CREATE UNIQUE INDEX idx_auditors_name ON auditors(name);
+
 CREATE TABLE findings (
                           id INTEGER PRIMARY KEY AUTOINCREMENT,
                           title TEXT,
@@ -23,15 +25,24 @@ CREATE TABLE findings (
                           auditor_id INTEGER NOT NULL,
                           issue_id INTEGER NOT NULL,
 
-                          FOREIGN KEY (auditor_id) REFERENCES id,
-                          FOREIGN KEY (issue_id) REFERENCES id
+                          FOREIGN KEY (auditor_id) REFERENCES auditors(id),
+                          FOREIGN KEY (issue_id) REFERENCES issues(id)
 );
 
+CREATE INDEX idx_findings_severity_auditor ON findings(severity, auditor_id);
+CREATE INDEX idx_findings_auditor_severity ON findings(auditor_id, severity);
+CREATE INDEX idx_findings_issue ON findings(issue_id);
+
 CREATE TABLE auditors_issues (
                                    id INTEGER PRIMARY KEY AUTOINCREMENT,
                                    auditor_id INTEGER NOT NULL,
                                    issue_id INTEGER NOT NULL,
 
-                                   FOREIGN KEY (auditor_id) REFERENCES id,
-                                   FOREIGN KEY (issue_id) REFERENCES id
-);
\ No newline at end of file
+                                   FOREIGN KEY (auditor_id) REFERENCES auditors(id),
+                                   FOREIGN KEY (issue_id) REFERENCES issues(id)
+);
+
+CREATE INDEX idx_auditors_issues_auditor ON auditors_issues(auditor_id, issue_id);
+CREATE INDEX idx_auditors_issues_issue ON auditors_issues(issue_id, auditor_id);
+
+PRAGMA user_version = 2;
\ No newline at end of file
@@ -1,17 +1,108 @@
 """
 API para RDU do banco de dados.
 O caminho do banco de dados é dado por DB_PATH e pode ser alterado pelo método db_path.
+
+Cada thread mantém uma única conexão somente leitura com o banco, reaberta
+automaticamente quando DB_PATH muda ou quando o arquivo do banco é substituído.
+Para várias consultas seguidas, use o contexto connection():
+
+    with API.connection():
+        for auditor in API.get_auditors():
+            API.execute(script, [auditor['id']])
 """
 
 from __future__ import annotations
 
-import pandas as pd
+import os
 import sqlite3
+import threading
+from contextlib import contextmanager
+from urllib.request import pathname2url
+
+import pandas as pd
 
 
 DB_PATH = './sources/data/resources/DB/output.db'
 SEVERITIES = ['Low', 'Medium', 'High', 'Informational', 'Undetermined']
 
+# Cache de páginas (KiB) e tamanho máximo do mapeamento em memória (bytes) de cada conexão.
+CACHE_SIZE_KIB = 64 * 1024
+MMAP_SIZE = 256 * 1024 * 1024
+
+_local = threading.local()
+
+
+def _open(path: str) -> sqlite3.Connection:
+    """
+    Abre uma conexão somente leitura com o banco de dados.
+    O journal_mode WAL é definido por quem escreve o banco (data_manager.py).
+
+    :param path: Caminho do banco de dados.
+    :return: Conexão com o banco.
+    """
+    uri = f"file:{pathname2url(os.path.abspath(path))}?mode=ro"
+    db = sqlite3.connect(uri, uri=True, isolation_level=None)
+    db.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KIB}")
+    db.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    db.execute("PRAGMA temp_store = MEMORY")
+    return db
+
+
+def get_connection() -> sqlite3.Connection:
+    """
+    Método para obter a conexão da thread atual com o banco de DB_PATH.
+    A conexão é aberta na primeira chamada e reaberta se DB_PATH mudar ou se o
+    arquivo do banco for substituído.
+
+    :return: Conexão somente leitura com o banco.
+    """
+    session = getattr(_local, 'session', None)
+    if session is not None:
+        # Dentro de connection() a mesma conexão é usada sem verificações.
+        return session
+
+    stat = os.stat(DB_PATH)
+    key = (DB_PATH, stat.st_dev, stat.st_ino)
+    db = getattr(_local, 'db', None)
+    if db is None or _local.key != key:
+        close_connection()
+        _local.db, _local.key = _open(DB_PATH), key
+    return _local.db
+
+
+def close_connection():
+    """
+    Método para fechar a conexão da thread atual, se houver.
+    """
+    db = getattr(_local, 'db', None)
+    if db is not None:
+        db.close()
+    _local.db, _local.key = None, None
+
+
+@contextmanager
+def connection():
+    """
+    Contexto para várias consultas seguidas. Todas as consultas feitas dentro
+    dele (inclusive pelos métodos desta API) usam a mesma conexão e a mesma
+    transação de leitura, vendo uma única versão do banco.
+
+    :return: Conexão com o banco.
+    """
+    if getattr(_local, 'session', None) is not None:
+        # Contextos aninhados reaproveitam a transação já aberta.
+        yield _local.session
+        return
+
+    db = get_connection()
+    db.execute("BEGIN")
+    _local.session = db
+    try:
+        yield db
+    finally:
+        _local.session = None
+        db.execute("COMMIT")
+
 
 def get_auditors(*auditors: int | str) -> dict | list[dict]:
     """
@@ -20,7 +111,7 @@ def get_auditors(*auditors: int | str) -> dict | list[dict]:
     :param auditors: ID ou Nome do auditor.
     :return: Dicionário representando o auditor.
     """
-    with sqlite3.connect(DB_PATH) as db:
+    with connection() as db:
 
         if len(auditors) > 0:
             auditor_list = []
@@ -54,7 +145,7 @@ def get_findings_by_auditors(*auditors: str | int) -> pd.DataFrame:
 
     # Pega a lista com nome e id dos auditores
     auditor_list = get_auditors(*auditors)
-    with sqlite3.connect(DB_PATH) as db:
+    with connection() as db:
 
         if len(auditor_list) > 0:
             ids = [auditor['id'] for auditor in auditor_list]
@@ -80,7 +171,7 @@ def get_findings_by_severities(*severities: str) -> pd.DataFrame:
     :return: Pandas DataFrame.
     """
 
-    with sqlite3.connect(DB_PATH) as db:
+    with connection() as db:
         if len(severities) == 0:
             # Retorna DataFrame da tabela findings
             script = "SELECT * FROM findings"
@@ -104,7 +195,7 @@ def get_row_count(table: str) -> int:
         print("Campo table só pode ser str!")
         return 0  # Retorna 0 se o tipo não for válido.
 
-    with sqlite3.connect(DB_PATH) as db:
+    with connection() as db:
         cursor = db.cursor()
 
         script = f"SELECT COUNT(*) as total FROM {table}"
@@ -118,14 +209,14 @@ def get_row_count(table: str) -> int:
 
 def execute(script: str, values: list) -> list:
     """
-    Método para executar um comando SQL genérico.
+    Método para executar um comando SQL genérico de leitura (a conexão é somente leitura).
 
     :param script: Script SQL para execução.
     :param values: Lista com os valores a do script SQL.
     :return: Lista com os resultados encontrados.
     """
 
-    with sqlite3.connect(DB_PATH) as db:
+    with connection() as db:
         cursor = db.cursor()
         cursor.execute(script, values)
         return cursor.fetchall()
@@ -140,7 +231,7 @@ def get_dataframe(script: str, *values) -> pd.DataFrame:
     :return: Dataframe com o resultado da busca no DB
     """
 
-    with sqlite3.connect(DB_PATH) as db:
+    with connection() as db:
         dataframe = pd.read_sql_query(script, db, params=values)
         return dataframe
 
@@ -173,7 +264,7 @@ def get_issues(**kwargs) -> pd.DataFrame:
     """
 
     if not kwargs:
-        with sqlite3.connect(DB_PATH) as db:
+        with connection() as db:
             script = """
                             SELECT * FROM (SELECT issue.* FROM issues issue
                                     INNER JOIN auditors_issues ai on issue.id = ai.issue_id) LEFT JOIN
@@ -191,7 +282,7 @@ def get_issues(**kwargs) -> pd.DataFrame:
         except KeyError:
             pass
 
-        with sqlite3.connect(DB_PATH) as db:
+        with connection() as db:
             script = f"""
                             SELECT * FROM (SELECT * FROM (SELECT * FROM auditors WHERE id = {auditor_id}) as auditor
                                  INNER JOIN auditors_issues ai on auditor.id = ai.auditor_id) as si
@@ -201,7 +292,7 @@ def get_issues(**kwargs) -> pd.DataFrame:
             return df
 
     elif "auditor_ids" in kwargs:
-        with sqlite3.connect(DB_PATH) as db:
+        with connection() as db:
             auditor_ids = tuple(kwargs['auditor_ids'])
             script = f"""
                             SELECT * FROM (SELECT * FROM (SELECT * FROM auditors WHERE id IN {auditor_ids}) as auditor
@@ -218,7 +309,7 @@ def get_issues(**kwargs) -> pd.DataFrame:
         except KeyError:
             pass
 
-        with sqlite3.connect(DB_PATH) as db:
+        with connection() as db:
             script = f"""
                             SELECT * FROM (SELECT * FROM (SELECT * FROM auditors WHERE name = '{auditor_name}') as 
                                 auditor INNER JOIN auditors_issues ai on auditor.id = ai.auditor_id) as si
@@ -228,7 +319,7 @@ def get_issues(**kwargs) -> pd.DataFrame:
             return df
 
     elif "auditor_names" in kwargs:
-        with sqlite3.connect(DB_PATH) as db:
+        with connection() as db:
             auditor_names = tuple(kwargs['auditor_names'])
             script = f"""
                             SELECT * FROM (SELECT * FROM (SELECT * FROM auditors WHERE name IN {auditor_names}) as 
@@ -245,7 +336,7 @@ def get_issues(**kwargs) -> pd.DataFrame:
         except KeyError:
             pass
 
-        with sqlite3.connect(DB_PATH) as db:
+        with connection() as db:
             script = f"""
                             SELECT * FROM (SELECT * FROM (SELECT * FROM issues WHERE id = {issue_id}) as issue
                                  INNER JOIN auditors_issues ai on issue.id = ai.issue_id) as si
@@ -255,7 +346,7 @@ def get_issues(**kwargs) -> pd.DataFrame:
             return df
 
     elif "issue_ids" in kwargs:
-        with sqlite3.connect(DB_PATH) as db:
+        with connection() as db:
             issue_ids = tuple(kwargs['issue_ids'])
             script = f"""
                             SELECT * FROM (SELECT * FROM (SELECT * FROM issues WHERE id IN {issue_ids}) as issue
@@ -272,7 +363,7 @@ def get_issues(**kwargs) -> pd.DataFrame:
         except KeyError:
             pass
 
-        with sqlite3.connect(DB_PATH) as db:
+        with connection() as db:
             script = f"""
                             SELECT * FROM (SELECT * FROM (SELECT * FROM issues WHERE title = '{issue_title}') as issue
                                  INNER JOIN auditors_issues ai on issue.id = ai.issue_id) as si
@@ -282,7 +373,7 @@ def get_issues(**kwargs) -> pd.DataFrame:
             return df
 
     elif "issue_titles" in kwargs:
-        with sqlite3.connect(DB_PATH) as db:
+        with connection() as db:
             issue_titles = tuple(kwargs['issue_titles'])
             script = f"""
                             SELECT * FROM (SELECT * FROM (SELECT * FROM issues WHERE title IN {issue_titles}) as issue
@@ -291,3 +382,92 @@ def get_issues(**kwargs) -> pd.DataFrame:
                             """
             df = pd.read_sql_query(script, db)
             return df
+
+
+def _issue_filters(issue_types: str | list[str] | None, start_date: str | None, end_date: str | None) -> tuple:
+    """
+    Monta o JOIN com issues e as condições dos filtros de tipo e de período.
+
+    :param issue_types: Tipo ou lista de tipos de issue.
+    :param start_date: Data mínima de início da issue (AAAA-MM-DD).
+    :param end_date: Data máxima de fim da issue (AAAA-MM-DD).
+    :return: Tupla (SQL do JOIN e do WHERE, lista de valores).
+    """
+    conditions, values = [], []
+    if issue_types is not None:
+        issue_types = [issue_types] if type(issue_types) == str else list(issue_types)
+        conditions.append(f"iss.type IN ({', '.join('?' * len(issue_types))})")
+        values += issue_types
+    if start_date is not None:
+        conditions.append("iss.start_date >= ?")
+        values.append(start_date)
+    if end_date is not None:
+        conditions.append("iss.end_date <= ?")
+        values.append(end_date)
+    if not conditions:
+        return "", values
+    return f"INNER JOIN issues iss ON f.issue_id = iss.id WHERE {' AND '.join(conditions)}", values
+
+
+def _severity_columns(found) -> list:
+    """
+    Severidades na ordem de SEVERITIES, seguidas das severidades desconhecidas encontradas.
+    """
+    return SEVERITIES + sorted(set(found) - set(SEVERITIES))
+
+
+def get_severity_distribution(issue_types: str | list[str] = None, start_date: str = None,
+                              end_date: str = None) -> pd.DataFrame:
+    """
+    Método para contar os findings de cada severidade com uma única consulta.
+
+    :param issue_types: Tipo ou lista de tipos de issue (todos se None).
+    :param start_date: Somente issues iniciadas a partir desta data (AAAA-MM-DD).
+    :param end_date: Somente issues terminadas até esta data (AAAA-MM-DD).
+    :return: DataFrame indexado pela severidade, com as colunas quantity e percentage.
+    """
+    filters, values = _issue_filters(issue_types, start_date, end_date)
+    script = f"SELECT f.severity, COUNT(*) AS quantity FROM findings f {filters} GROUP BY f.severity"
+    with connection() as db:
+        counts = pd.read_sql_query(script, db, params=values).set_index('severity')['quantity']
+
+    distribution = counts.reindex(_severity_columns(counts.index), fill_value=0).to_frame('quantity')
+    distribution.index.name = 'severity'
+    total = distribution['quantity'].sum()
+    distribution['percentage'] = distribution['quantity'] / total * 100 if total else 0.0
+    return distribution
+
+
+def get_auditor_severity_matrix(issue_types: str | list[str] = None, start_date: str = None,
+                                end_date: str = None, percentage: bool = False) -> pd.DataFrame:
+    """
+    Método para contar os findings de cada auditor por severidade com uma única consulta.
+    Auditores sem findings (depois dos filtros) não aparecem.
+
+    :param issue_types: Tipo ou lista de tipos de issue (todos se None).
+    :param start_date: Somente issues iniciadas a partir desta data (AAAA-MM-DD).
+    :param end_date: Somente issues terminadas até esta data (AAAA-MM-DD).
+    :param percentage: Se True, as severidades são dadas em porcentagem dos findings do auditor.
+    :return: DataFrame indexado pelo nome do auditor (uma linha por ID, na ordem dos IDs), com
+             uma coluna por severidade e a coluna calls com o total de findings do auditor.
+    """
+    filters, values = _issue_filters(issue_types, start_date, end_date)
+    script = f"""
+                    SELECT f.auditor_id, ad.name AS auditor, f.severity, COUNT(*) AS quantity
+                        FROM findings f INNER JOIN auditors ad ON f.auditor_id = ad.id {filters}
+                            GROUP BY f.auditor_id, f.severity ORDER BY f.auditor_id;
+                    """
+    with connection() as db:
+        counts = pd.read_sql_query(script, db, params=values)
+
+    # O pivot é feito pelo ID, pois bancos na versão 1 do schema podem ter nomes repetidos.
+    matrix = counts.pivot(index='auditor_id', columns='severity', values='quantity')
+    matrix = matrix.reindex(columns=_severity_columns(matrix.columns)).fillna(0).astype(int)
+    names = counts.drop_duplicates('auditor_id').set_index('auditor_id')['auditor']
+    matrix.index = pd.Index(names.reindex(matrix.index), name='auditor')
+    matrix.columns.name = None
+    calls = matrix.sum(axis=1)
+    if percentage:
+        matrix = matrix.div(calls, axis=0) * 100
+    matrix['calls'] = calls
+    return matrix
@@ -0,0 +1,129 @@
+"""
+Benchmark da carga do JSON para o SQLite (data_manager.json_to_sql).
+
+Gera um dump sintético replicando as issues de prod_parsed.json e compara a carga
+linha a linha (um execute e um commit por linha, com o ID do auditor buscado no
+DB a cada linha) com a carga em lotes do data_manager. Ao final, verifica que os
+dois bancos têm o mesmo conteúdo.
+
+Uso: python benchmark_ingest.py [--issues N] [--auditors N] [--findings N] [--skip-legacy]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from json_converter import convert
+import API
+import data_manager
+
+JSON_PATH = '../../data/resources/JSON/prod_parsed.json'
+TABLES = ['issues', 'auditors', 'auditors_issues', 'findings']
+
+
+def synthetic_dump(issues: int, auditors: int, findings: int, seed: int = 0) -> list:
+    """
+    Replica as issues de prod_parsed.json com auditores e findings sorteados.
+
+    :param issues: Quantidade de issues.
+    :param auditors: Quantidade de auditores distintos.
+    :param findings: Quantidade média de findings por issue.
+    :param seed: Semente do sorteio.
+    :return: Lista de issues no formato esperado por json_to_sql.
+    """
+    base = convert(JSON_PATH, modify=True)
+    base = base if type(base) == list else [base]
+    rng = random.Random(seed)
+    dump = []
+    for i in range(issues):
+        issue = dict(base[i % len(base)])
+        issue['title'] = f"{issue['title']} {i}"
+        issue['auditors'] = [f"Auditor {rng.randrange(auditors)}" for _ in range(rng.randint(0, 3))]
+        issue['findings'] = [
+            {'title': f"Finding {i}.{j}", 'severity': rng.choice(API.SEVERITIES)}
+            for j in range(rng.randint(0, 2 * findings))
+        ]
+        dump.append(issue)
+    return dump
+
+
+def legacy_json_to_sql(json_data: list, db_path: str):
+    """
+    Carga linha a linha, como o data_manager fazia antes da carga em lotes.
+    """
+    with sqlite3.connect(db_path) as db:
+        cursor = db.cursor()
+        for issue_id, data in enumerate(json_data, 1):
+            cursor.execute("""
+            INSERT INTO issues(title, repos, type, start_date, end_date, auditors_count,
+            specifications, published, findings_count) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?);
+            """, [data['title'], data['repos'], data['type'], data['start_date'], data['end_date'],
+                  len(data['auditors']), data['specification'], 1 if data['published'] == 'true' else 0,
+                  len(data['findings'])])
+            db.commit()
+
+            for name in [data_manager._auditor_name(auditor) for auditor in data['auditors']] or ['None']:
+                auditor = cursor.execute("SELECT id FROM auditors WHERE name = ?", [name]).fetchone()
+                if auditor is None:
+                    cursor.execute("INSERT INTO auditors(name) VALUES (?);", [name])
+                    db.commit()
+                    auditor = cursor.execute("SELECT id FROM auditors WHERE name = ?", [name]).fetchone()
+                cursor.execute("INSERT INTO auditors_issues(auditor_id, issue_id) VALUES (?, ?);",
+                               [auditor[0], issue_id])
+                db.commit()
+                for report in data['findings']:
+                    auditor_id = cursor.execute("SELECT id FROM auditors WHERE name = ?", [name]).fetchone()[0]
+                    cursor.execute("INSERT INTO findings(title, severity, auditor_id, issue_id) VALUES (?, ?, ?, ?);",
+                                   [report['title'], report['severity'], auditor_id, issue_id])
+                    db.commit()
+
+
+def new_db(db_path: str):
+    """
+    Cria um DB vazio com o script CREATE_DB.sql, sem nenhuma issue.
+    """
+    data_manager.json_to_sql([], db_path, True)
+
+
+def dump_tables(db_path: str) -> dict:
+    with sqlite3.connect(db_path) as db:
+        return {table: db.execute(f"SELECT * FROM {table} ORDER BY id").fetchall() for table in TABLES}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark da carga do JSON para o SQLite.')
+    parser.add_argument('--issues', type=int, default=20000)
+    parser.add_argument('--auditors', type=int, default=500)
+    parser.add_argument('--findings', type=int, default=5, help='média de findings por issue')
+    parser.add_argument('--skip-legacy', action='store_true', help='executa somente a carga em lotes')
+    args = parser.parse_args()
+
+    dump = synthetic_dump(args.issues, args.auditors, args.findings)
+    rows = sum(1 + max(len(issue['auditors']), 1) * (1 + len(issue['findings'])) for issue in dump)
+    print(f"{len(dump)} issues, {rows} linhas")
+
+    with tempfile.TemporaryDirectory() as directory:
+        bulk_path = os.path.join(directory, 'bulk.db')
+        new_db(bulk_path)
+        start = time.perf_counter()
+        data_manager.json_to_sql(dump, bulk_path, False)
+        bulk = time.perf_counter() - start
+        print(f"lotes: {bulk:.2f} s ({rows / bulk:.0f} linhas/s)")
+
+        if not args.skip_legacy:
+            legacy_path = os.path.join(directory, 'legacy.db')
+            new_db(legacy_path)
+            start = time.perf_counter()
+            legacy_json_to_sql(dump, legacy_path)
+            legacy = time.perf_counter() - start
+            print(f"linha a linha: {legacy:.2f} s ({rows / legacy:.0f} linhas/s), {legacy / bulk:.1f}x mais lento")
+            print("conteúdo igual" if dump_tables(bulk_path) == dump_tables(legacy_path) else "CONTEÚDO DIFERENTE")
+
+
+if __name__ == '__main__':
+    main()
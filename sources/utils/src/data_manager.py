@@ -1,10 +1,11 @@
 from __future__ import annotations
-from json_converter import convert
+from contextlib import closing
+from json_converter import iter_convert
+from itertools import count, islice
 import numpy as np
-import pandas as pd
 from os.path import exists
 import os
-import API
+import migrate_db
 
 import sqlite3
 
@@ -12,19 +13,67 @@ sqlite3.register_adapter(np.int64, lambda val: int(val))
 sqlite3.register_adapter(np.int32, lambda val: int(val))
 
 
+# Quantidade de issues (e das suas linhas em auditors, auditors_issues e findings)
+# lidas do JSON e inseridas por transação.
+BATCH_SIZE = 1000
+
+# Colunas inseridas em cada tabela, na ordem das tuplas de _batch_rows.
+TABLE_COLUMNS = {
+    'issues': ['id', 'title', 'repos', 'type', 'start_date', 'end_date', 'auditors_count',
+               'specifications', 'published', 'findings_count'],
+    'auditors': ['id', 'name'],
+    'auditors_issues': ['auditor_id', 'issue_id'],
+    'findings': ['title', 'severity', 'auditor_id', 'issue_id']
+}
+
+
+def _auditor_name(auditor: str) -> str:
+    """
+    Remove o espaço ao final do nome do auditor, se houver.
+    """
+    return auditor[:-1] if auditor.endswith(' ') else auditor
+
+
+def _batch_rows(batch: list, first_issue_id: int, auditor_ids: dict, new_auditor_ids: count) -> dict:
+    """
+    Monta as linhas de um lote de issues para cada tabela do DB.
+
+    :param batch: Lista de issues do JSON.
+    :param first_issue_id: ID da primeira issue do lote.
+    :param auditor_ids: Mapa nome -> id dos auditores, atualizado com os novos auditores.
+    :param new_auditor_ids: Gerador dos IDs dos novos auditores.
+    :return: Dicionário tabela -> lista de tuplas na ordem de TABLE_COLUMNS.
+    """
+    rows = {table: [] for table in TABLE_COLUMNS}
+    for issue_id, data in enumerate(batch, first_issue_id):
+        rows['issues'].append((issue_id, data['title'], data['repos'], data['type'], data['start_date'],
+                               data['end_date'], int(len(data['auditors'])), data['specification'],
+                               1 if data['published'] == 'true' else 0, int(len(data['findings']))))
+
+        # Atribui o nome None aos elementos sem auditores.
+        names = [_auditor_name(auditor) for auditor in data['auditors']] or ['None']
+        for name in names:
+            if name not in auditor_ids:
+                auditor_ids[name] = next(new_auditor_ids)
+                rows['auditors'].append((auditor_ids[name], name))
+            rows['auditors_issues'].append((auditor_ids[name], issue_id))
+            for report in data['findings']:
+                # Cada finding é registrado para cada auditor da issue.
+                rows['findings'].append((report['title'], report['severity'], auditor_ids[name], issue_id))
+    return rows
+
+
 def json_to_sql(json_data: str | list, db_path: str, is_new: bool) -> bool:
     """
     Função utilizada para transformar dados estruturados em JSON para SQL.
 
-    :param json_data: JSON contendo os dados que serão passados para o DB SQLite.
+    :param json_data: JSON contendo os dados que serão passados para o DB SQLite. Um caminho
+                      de arquivo é lido em streaming, uma issue por vez, com modify=True.
     :param db_path: Local do banco de dados para conversão.
     :param is_new: Boolean informando se este é um DB novo ou um existente.
     :return: Retorna True se a operação foi realizada com sucesso.
     """
 
-    if type(json_data) == str:
-        json_data = convert(json_data)
-
     if is_new:
         try:
             # Se for um banco novo, tenta remover um possível banco antigo.
@@ -32,7 +81,7 @@ def json_to_sql(json_data: str | list, db_path: str, is_new: bool) -> bool:
         except FileNotFoundError:
             # Ignoramos o erro se o caminho do banco não for encontrado.
             pass
-        with sqlite3.connect(db_path) as db:
+        with closing(sqlite3.connect(db_path)) as db:
             # Criamos e conectamos ao banco de dados.
             cursor = db.cursor()
 
@@ -45,91 +94,53 @@ def json_to_sql(json_data: str | list, db_path: str, is_new: bool) -> bool:
                     cursor.execute(statement)
                     db.commit()
 
+            # O modo WAL fica salvo no banco e permite que as conexões somente leitura
+            # da API leiam enquanto o banco é escrito.
+            cursor.execute("PRAGMA journal_mode = WAL").fetchone()
+
     if not exists(db_path):
         print("DB não existe ou falhou em ser criado.")
         return False
 
-    with sqlite3.connect(db_path) as db:
-        # Conectamos ao banco já criado.
+    if not is_new:
+        # Um DB existente pode ter sido criado com uma versão anterior do CREATE_DB.sql.
+        migrate_db.migrate(db_path)
+
+    if type(json_data) == str:
+        # Somente um lote de issues fica em memória por vez.
+        json_data = iter_convert(json_data, modify=True)
+    elif type(json_data) == dict:
+        # convert retorna um dicionário quando o JSON tem um único elemento.
+        json_data = [json_data]
+
+    with closing(sqlite3.connect(db_path)) as db:
+        # Conectamos ao banco já criado. Com WAL, synchronous NORMAL só sincroniza o
+        # disco nos checkpoints, e não a cada transação. Ao fechar a conexão, o WAL
+        # é transferido para o arquivo do banco e os arquivos -wal e -shm são removidos.
+        db.execute("PRAGMA synchronous = NORMAL")
         cursor = db.cursor()
 
-        # Dicionário estruturado para a tabela issues.
-        issues = {'id': [], 'title': [], 'repos': [], 'type': [], 'start_date': [], 'end_date': [],
-                  'auditors_count': [], 'specifications': [], 'published': [], 'findings_count': []}
-        auditors = {'name': [], 'issue_id': []}  # Dicionário estruturado para a tabela auditors.
-        findings = {'title': [], 'severity': [],
-                    'auditor': [], 'issue_id': []}  # Dicionário estruturado para a tabela findings.
-
-        for issue_id, data in enumerate(json_data):
-            issues['id'].append(issue_id + 1)
-            issues['title'].append(data['title'])
-            issues['repos'].append(data['repos'])
-            issues['type'].append(data['type'])
-            issues['start_date'].append(data['start_date'])
-            issues['end_date'].append(data['end_date'])
-            issues['auditors_count'].append(int(len(data['auditors'])))
-            issues['specifications'].append(data['specification'])
-            issues['published'].append(1 if data['published'] == 'true' else 0)
-            issues['findings_count'].append(int(len(data['findings'])))
-
-            if int(len(data['auditors'])) == 0:
-                # Atribui o nome None aos elementos sem auditores.
-                auditors['name'].append('None')
-                auditors['issue_id'].append(issue_id + 1)
-                for report in data['findings']:
-                    # Popula o dicionário findings.
-                    findings['title'].append(report['title'])
-                    findings['severity'].append(report['severity'])
-                    findings['auditor'].append('None')
-                    findings['issue_id'].append(issue_id + 1)
-            else:
-                for auditor in data['auditors']:
-                    auditors['name'].append(auditor) if not auditor.endswith(' ') else auditors['name'].append(auditor[:-1])
-                    auditors['issue_id'].append(issue_id + 1)
-
-                    for report in data['findings']:
-                        # Popula o dicionário findings.
-                        findings['title'].append(report['title'])
-                        findings['severity'].append(report['severity'])
-                        findings['auditor'].append(auditor) if not auditor.endswith(' ') else \
-                            findings['auditor'].append(auditor[:-1])
-                        findings['issue_id'].append(issue_id + 1)
-
-        issues_df = pd.DataFrame(issues)
-        auditors_df = pd.DataFrame(auditors)
-        findings_df = pd.DataFrame(findings)
-
-        for issue in issues_df.iloc():
-            sql_script = """
-            INSERT INTO issues(title, repos, type, start_date, end_date, auditors_count,
-            specifications, published, findings_count) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?);
-            """
-            cursor.execute(sql_script, issue.values[1:])
-            db.commit()
-
-        auditors_set = set()
-        for auditor in auditors_df.iloc():
-            # Adiciona os auditores na tabela auditors do DB.
-            if auditor['name'] not in auditors_set:
-                sql_script = """
-                            INSERT INTO auditors(name) VALUES (?);
-                            """
-                cursor.execute(sql_script, [auditor['name']])
-                db.commit()
-            sql_script = """
-            INSERT INTO auditors_issues(auditor_id, issue_id) VALUES (?, ?);
-            """
-            cursor.execute(sql_script, [API.get_auditor_id(auditor['name']), auditor['issue_id']])
-            auditors_set.add(auditor['name'])
-
-        for finding in findings_df.iloc():
-            # Adiciona os findings na tabela findings do DB.
-            sql_script = """
-            INSERT INTO findings(title, severity, auditor_id, issue_id) VALUES (?, ?, ?, ?);
-            """
-            auditor_id = API.get_auditor_id(finding['auditor'])
-            cursor.execute(sql_script, [finding['title'], finding['severity'], auditor_id, finding['issue_id']])
-            db.commit()
+        # IDs explícitos a partir dos maiores IDs já existentes, para que as tabelas
+        # auditors_issues e findings apontem para as linhas certas também em um DB existente.
+        first_issue_id = cursor.execute("SELECT COALESCE(MAX(id), 0) FROM issues").fetchone()[0] + 1
+        auditor_ids = {}  # Mapa nome -> id dos auditores, preenchido uma única vez.
+        for auditor_id, name in cursor.execute("SELECT id, name FROM auditors ORDER BY id"):
+            auditor_ids.setdefault(name, auditor_id)
+        new_auditor_ids = count(max(auditor_ids.values(), default=0) + 1)
+
+        issues = iter(json_data)
+        while True:
+            batch = list(islice(issues, BATCH_SIZE))
+            if not batch:
+                break
+            rows = _batch_rows(batch, first_issue_id, auditor_ids, new_auditor_ids)
+            first_issue_id += len(batch)
+            with db:
+                # Uma única transação por lote.
+                for table, columns in TABLE_COLUMNS.items():
+                    sql_script = f"INSERT INTO {table}({', '.join(columns)}) " \
+                                 f"VALUES ({', '.join('?' * len(columns))});"
+                    cursor.executemany(sql_script, rows[table])
 
     return True
 
@@ -1,6 +1,115 @@
 from __future__ import annotations
 import json
 
+# Chaves removidas de cada issue com modify=True.
+UNNEEDED_KEYS = ["url", "contract_signatures", "test_signatures", "tools"]
+
+# Caracteres lidos do arquivo por vez no modo streaming.
+CHUNK_SIZE = 1 << 20
+
+_decoder = json.JSONDecoder()
+_whitespace = ' \t\n\r'
+_number_chars = '0123456789.eE+-'
+
+
+def _modify(element: dict) -> dict:
+    """
+    Remove as chaves desnecessárias e troca repos e specification pela sua quantidade.
+    """
+    data = {}
+    for key in element:
+        if key not in UNNEEDED_KEYS:
+            # Lista UNNEEDED_KEYS representa os dados que não são necessários.
+            if key in ('repos', 'specification') and type(element[key]) == list:
+                data[key] = len(element[key])
+            else:
+                data[key] = element[key]
+    return data
+
+
+def iter_convert(json_input: str, modify: bool = False, chunk_size: int = CHUNK_SIZE):
+    """
+    Lê um json cujo elemento principal é uma lista e gera um elemento por vez,
+    sem carregar o arquivo inteiro na memória. Se o elemento principal for um
+    objeto, ele é o único elemento gerado.
+
+    :param json_input: Local do arquivo json.
+    :param modify: Boolean para modificar ou não cada elemento.
+    :param chunk_size: Quantidade de caracteres lidos do arquivo por vez.
+    :return: Gerador de dicionários.
+    """
+
+    with open(json_input, encoding='utf-8') as file:
+        buffer, position, eof = '', 0, False
+
+        def fill(minimum: int) -> bool:
+            # Lê mais caracteres, descartando o que já foi processado.
+            # Retorna False se o arquivo já terminou.
+            nonlocal buffer, position, eof
+            if eof:
+                return False
+            buffer = buffer[position:]
+            position = 0
+            target = len(buffer) + max(minimum, chunk_size)
+            while len(buffer) < target:
+                chunk = file.read(chunk_size)
+                if not chunk:
+                    eof = True
+                    break
+                buffer += chunk
+            return True
+
+        def next_token() -> str:
+            # Pula os espaços e retorna o próximo caractere ('' no fim do arquivo).
+            nonlocal position
+            while True:
+                while position < len(buffer) and buffer[position] in _whitespace:
+                    position += 1
+                if position < len(buffer):
+                    return buffer[position]
+                if not fill(0):
+                    return ''
+
+        def decode():
+            # Decodifica o próximo valor, lendo mais do arquivo enquanto ele estiver incompleto.
+            nonlocal position
+            while True:
+                try:
+                    value, end = _decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    # Dobra o que está em memória para não decodificar valores grandes muitas vezes.
+                    if not fill(len(buffer) - position):
+                        raise
+                    continue
+                if not eof and type(value) in (int, float) and \
+                        (end == len(buffer) or buffer[end] in _number_chars):
+                    # Números no fim do buffer podem estar incompletos.
+                    fill(0)
+                    continue
+                position = end
+                return value
+
+        token = next_token()
+        if token != '[':
+            if token:
+                element = decode()
+                yield _modify(element) if modify else element
+            return
+
+        position += 1
+        if next_token() == ']':
+            return
+        while True:
+            element = decode()
+            yield _modify(element) if modify else element
+            token = next_token()
+            if token == ']':
+                return
+            if token != ',':
+                raise json.JSONDecodeError("Esperado ',' ou ']'", buffer, position)
+            position += 1
+            next_token()
+
 
 def convert(json_input: str, modify: bool = False) -> dict | list:
     """
@@ -11,27 +120,8 @@ def convert(json_input: str, modify: bool = False) -> dict | list:
     :return: Dicionário ou lista de dicionários resultado da conversão.
     """
 
-    with open(json_input, encoding='utf-8') as file:
-        # Carrega o arquivo json em um buffer.
-        buffer = json.load(file)
-
-    output_list = []  # Lista vazia para população do arquivo de saída.
-    for element in buffer:
-        data = {}  # Dicionário vazio para população de cada objeto do json.
-        for key in element:
-            # Iterando sobre as chaves do json carregado.
-            if modify:
-                if key not in ["url", "contract_signatures", "test_signatures", "tools"]:
-                    # Lista acima representa os dados que não são necessários.
-                    if key == 'repos':
-                        data[key] = len(element['repos'])
-                    elif key == 'specification':
-                        data[key] = len(element['specification'])
-                    else:
-                        data[key] = element[key]
-            else:
-                data[key] = element[key]
-        output_list.append(data)
+    # Cada elemento é lido e modificado uma única vez, sem uma cópia do arquivo inteiro.
+    output_list = list(iter_convert(json_input, modify))
     return output_list if len(output_list) > 1 else output_list[0]
 
 
@@ -0,0 +1,243 @@
+"""
+Migração in-place de bancos existentes para a versão atual do schema (CREATE_DB.sql)
+e verificação dos planos de consulta da API.
+
+A versão do schema fica salva em PRAGMA user_version. Bancos criados antes do
+versionamento têm user_version 0 e correspondem à versão 1.
+
+Uso: python migrate_db.py [DB ...]          (migra os bancos)
+     python migrate_db.py [DB ...] --check  (somente verifica os planos das consultas)
+
+Os testes de test_migrate_db.py criam bancos temporários nas versões 1 e 2:
+
+     python -m unittest test_migrate_db
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sqlite3
+import sys
+from urllib.request import pathname2url
+
+import API
+
+SCHEMA_VERSION = 2
+DB_PATHS = ['../../data/resources/DB/output.db']
+
+# Script de cada versão, aplicado sobre a versão anterior.
+MIGRATIONS = {
+    2: """
+    -- Auditores com o mesmo nome passam a usar o menor ID, para permitir o índice único.
+    CREATE TEMP TABLE auditor_map AS
+        SELECT a.id AS old_id, (SELECT MIN(b.id) FROM auditors b WHERE b.name = a.name) AS new_id
+        FROM auditors a;
+    DELETE FROM temp.auditor_map WHERE old_id = new_id;
+    UPDATE auditors_issues SET auditor_id = (SELECT new_id FROM temp.auditor_map WHERE old_id = auditor_id)
+        WHERE auditor_id IN (SELECT old_id FROM temp.auditor_map);
+    UPDATE findings SET auditor_id = (SELECT new_id FROM temp.auditor_map WHERE old_id = auditor_id)
+        WHERE auditor_id IN (SELECT old_id FROM temp.auditor_map);
+    DELETE FROM auditors WHERE id IN (SELECT old_id FROM temp.auditor_map);
+    DROP TABLE temp.auditor_map;
+
+    -- As chaves estrangeiras só podem ser corrigidas recriando as tabelas.
+    CREATE TABLE findings_v2 (
+                              id INTEGER PRIMARY KEY AUTOINCREMENT,
+                              title TEXT,
+                              severity TEXT NOT NULL,
+                              auditor_id INTEGER NOT NULL,
+                              issue_id INTEGER NOT NULL,
+
+                              FOREIGN KEY (auditor_id) REFERENCES auditors(id),
+                              FOREIGN KEY (issue_id) REFERENCES issues(id)
+    );
+    INSERT INTO findings_v2(id, title, severity, auditor_id, issue_id)
+        SELECT id, title, severity, auditor_id, issue_id FROM findings;
+    DROP TABLE findings;
+    ALTER TABLE findings_v2 RENAME TO findings;
+
+    CREATE TABLE auditors_issues_v2 (
+                                     id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                     auditor_id INTEGER NOT NULL,
+                                     issue_id INTEGER NOT NULL,
+
+                                     FOREIGN KEY (auditor_id) REFERENCES auditors(id),
+                                     FOREIGN KEY (issue_id) REFERENCES issues(id)
+    );
+    INSERT INTO auditors_issues_v2(id, auditor_id, issue_id)
+        SELECT id, auditor_id, issue_id FROM auditors_issues;
+    DROP TABLE auditors_issues;
+    ALTER TABLE auditors_issues_v2 RENAME TO auditors_issues;
+
+    CREATE UNIQUE INDEX idx_auditors_name ON auditors(name);
+    CREATE INDEX idx_findings_severity_auditor ON findings(severity, auditor_id);
+    CREATE INDEX idx_findings_auditor_severity ON findings(auditor_id, severity);
+    CREATE INDEX idx_findings_issue ON findings(issue_id);
+    CREATE INDEX idx_auditors_issues_auditor ON auditors_issues(auditor_id, issue_id);
+    CREATE INDEX idx_auditors_issues_issue ON auditors_issues(issue_id, auditor_id);
+    """
+}
+
+
+def get_version(db: sqlite3.Connection) -> int:
+    """
+    Método para obter a versão do schema de um banco.
+
+    :param db: Conexão com o banco.
+    :return: Versão do schema (1 para bancos sem versão).
+    """
+    return max(db.execute("PRAGMA user_version").fetchone()[0], 1)
+
+
+def migrate(db_path: str) -> int:
+    """
+    Método para migrar um banco para SCHEMA_VERSION. Cada versão é aplicada em uma
+    única transação, e um banco já na versão atual não é alterado.
+
+    :param db_path: Caminho do banco de dados.
+    :return: Versão do schema antes da migração.
+    """
+    db = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        start = version = get_version(db)
+        if version > SCHEMA_VERSION:
+            raise RuntimeError(f"{db_path} tem schema versão {version}, mais novo que {SCHEMA_VERSION}.")
+        while version < SCHEMA_VERSION:
+            version += 1
+            try:
+                # user_version é alterado na mesma transação que o script.
+                db.executescript(f"BEGIN; {MIGRATIONS[version]}; PRAGMA user_version = {version}; COMMIT;")
+            except sqlite3.Error:
+                if db.in_transaction:
+                    db.execute("ROLLBACK")
+                raise
+        if start < SCHEMA_VERSION:
+            # Atualiza as estatísticas usadas pelo planejador de consultas.
+            db.execute("ANALYZE")
+            for table, row_id, parent, _ in db.execute("PRAGMA foreign_key_check"):
+                print(f"{db_path}: {table} (id {row_id}) referencia uma linha inexistente de {parent}.")
+        return start
+    finally:
+        db.close()
+
+
+def _api_calls(db: sqlite3.Connection) -> list:
+    """
+    Chamadas da API que devem usar somente índices, com IDs e nomes existentes no banco.
+    As chamadas por auditor ou por issue só são feitas se o banco tiver essas linhas.
+    """
+    auditors = db.execute("SELECT id, name FROM auditors ORDER BY id LIMIT 2").fetchall()
+    issues = db.execute("SELECT id FROM issues ORDER BY id LIMIT 2").fetchall()
+    calls = [
+        (API.get_findings_by_severities, ['High'], {}),
+        (API.get_findings_by_severities, ['High', 'Medium'], {}),
+        (API.get_severity_distribution, [], {}),
+        (API.get_auditor_severity_matrix, [], {}),
+    ]
+    if auditors:
+        # Listas de um único elemento geram 'IN (x,)' na API, por isso repetimos o primeiro.
+        auditors = (auditors * 2)[:2]
+        auditor_ids, auditor_names = [a[0] for a in auditors], [a[1] for a in auditors]
+        calls += [
+            (API.get_auditors, [auditor_names[0]], {}),
+            (API.get_findings_by_auditors, auditor_ids, {}),
+            (API.get_issues, [], {'auditor_id': auditor_ids[0]}),
+            (API.get_issues, [], {'auditor_ids': auditor_ids}),
+            (API.get_issues, [], {'auditor_name': auditor_names[0]}),
+            (API.get_issues, [], {'auditor_names': auditor_names}),
+        ]
+    if issues:
+        issue_ids = [i[0] for i in (issues * 2)[:2]]
+        calls += [
+            (API.get_issues, [], {'issue_id': issue_ids[0]}),
+            (API.get_issues, [], {'issue_ids': issue_ids}),
+        ]
+    return calls
+
+
+def full_scans(plan: list) -> list:
+    """
+    Passos do plano de consulta que percorrem uma tabela inteira. Agregações sobre
+    a tabela toda podem percorrer um índice de cobertura.
+
+    :param plan: Lista com a coluna detail do EXPLAIN QUERY PLAN.
+    :return: Passos que percorrem uma tabela inteira.
+    """
+    return [detail for detail in plan if detail.startswith('SCAN ') and 'COVERING INDEX' not in detail]
+
+
+def query_plans(db_path: str) -> list:
+    """
+    Método para obter o EXPLAIN QUERY PLAN das consultas da API. As consultas são
+    capturadas executando a própria API, e o banco não é alterado.
+
+    :param db_path: Caminho do banco de dados.
+    :return: Lista de tuplas (chamada, consulta, lista com a coluna detail do plano).
+    """
+    previous_path = API.DB_PATH
+    API.close_connection()
+    API.DB_PATH = db_path
+    db = API.get_connection()
+    statements = []
+    plans = []
+    db.set_trace_callback(statements.append)
+    try:
+        for function, args, kwargs in _api_calls(db):
+            statements.clear()
+            function(*args, **kwargs)
+            call = ', '.join([repr(arg) for arg in args] + [f"{key}={value!r}" for key, value in kwargs.items()])
+            for statement in [s for s in statements if s.lstrip().upper().startswith('SELECT')]:
+                plan = [row[3] for row in db.execute(f"EXPLAIN QUERY PLAN {statement}")]
+                plans.append((f"{function.__name__}({call})", statement, plan))
+    finally:
+        db.set_trace_callback(None)
+        API.close_connection()
+        API.DB_PATH = previous_path
+    return plans
+
+
+def check_query_plans(db_path: str) -> bool:
+    """
+    Método para verificar, com EXPLAIN QUERY PLAN, que as consultas da API não
+    percorrem tabelas inteiras. O banco não é migrado nem alterado.
+
+    :param db_path: Caminho do banco de dados.
+    :return: True se nenhuma consulta percorre uma tabela inteira.
+    """
+    ok = True
+    for call, _, plan in query_plans(db_path):
+        scans = full_scans(plan)
+        ok = ok and not scans
+        print(f"{'SCAN' if scans else 'OK  '} {call}: {'; '.join(plan)}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=f'Migra bancos existentes para o schema versão {SCHEMA_VERSION}.')
+    parser.add_argument('db_paths', nargs='*', default=DB_PATHS, metavar='DB')
+    parser.add_argument('--check', action='store_true',
+                        help='somente verifica com EXPLAIN QUERY PLAN que as consultas da API usam índices, '
+                             'sem migrar os bancos')
+    args = parser.parse_args()
+
+    ok = True
+    for db_path in args.db_paths:
+        if args.check:
+            db = sqlite3.connect(f"file:{pathname2url(os.path.abspath(db_path))}?mode=ro", uri=True)
+            try:
+                version = get_version(db)
+            finally:
+                db.close()
+            if version < SCHEMA_VERSION:
+                print(f"{db_path}: versão {version}, execute a migração para a versão {SCHEMA_VERSION}")
+            ok = check_query_plans(db_path) and ok
+            continue
+        start = migrate(db_path)
+        print(f"{db_path}: versão {start} -> {SCHEMA_VERSION}" if start < SCHEMA_VERSION
+              else f"{db_path}: já na versão {SCHEMA_VERSION}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+"""
+Testes da migração do schema e dos planos de consulta da API (migrate_db.py).
+
+Cada teste cria bancos temporários: um na versão atual, com o CREATE_DB.sql, e
+um na versão 1, com o schema anterior ao versionamento. Nenhum banco do
+repositório é lido ou alterado.
+
+Uso: python -m unittest test_migrate_db
+"""
+
+from __future__ import annotations
+
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import API
+import migrate_db
+
+CREATE_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'resources', 'DB', 'CREATE_DB.sql')
+
+# Schema da versão 1, antes dos índices e da correção das chaves estrangeiras.
+CREATE_DB_V1 = """
+CREATE TABLE issues (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        title TEXT NOT NULL,
+                        repos INTEGER NOT NULL,
+                        type TEXT NOT NULL,
+                        start_date DATE NOT NULL,
+                        end_date DATE NOT NULL,
+                        auditors_count INTEGER NOT NULL,
+                        specifications INTEGER NOT NULL,
+                        published INTEGER NOT NULL,
+                        findings_count INTEGER NOT NULL
+);
+
+CREATE TABLE auditors (
+                          id INTEGER PRIMARY KEY AUTOINCREMENT,
+                          name TEXT NOT NULL
+);
+
+CREATE TABLE findings (
+                          id INTEGER PRIMARY KEY AUTOINCREMENT,
+                          title TEXT,
+                          severity TEXT NOT NULL,
+                          auditor_id INTEGER NOT NULL,
+                          issue_id INTEGER NOT NULL,
+
+                          FOREIGN KEY (auditor_id) REFERENCES id,
+                          FOREIGN KEY (issue_id) REFERENCES id
+);
+
+CREATE TABLE auditors_issues (
+                                   id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                   auditor_id INTEGER NOT NULL,
+                                   issue_id INTEGER NOT NULL,
+
+                                   FOREIGN KEY (auditor_id) REFERENCES id,
+                                   FOREIGN KEY (issue_id) REFERENCES id
+);
+"""
+
+# Poucas linhas nomeadas, usadas pelos testes, e linhas geradas em quantidade
+# suficiente para que o planejador, com as estatísticas do ANALYZE, prefira os
+# índices como em um banco real.
+ISSUES = [
+    (1, 'Token audit', 3, 'Token', '2020-01-01', '2020-01-15', 2, 1, 1, 3),
+    (2, 'DeFi audit', 5, 'DeFi', '2020-03-01', '2020-03-20', 1, 0, 1, 2),
+    (3, 'Wallet audit', 1, 'Wallet', '2021-05-01', '2021-05-10', 1, 1, 0, 1),
+] + [(i, f'Audit {i}', 1, 'Token', '2021-01-01', '2021-01-31', 1, 1, 1, 20) for i in range(4, 51)]
+AUDITORS = [(1, 'Alice'), (2, 'Bob'), (3, 'Carol')] + [(i, f'Auditor {i}') for i in range(4, 31)]
+AUDITORS_ISSUES = [(1, 1), (2, 1), (1, 2), (3, 3)] + [(1 + i % 30, i) for i in range(4, 51)]
+FINDINGS = [
+    ('Reentrancy', 'High', 1, 1), ('Overflow', 'Medium', 2, 1), ('Naming', 'Informational', 1, 1),
+    ('Oracle', 'High', 1, 2), ('Rounding', 'Low', 1, 2), ('Events', 'Undetermined', 3, 3),
+] + [(f'Finding {k}', API.SEVERITIES[k % 5], 1 + k % 30, 4 + k % 47) for k in range(2000)]
+
+
+def create_db(path: str, script: str, auditors: list = AUDITORS):
+    """
+    Cria um banco com o script informado e as linhas de teste.
+    """
+    with contextlib.closing(sqlite3.connect(path)) as db:
+        db.executescript(script)
+        with db:
+            db.executemany("INSERT INTO issues VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", ISSUES)
+            db.executemany("INSERT INTO auditors(id, name) VALUES (?, ?)", auditors)
+            db.executemany("INSERT INTO auditors_issues(auditor_id, issue_id) VALUES (?, ?)", AUDITORS_ISSUES)
+            db.executemany("INSERT INTO findings(title, severity, auditor_id, issue_id) VALUES (?, ?, ?, ?)",
+                           FINDINGS)
+
+
+class MigrateDBTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.v1_path = os.path.join(self.directory.name, 'v1.db')
+        self.v2_path = os.path.join(self.directory.name, 'v2.db')
+        with open(CREATE_DB_PATH, 'r') as create_script:
+            create_db(self.v2_path, create_script.read())
+        create_db(self.v1_path, CREATE_DB_V1)
+
+    def tearDown(self):
+        API.close_connection()
+        self.directory.cleanup()
+
+    def query(self, path: str, script: str) -> list:
+        with contextlib.closing(sqlite3.connect(path)) as db:
+            return db.execute(script).fetchall()
+
+    def assertNoFullScans(self, path: str):
+        plans = migrate_db.query_plans(path)
+        self.assertTrue(plans)
+        for call, statement, plan in plans:
+            self.assertEqual(migrate_db.full_scans(plan), [], f"{call}: {statement}")
+
+    def test_new_db_has_current_version(self):
+        self.assertEqual(self.query(self.v2_path, "PRAGMA user_version"), [(migrate_db.SCHEMA_VERSION,)])
+
+    def test_new_db_queries_use_indexes(self):
+        self.assertNoFullScans(self.v2_path)
+
+    def test_v1_db_queries_scan(self):
+        scans = [call for call, _, plan in migrate_db.query_plans(self.v1_path) if migrate_db.full_scans(plan)]
+        self.assertIn("get_findings_by_severities('High')", scans)
+        self.assertIn("get_auditors('Alice')", scans)
+
+    def test_migrated_db_queries_use_indexes(self):
+        self.assertEqual(migrate_db.migrate(self.v1_path), 1)
+        self.assertEqual(self.query(self.v1_path, "PRAGMA user_version"), [(migrate_db.SCHEMA_VERSION,)])
+        self.assertNoFullScans(self.v1_path)
+
+    def test_migration_keeps_rows_and_fixes_foreign_keys(self):
+        tables = ['issues', 'auditors', 'auditors_issues', 'findings']
+        before = {table: self.query(self.v1_path, f"SELECT * FROM {table} ORDER BY id") for table in tables}
+        migrate_db.migrate(self.v1_path)
+        for table in tables:
+            self.assertEqual(self.query(self.v1_path, f"SELECT * FROM {table} ORDER BY id"), before[table])
+        references = self.query(self.v1_path, "SELECT \"table\", \"to\" FROM pragma_foreign_key_list('findings')")
+        self.assertEqual(sorted(references), [('auditors', 'id'), ('issues', 'id')])
+        self.assertEqual(self.query(self.v1_path, "PRAGMA foreign_key_check"), [])
+
+    def test_migration_merges_duplicate_auditor_names(self):
+        duplicated = os.path.join(self.directory.name, 'duplicated.db')
+        create_db(duplicated, CREATE_DB_V1, AUDITORS + [(31, 'Alice')])
+        with contextlib.closing(sqlite3.connect(duplicated)) as db, db:
+            db.execute("UPDATE findings SET auditor_id = 31 WHERE title = 'Rounding'")
+            db.execute("UPDATE auditors_issues SET auditor_id = 31 WHERE auditor_id = 1 AND issue_id = 2")
+        migrate_db.migrate(duplicated)
+        self.assertEqual(self.query(duplicated, "SELECT id, name FROM auditors ORDER BY id"), AUDITORS)
+        self.assertEqual(self.query(duplicated, "SELECT auditor_id FROM findings WHERE title = 'Rounding'"), [(1,)])
+        self.assertEqual(self.query(duplicated, "SELECT COUNT(*) FROM auditors_issues WHERE auditor_id = 31"), [(0,)])
+
+    def test_migration_is_idempotent(self):
+        migrate_db.migrate(self.v1_path)
+        schema = self.query(self.v1_path, "SELECT sql FROM sqlite_master ORDER BY name")
+        self.assertEqual(migrate_db.migrate(self.v1_path), migrate_db.SCHEMA_VERSION)
+        self.assertEqual(self.query(self.v1_path, "SELECT sql FROM sqlite_master ORDER BY name"), schema)
+
+    def test_failed_migration_rolls_back(self):
+        broken = os.path.join(self.directory.name, 'broken.db')
+        with contextlib.closing(sqlite3.connect(broken)) as db:
+            db.execute("CREATE TABLE auditors (id INTEGER PRIMARY KEY, name TEXT)")
+        with self.assertRaises(sqlite3.OperationalError):
+            migrate_db.migrate(broken)
+        self.assertEqual(self.query(broken, "PRAGMA user_version"), [(0,)])
+        self.assertEqual(self.query(broken, "SELECT name FROM sqlite_master"), [('auditors',)])
+
+    def test_check_does_not_change_db(self):
+        with open(self.v1_path, 'rb') as f:
+            before = f.read()
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertFalse(migrate_db.check_query_plans(self.v1_path))
+        with open(self.v1_path, 'rb') as f:
+            self.assertEqual(f.read(), before)
+
+    def test_check_on_empty_db(self):
+        empty = os.path.join(self.directory.name, 'empty.db')
+        with open(CREATE_DB_PATH, 'r') as create_script, contextlib.closing(sqlite3.connect(empty)) as db:
+            db.executescript(create_script.read())
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertTrue(migrate_db.check_query_plans(empty))
+
+
+if __name__ == '__main__':
+    unittest.main()